@@ -1,5 +1,16 @@
 import sys
-from IPython.core import ultratb
 
-sys.excepthook = ultratb.VerboseTB(include_vars=True)
+
+def _excepthook(*exc_info):
+    """IPython's VerboseTB, imported on the first uncaught exception; importing it up front slows down every command"""
+    try:
+        from IPython.core import ultratb
+    except ImportError:
+        sys.excepthook = sys.__excepthook__
+    else:
+        sys.excepthook = ultratb.VerboseTB(include_vars=True)
+    sys.excepthook(*exc_info)
+
+
+sys.excepthook = _excepthook
 print('excepthook: VerboseTB')
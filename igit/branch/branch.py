@@ -2,10 +2,14 @@ import re
 from typing import List, Dict
 
 from igit.debug import ExcHandler
-from igit.util.search import search_and_prompt
+from igit.util.search import search_and_prompt, SearchIndex
 
+from igit.repo import refs, fetcher
 from igit.util import shell, termcolor, cachedprop
 
+# where remote branches live in the git dir; branch props are re-read when these change
+REMOTE_REFS = ('packed-refs', 'refs/remotes/')
+
 
 class BranchTree:
     """Get branch sha:
@@ -20,33 +24,66 @@ class BranchTree:
     _fetched = False
     _version = ''
     
+    def __init__(self, *, fetch=False):
+        """By default, branches are read from the last-known remote refs, while a rate-limited
+        fetch runs in the background (see igit.repo.fetcher).
+        fetch: block on a fetch before first reading them."""
+        self._fetch = fetch
+    
     def __contains__(self, branch):
         return branch in self.branches
     
-    @cachedprop
+    @cachedprop(depends_on=('HEAD',), persist=True)
     def current(self) -> str:
         return shell.runquiet('git branch --show-current')
     
-    @cachedprop
+    @cachedprop(depends_on=REMOTE_REFS)
     def branches(self) -> dict:
         """{'master': <SHA1>}"""
-        if not self._fetched:
-            shell.runquiet('git fetch --all')
-            self._fetched = True
-        lines = shell.runquiet('git ls-remote --heads origin').splitlines()
-        return dict(reversed(re.match(r'(\w*)\srefs/heads/(.*)', line).groups()) for line in lines)
+        if self._fetch and not self._fetched:
+            self.fetch()
+        else:
+            fetcher.schedule()
+        branches = self.known_branches
+        if not branches and not self._fetched:
+            print(termcolor.yellow('No remote branches known yet, fetching...'))
+            self.fetch()
+            branches = self.known_branches
+        return branches
+    
+    @cachedprop(depends_on=REMOTE_REFS, persist=True)
+    def known_branches(self) -> Dict[str, str]:
+        """{'master': <SHA1>}, as of the last fetch, without fetching. Kept across igit processes"""
+        return refs.remote_branches('origin')
     
-    @cachedprop
+    def fetch(self):
+        """Refreshes the remote refs. Branch properties are re-read on next access."""
+        fetcher.fetch()
+        self._fetched = True
+        cache = self.__dict__.get('_cache', {})
+        for prop in ('branches', 'branchnames', 'branchhashes', 'search_index'):
+            cache.pop(prop, None)
+    
+    @cachedprop(depends_on=REMOTE_REFS)
     def branchnames(self) -> List[str]:
         return list(self.branches.keys())
     
-    @cachedprop
+    @cachedprop(depends_on=REMOTE_REFS)
+    def known_branchnames(self) -> List[str]:
+        """Like branchnames, but as of the last fetch, without fetching"""
+        return list(self.known_branches.keys())
+    
+    @cachedprop(depends_on=REMOTE_REFS)
     def branchhashes(self) -> List[str]:
         return list(self.branches.values())
     
+    @cachedprop(depends_on=REMOTE_REFS)
+    def search_index(self) -> SearchIndex:
+        return SearchIndex(self.branchnames)
+    
     def search(self, keyword: str) -> str:
         # TODO: option to get branch date if ambiguous etc
-        choice = search_and_prompt(keyword, self.branchnames, criterion='substring')
+        choice = search_and_prompt(keyword, self.branchnames, criterion='substring', index=self.search_index)
         print(termcolor.green(f'BranchTree.search("{keyword}") → "{choice}"'))
         return choice
     
@@ -1 +1,4 @@
 from .commit import CommitTree
+from .index import CommitIndex
+
+__all__ = ['CommitTree', 'CommitIndex']
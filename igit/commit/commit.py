@@ -1,34 +1,129 @@
-import re
-from typing import List
+import shlex
+from typing import Optional, Iterable, Dict, Iterator, Mapping, KeysView, ValuesView, List
 
+from igit.commit.index import CommitIndex
+from igit.repo import fetcher
 from igit.util import shell, cachedprop
 
+# what moves when HEAD does: HEAD itself when detached, the branch it points to otherwise
+HEAD_REFS = ('HEAD', 'packed-refs', 'refs/heads/')
+
+
+class Commits(Mapping[str, str]):
+    """{message: <SHA1>}, newest first. Parsed lazily from a streamed `git log`, only as far as it's accessed:
+    `'fix typo' in commits` stops reading history at the first matching commit.
+    If a message repeats, the newest commit keeps it."""
+    
+    def __init__(self, lines: Iterator[str]):
+        self._lines = lines
+        self._commits: Dict[str, str] = {}
+        self._messages: List[str] = []
+        self._exhausted = False
+    
+    def __repr__(self):
+        return f'Commits({len(self._messages)} read{"" if self._exhausted else " so far"})'
+    
+    def _read_one(self) -> bool:
+        """Reads commits until a new message is found. Returns False if no more commits."""
+        for line in self._lines:
+            sha, _, message = line.partition(' ')
+            if message in self._commits:
+                continue
+            self._commits[message] = sha
+            self._messages.append(message)
+            return True
+        self._exhausted = True
+        return False
+    
+    def __getitem__(self, message: str) -> str:
+        while message not in self._commits:
+            if self._exhausted or not self._read_one():
+                raise KeyError(message)
+        return self._commits[message]
+    
+    def __iter__(self) -> Iterator[str]:
+        i = 0
+        while True:
+            if i < len(self._messages):
+                yield self._messages[i]
+                i += 1
+            elif self._exhausted or not self._read_one():
+                return
+    
+    def __len__(self) -> int:
+        while not self._exhausted:
+            self._read_one()
+        return len(self._messages)
+
 
 class CommitTree:
     _current = ''
     _commits = dict()
     _commitnames = []
     _commithashes = []
-    _fetched = False
     
-    @cachedprop
+    def __init__(self, *, fetch=False):
+        """fetch: block on a fetch before first reading commits, instead of letting it run in the background."""
+        self._fetch = fetch
+    
+    @cachedprop(depends_on=HEAD_REFS, persist=True)
     def current(self) -> str:
-        return shell.runquiet('git rev-parse HEAD')
-    
-    @cachedprop
-    def commits(self) -> dict:
-        if not self._fetched:
-            shell.runquiet('git fetch --all')
-            self._fetched = True
-        lines = shell.runquiet('git log --pretty=oneline').splitlines()
-        
-        # TODO: better to just line.split(' ', maxsplit=1)?
-        return dict(reversed(re.split(r' ', line, maxsplit=1)) for line in lines)
-    
-    @cachedprop
-    def commitnames(self) -> List[str]:
-        return list(self.commits.keys())
-    
-    @cachedprop
-    def commithashes(self) -> List[str]:
-        return list(self.commits.values())
+        return self.resolve('HEAD')
+    
+    def resolve(self, rev: str) -> Optional[str]:
+        """Full sha of any rev (short hash, branch, 'HEAD~2'...), or None if it doesn't exist locally"""
+        info = shell.objectreader().info(rev)
+        if info is None:
+            return None
+        return info.sha
+    
+    def resolve_many(self, revs: Iterable[str]) -> Dict[str, Optional[str]]:
+        return {rev: info.sha if info else None for rev, info in shell.objectreader().info_many(revs).items()}
+    
+    def log(self, *, limit: int = None, since: str = None, path: str = None) -> Commits:
+        """Lazy {message: <SHA1>} of HEAD's history.
+        since: anything `git log --since` takes, like '2 weeks ago'.
+        path: only commits touching this path."""
+        cmd = 'git log --pretty=oneline'
+        if limit is not None:
+            cmd += f' --max-count={limit}'
+        if since:
+            cmd += f' --since={shlex.quote(since)}'
+        if path:
+            cmd += f' -- {shlex.quote(str(path))}'
+        return Commits(shell.iterlines(cmd))
+    
+    def nth(self, index: int) -> Optional[str]:
+        """Sha of the commit `index` commits back in the log (0 is HEAD), reading only that far"""
+        return next(shell.iterlines(f'git log --pretty=format:%H --skip={index} --max-count=1'), None)
+    
+    @cachedprop(depends_on=HEAD_REFS)
+    def index(self) -> CommitIndex:
+        """The on-disk commit index, brought up to date with HEAD"""
+        index = CommitIndex()
+        index.update()
+        return index
+    
+    def search(self, keyword: str) -> Optional[str]:
+        """Sha of the commit whose subject matches `keyword`, prompting if ambiguous"""
+        from igit.util.search import search_and_prompt
+        choice = search_and_prompt(keyword, self.index.subjects())
+        if not choice:
+            return None
+        return next(commit.sha for commit in self.index.search(choice) if commit.subject == choice)
+    
+    @cachedprop(depends_on=HEAD_REFS)
+    def commits(self) -> Commits:
+        if self._fetch:
+            fetcher.fetch()
+        else:
+            fetcher.schedule()
+        return self.log()
+    
+    @cachedprop(depends_on=HEAD_REFS)
+    def commitnames(self) -> KeysView[str]:
+        return self.commits.keys()
+    
+    @cachedprop(depends_on=HEAD_REFS)
+    def commithashes(self) -> ValuesView[str]:
+        return self.commits.values()
@@ -0,0 +1,122 @@
+import sqlite3
+from typing import NamedTuple, Tuple, List, Optional, Iterable
+
+from igit.util import shell
+from igit.util.path import ExPath, igitdir
+
+
+class IndexedCommit(NamedTuple):
+    sha: str
+    parents: Tuple[str, ...]
+    timestamp: int
+    subject: str
+
+
+class CommitIndex:
+    """Sha, parents, commit time and subject of every commit reachable from the HEADs it was updated with,
+    kept in .git/igit/commits.sqlite. Rows are only ever appended: when HEAD moves, `update()` walks
+    just the commits that aren't reachable from an already indexed HEAD."""
+    VERSION = '1'
+    # how many rows are inserted per transaction while walking history
+    BATCH = 10_000
+    
+    def __init__(self, path: ExPath = None):
+        self.path = path or igitdir() / 'commits.sqlite'
+        self._db = sqlite3.connect(str(self.path), timeout=10)
+        self._init_schema()
+    
+    def __len__(self):
+        return self._db.execute('SELECT COUNT(*) FROM commits').fetchone()[0]
+    
+    def __contains__(self, sha: str):
+        return self._db.execute('SELECT 1 FROM commits WHERE sha = ?', (sha,)).fetchone() is not None
+    
+    def _init_schema(self):
+        with self._db:
+            self._db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+            version = self._db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            if version and version[0] != self.VERSION:
+                self._db.execute('DROP TABLE IF EXISTS commits')
+                self._db.execute('DROP TABLE IF EXISTS heads')
+            self._db.execute("""CREATE TABLE IF NOT EXISTS commits (
+                                    seq INTEGER PRIMARY KEY,
+                                    sha TEXT UNIQUE NOT NULL,
+                                    parents TEXT NOT NULL,
+                                    timestamp INTEGER NOT NULL,
+                                    subject TEXT NOT NULL)""")
+            self._db.execute('CREATE INDEX IF NOT EXISTS commits_timestamp ON commits (timestamp)')
+            # everything reachable from these is in `commits`
+            self._db.execute('CREATE TABLE IF NOT EXISTS heads (sha TEXT PRIMARY KEY)')
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (self.VERSION,))
+    
+    @staticmethod
+    def _row_to_commit(row) -> IndexedCommit:
+        sha, parents, timestamp, subject = row
+        return IndexedCommit(sha, tuple(parents.split()), timestamp, subject)
+    
+    def heads(self) -> List[str]:
+        return [sha for sha, in self._db.execute('SELECT sha FROM heads')]
+    
+    def update(self, head: str = 'HEAD') -> int:
+        """Indexes commits reachable from `head` that aren't indexed yet. Returns how many were added."""
+        info = shell.objectreader().info(head)
+        if info is None:
+            # no commits yet
+            return 0
+        head_sha = info.sha
+        heads = self.heads()
+        if head_sha in heads:
+            return 0
+        # heads can disappear after a rebase + gc; git log would fail on them
+        existing = {sha for sha, info in shell.objectreader().info_many(heads).items() if info}
+        cmd = f'git log --format=%H%x00%P%x00%ct%x00%s {head_sha}'
+        if existing:
+            cmd += ' --not ' + ' '.join(existing)
+        added = 0
+        rows = []
+        # old heads that turn out to be ancestors of the new one are redundant
+        stale_heads = set(heads) - existing
+        for line in shell.iterlines(cmd):
+            sha, parents, timestamp, subject = line.split('\0', maxsplit=3)
+            rows.append((sha, parents, int(timestamp), subject))
+            stale_heads.update(parent for parent in parents.split() if parent in existing)
+            if len(rows) >= self.BATCH:
+                added += self._insert(rows)
+                rows = []
+        added += self._insert(rows)
+        with self._db:
+            self._db.executemany('DELETE FROM heads WHERE sha = ?', [(sha,) for sha in stale_heads])
+            self._db.execute('INSERT OR IGNORE INTO heads VALUES (?)', (head_sha,))
+        return added
+    
+    def _insert(self, rows: Iterable[tuple]) -> int:
+        with self._db:
+            cursor = self._db.executemany('INSERT OR IGNORE INTO commits (sha, parents, timestamp, subject) '
+                                          'VALUES (?, ?, ?, ?)', rows)
+        return cursor.rowcount
+    
+    def get(self, sha: str) -> Optional[IndexedCommit]:
+        row = self._db.execute('SELECT sha, parents, timestamp, subject FROM commits WHERE sha = ?', (sha,)).fetchone()
+        return self._row_to_commit(row) if row else None
+    
+    def lookup(self, prefix: str) -> List[IndexedCommit]:
+        """Commits whose sha starts with `prefix`"""
+        prefix = prefix.lower()
+        # a range query uses the sha index, unlike LIKE
+        rows = self._db.execute('SELECT sha, parents, timestamp, subject FROM commits '
+                                'WHERE sha >= ? AND sha < ?', (prefix, prefix + 'g'))
+        return [self._row_to_commit(row) for row in rows]
+    
+    def search(self, substring: str, limit: int = None) -> List[IndexedCommit]:
+        """Commits whose subject contains `substring` (case insensitive), newest first"""
+        rows = self._db.execute('SELECT sha, parents, timestamp, subject FROM commits '
+                                'WHERE instr(lower(subject), ?) ORDER BY timestamp DESC LIMIT ?',
+                                (substring.lower(), -1 if limit is None else limit))
+        return [self._row_to_commit(row) for row in rows]
+    
+    def subjects(self) -> List[str]:
+        """All indexed subjects, newest first"""
+        return [subject for subject, in self._db.execute('SELECT subject FROM commits ORDER BY timestamp DESC')]
+    
+    def close(self):
+        self._db.close()
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3.8
 import os
 import re
+import shlex
 from pathlib import Path
 from typing import Dict
 
@@ -8,9 +9,12 @@ import click
 
 from igit import git, prompt, util
 from igit.exec.ignore import main as ignore
+from igit.repo.index import GitIndex
 from igit.status import Status
 from igit.util import shell, termcolor, misc
 
+LARGE_MB = 30
+
 
 def verify_shebang(f: Path, lines):
     regex = re.compile(r'^#!/usr/bin/env python3\.([78])$')
@@ -35,16 +39,24 @@ def verify_shebang(f: Path, lines):
                 print(termcolor.green(f'Added shebag to {f.name} successfully'))
 
 
-def handle_large_files(cwd, largepaths: Dict[Path, float]):
-    print(termcolor.yellow(f'{len(largepaths)} large paths sized >= 30MB found:'))
+def handle_large_files(cwd, largepaths: Dict[Path, float], index: GitIndex):
+    print(termcolor.yellow(f'{len(largepaths)} large paths sized >= {LARGE_MB}MB found:'))
+    tracked = []
     for abspath, mbsize in largepaths.items():
-        stats = f'{abspath.relative_to(cwd)} ({mbsize}MB)'
         if abspath.is_dir():
-            stats += f' ({len(list(abspath.iterdir()))} sub items)'
+            stats = f'{abspath.relative_to(cwd)} (>= {mbsize}MB) ({len(list(abspath.iterdir()))} sub items)'
+        else:
+            stats = f'{abspath.relative_to(cwd)} ({mbsize}MB)'
+        if index.is_tracked(abspath):
+            tracked.append(abspath.relative_to(cwd))
+            stats += ' (tracked)'
         print(stats)
     answer = prompt.action('Choose:', 'ignore', special_opts=True)
     if answer == 'i':
         ignore([p.relative_to(cwd) for p in largepaths])
+        # ignoring alone doesn't stop git from tracking them
+        if tracked and prompt.ask(f'{len(tracked)} of them are tracked, remove them from the index too (git rm -r --cached)?'):
+            shell.run(f'git rm -r --cached -- {" ".join(shlex.quote(str(p)) for p in tracked)}')
 
 
 def handle_empty_file(f):
@@ -87,15 +99,16 @@ def main(commitmsg: str):
         mb = 0
         if abspath.exists():
             if abspath.is_dir():
-                mb = util.path.dirsize(abspath) / 1000000
+                # only needs to know whether it's past the limit
+                mb = util.path.dirsize(abspath, threshold=LARGE_MB * 1000000, workers=4) / 1000000
             else:
                 mb = abspath.lstat().st_size / 1000000
         else:
             print(f'does not exist: "{abspath}"')
-        if mb >= 30:
+        if mb >= LARGE_MB:
             largepaths[abspath] = mb
     if largepaths:
-        handle_large_files(cwd, largepaths)
+        handle_large_files(cwd, largepaths, status.index)
     if not commitmsg:
         if len(status.files) == 1:
             commitmsg = status.files[0]
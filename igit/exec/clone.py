@@ -34,7 +34,7 @@ def build_url(repo, host, owner):
 @unrequired_opt('-b', '--branch', default='master')
 @unrequired_opt('-g', '--separate-git-dir')
 def main(repo, directory, host, owner, branch, separate_git_dir):
-    cmd = 'git clone '
+    cmd = 'git clone --progress '
     if branch != 'master':
         cmd += f'--branch={branch} '
     if separate_git_dir:
@@ -43,7 +43,7 @@ def main(repo, directory, host, owner, branch, separate_git_dir):
     cmd += build_url(repo, host, owner)
     if directory:
         cmd += f' {directory}'
-    shell.run(cmd)
+    shell.stream(cmd)
 
 
 if __name__ == '__main__':
@@ -24,8 +24,10 @@ def main(branch):
     if currbranch == branch:
         sys.exit(termcolor.yellow(f'Already on {branch}'))
     
-    branches = btree.branchnames
-    if branch not in branches:
+    if branch not in btree.branchnames:
+        # maybe it was pushed since we last fetched
+        btree.fetch()
+    if branch not in btree.branchnames:
         print(termcolor.yellow(f"didn't find {branch} in branches"))
         branch = btree.search(branch)
     if not branch:
@@ -1,13 +1,37 @@
 #!/usr/bin/env python3.8
 
 
+import re
 import webbrowser
 import click
 import sys
 
 from igit.commit import CommitTree
 from igit.repo import Repo
-from igit.util import termcolor
+from igit.util import shell, termcolor
+
+
+def _index_to_hash(ctree: CommitTree, hash_or_index: str) -> str:
+    """'3' → sha of the 4th commit in the log. Short all-digit strings are indices, unless they're a commit's short sha"""
+    if hash_or_index.isdigit() and len(hash_or_index) < 7:
+        if shell.objectreader().info(f'{hash_or_index}^{{commit}}') is not None:
+            return hash_or_index
+        sha = ctree.nth(int(hash_or_index))
+        if not sha:
+            sys.exit(termcolor.red(f'no commit at index {hash_or_index}'))
+        return sha
+    return hash_or_index
+
+
+def _search(ctree: CommitTree, hash_or_subject: str) -> str:
+    if re.fullmatch(r'[0-9a-fA-F]{4,40}', hash_or_subject):
+        # probably a hash that only exists remotely
+        return hash_or_subject
+    print(termcolor.yellow(f'"{hash_or_subject}" is not a known commit, searching commit messages...'))
+    sha = ctree.search(hash_or_subject)
+    if not sha:
+        sys.exit(termcolor.red(f"Couldn't find a commit matching \"{hash_or_subject}\""))
+    return sha
 
 
 @click.command()
@@ -16,13 +40,19 @@ from igit.util import termcolor
 def main(src_hash_or_index, target_hash_or_index):
     # TODO: support a4af4e7..0c6dd4a
     if src_hash_or_index:
+        ctree = CommitTree()
         if not target_hash_or_index:
-            ctree = CommitTree()
             src = ctree.current
             target = src_hash_or_index
         else:
             src = src_hash_or_index
             target = target_hash_or_index
+        src = _index_to_hash(ctree, src)
+        target = _index_to_hash(ctree, target)
+        # expand short hashes with one cat-file pipe; search commit subjects if not a hash
+        resolved = ctree.resolve_many([src, target])
+        src = resolved[src] or _search(ctree, src)
+        target = resolved[target] or _search(ctree, target)
     else:
         # TODO: compare current to one before
         sys.exit(termcolor.red(f'current commit is {CommitTree().current}'))
@@ -15,7 +15,8 @@ from igit.branch import BranchTree
 @click.command()
 @click.argument('name')
 def main(name):
-    btree = BranchTree()
+    # creating a branch that already exists remotely is worse than a slow fetch
+    btree = BranchTree(fetch=True)
     branches = btree.branchnames
     if name in branches:
         if not prompt.ask(f'"{name}" already exists, check it out?'):
@@ -32,9 +32,13 @@ def main(items: Tuple[str], exclude):
                 exclude_exts.append(f'":!*.{ex}"')
     
     cmd = 'git diff --color-moved=zebra --find-copies-harder --ignore-blank-lines '
+    if sys.stdout.isatty():
+        # git's stdout is a pipe to us, so it has to be told
+        cmd += '--color=always '
     print(termcolor.grey(f'items: {items}'))
     if not items:
-        shell.run(cmd, stdout=sys.stdout)
+        shell.stream(cmd, raiseonfail=False)
+        return
     # first, *rest = items
     # if first in BranchTree():
     #     diff_files = [line.rpartition('\t')[2] for line in shell.runquiet(f"git diff --numstat {first}").splitlines()]
@@ -59,7 +63,7 @@ def main(items: Tuple[str], exclude):
                 gitignore = Gitignore()
             if root is None:
                 root = ExPath('.')
-            for match in root.regex(item, lambda x: not gitignore.is_ignored(x)):
+            for match in root.regex(item, prune=gitignore.tree.pruner(), workers=4):
                 stripped = match.strip()
                 formatted.append(f'"{stripped}"')
             continue
@@ -72,7 +76,7 @@ def main(items: Tuple[str], exclude):
     if exclude_exts:
         cmd += " ".join(exclude_exts)
     
-    shell.run(cmd, stdout=sys.stdout)
+    shell.stream(cmd, raiseonfail=False)
 
 
 if __name__ == '__main__':
@@ -9,7 +9,6 @@ from igit.util.clickextensions import unrequired_opt
 from igit.util.path import ExPath, ExPathOrStr
 from igit import prompt
 from igit.ignore import Gitignore
-from ipdb import set_trace
 import inspect
 from more_itertools import partition
 from igit.util.termcolor import italic
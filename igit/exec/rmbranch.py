@@ -23,8 +23,9 @@ def main(name):
     if name == btree.version:
         if not prompt.ask(f'{name} is version branch, continue?'):
             sys.exit()
-    shell.run(f'git branch -D {name}',
-                 f'git push origin --delete {name}')
+    # independent of each other; the push is the slow one
+    shell.runmany(f'git branch -D {name}',
+                  f'git push origin --delete {name}')
 
 
 if __name__ == '__main__':
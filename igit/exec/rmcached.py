@@ -1,5 +1,6 @@
 #!/usr/bin/env python3.8
 import os
+import shlex
 import sys
 import click
 from igit import prompt, git
@@ -19,7 +20,6 @@ def main(paths):
     if not paths:
         sys.exit(paint.red('no paths! exiting'))
     
-    cmds = []
     gitignore = Gitignore()
     status = Status()
     existing_paths = []
@@ -33,22 +33,18 @@ def main(paths):
             # * not index, just str
             p = ExPath(unquote(p))
         
-        if not p.exists():
-            print(f"{paint.yellow(p)} does not exist, skipping")
+        if not status.index.is_tracked(p):
+            print(f"{paint.yellow(p)} is not tracked, skipping")
             continue
         
-        # exists
-        if p.is_dir():
-            cmds.append(f'git rm -r --cached {p}')
-        else:
-            cmds.append(f'git rm --cached {p}')
-        
         existing_paths.append(p)
     
-    if not cmds:
+    if not existing_paths:
         sys.exit(paint.red('no paths to rm, exiting'))
     
-    shell.run(*cmds, raiseonfail=False)
+    # a single `git rm` for all paths; git commands can't write the index concurrently anyway.
+    # -r is needed for directories, and harmless for files
+    shell.run(f'git rm -r --cached -- {" ".join(shlex.quote(str(p)) for p in existing_paths)}', raiseonfail=False)
     if prompt.ask(f'try to ignore {len(existing_paths)} paths?'):
         gitignore.write(existing_paths)
     
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3.8
+import click
+
+from igit.status import daemon
+from igit.util import termcolor
+
+
+@click.command()
+@click.argument('action', type=click.Choice(['start', 'stop', 'run']), default='start')
+def main(action):
+    """Keeps `git status` warm in the background. 'run' stays in the foreground"""
+    if action == 'stop':
+        if daemon.stop():
+            print(termcolor.green('stopped'))
+        else:
+            print(termcolor.yellow('not running'))
+        return
+    if daemon.query() is not None:
+        print(termcolor.yellow(f'already running ({daemon.sockpath()})'))
+        return
+    if action == 'run':
+        daemon.serve()
+    else:
+        daemon.spawn()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3.8
+import os
+import sys
+
+import click
+
+from igit.util import termcolor, trace
+
+
+@click.group()
+def main():
+    """Reports on what `IGIT_TRACE=<path> igit ...` recorded"""
+
+
+@main.command()
+@click.argument('path', required=False)
+@click.option('-n', '--top', default=15, show_default=True, help='how many of the slowest to show')
+@click.option('-s', '--by-subcommand', is_flag=True, help='group by the igit command that ran them, too')
+def summary(path, top, by_subcommand):
+    """Total, max and mean time of each command, slowest first. PATH defaults to $IGIT_TRACE"""
+    path = path or trace.path
+    if not path:
+        sys.exit(termcolor.red('no trace file: pass PATH or set IGIT_TRACE'))
+    if not os.path.isfile(path):
+        sys.exit(termcolor.red(f'{path} is not a file'))
+    events = trace.read(path)
+    if not events:
+        sys.exit(termcolor.yellow(f'{path} has no events'))
+    aggregates = trace.aggregate(events, by_subcommand=by_subcommand)
+    wall = sum(aggregate.total for aggregate in aggregates)
+    width = min(60, max(len(aggregate.name) for aggregate in aggregates[:top]))
+    print(termcolor.bold(f'{"command":<{width}}  {"count":>5}  {"total":>8}  {"max":>8}  {"mean":>8}  {"%":>5}  failed'))
+    for aggregate in aggregates[:top]:
+        name = aggregate.name if len(aggregate.name) <= width else aggregate.name[:width - 1] + '…'
+        line = (f'{name:<{width}}  {aggregate.count:>5}  {aggregate.total:>7.3f}s  {aggregate.max:>7.3f}s  '
+                f'{aggregate.total / aggregate.count:>7.3f}s  {aggregate.total / wall * 100 if wall else 0:>5.1f}  {aggregate.failures or ""}')
+        print(termcolor.yellow(line) if aggregate.failures else line)
+    if len(aggregates) > top:
+        print(termcolor.lightgrey(f'...and {len(aggregates) - top} more'))
+    print(termcolor.lightgrey(f'{len(events)} events, {wall:.3f}s in total'))
+
+
+@main.command('import-profile')
+@click.argument('module', default='igit.exec.co')
+@click.option('-n', '--top', default=15, show_default=True, help='how many of the slowest to show')
+@click.option('-p', '--by-package', is_flag=True, help="sum each top-level package's modules together")
+def import_profile(module, top, by_package):
+    """What importing MODULE costs, module by module, slowest first. MODULE can be an igit command, like 'co'"""
+    if '.' not in module and not module.startswith('igit'):
+        module = f'igit.exec.{module}'
+    try:
+        times = trace.import_times(module)
+    except ImportError as e:
+        sys.exit(termcolor.red(str(e)))
+    total = times[-1].cumulative
+    own = {}
+    for time in times:
+        name = time.module.partition('.')[0] if by_package else time.module
+        own[name] = own.get(name, 0) + time.own
+    slowest = sorted(own.items(), key=lambda item: item[1], reverse=True)[:top]
+    width = max(len(name) for name, _ in slowest)
+    print(termcolor.bold(f'{"package" if by_package else "module":<{width}}  {"self":>8}  {"%":>5}'))
+    for name, seconds in slowest:
+        print(f'{name:<{width}}  {seconds * 1000:>6.1f}ms  {seconds / total * 100:>5.1f}')
+    print(termcolor.lightgrey(f'{len(times)} modules, {total * 1000:.1f}ms to import {module}'))
+
+
+if __name__ == '__main__':
+    main()
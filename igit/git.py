@@ -1,24 +1,31 @@
 #!/usr/bin/env python3.8
 
 import subprocess as sp
+import time
+
+from igit.util import shell, trace
+
+
+def _call(cmd: str) -> int:
+    start = time.time()
+    returncode = sp.call(cmd.split())
+    if trace.path:
+        trace.command(cmd, start, returncode)
+    return returncode
 
 
 def fetchall() -> int:
-    return sp.call('git fetch --all'.split())
+    return _call('git fetch --all')
 
 
 def pull() -> int:
-    # https://stackoverflow.com/questions/5136611/capture-stdout-from-a-script
-    # from IPython.utils.capture import capture_output
-    # with capture_output() as c: print('some output')
-    # TODO: understand how to get colors AND output
-    return sp.call('git pull'.split())
+    # --progress, because git only shows progress when stderr is a terminal, and here it's a pipe
+    return shell.stream('git pull --progress', printcmd=False, raiseonfail=False).returncode
 
 
 def push() -> int:
-    # sp.check_output(shlex.split('git fetch')) == b'' when nothing to pull
-    return sp.call('git push'.split())
+    return shell.stream('git push --progress', printcmd=False, raiseonfail=False).returncode
 
 
 def status() -> int:
-    return sp.call('git status'.split())
+    return _call('git status')
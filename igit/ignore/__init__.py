@@ -1 +1,5 @@
 from .gitignore import Gitignore
+from .matcher import IgnoreMatcher
+from .tree import IgnoreTree
+
+__all__ = ['Gitignore', 'IgnoreMatcher', 'IgnoreTree']
@@ -1,6 +1,8 @@
+import os
 from typing import Any, List, Callable, Generator
 
 from igit import prompt
+from igit.ignore.tree import IgnoreTree
 from igit.util import cachedprop, termcolor
 from igit.util.path import ExPath
 
@@ -33,20 +35,26 @@ class Gitignore:
         paths = [ExPath(x) for x in lines if bool(x) and '#' not in x]
         return [*paths, ExPath('.git')]
     
+    @cachedprop
+    def tree(self) -> IgnoreTree:
+        """Also knows nested .gitignore files, .git/info/exclude and core.excludesFile"""
+        return IgnoreTree()
+    
     def should_be_ignored(self, p: ExPath, quiet=False) -> bool:
-        for ignored in self.paths:
-            if ignored == p:
-                if not quiet:
-                    print(termcolor.yellow(f'{p} already in gitignore, continuing'))
-                return False
-            if ignored.parent_of(p):
-                if quiet:
-                    return False
-                msg = termcolor.yellow(f"parent '{ignored}' of '{p}' already in gitignore")
-                key, action = prompt.action(msg, 'skip', 'ignore anyway', 'debug')
-                if action == 'skip':
-                    print('skipping')
-                    return False
+        if p in self:
+            if not quiet:
+                print(termcolor.yellow(f'{p} already in gitignore, continuing'))
+            return False
+        pattern = self.tree.which(p, os.path.isdir(p))
+        if pattern is None or pattern.negated:
+            return True
+        if quiet:
+            return False
+        msg = termcolor.yellow(f"'{p}' already ignored by '{pattern.source}'")
+        key, action = prompt.action(msg, 'skip', 'ignore anyway', 'debug')
+        if action == 'skip':
+            print('skipping')
+            return False
         return True
     
     def write(self, paths, *, confirm=False, dry_run=False):
@@ -62,20 +70,12 @@ class Gitignore:
                 file.write(''.join(sorted(writelines)))
     
     def is_subpath_of_ignored(self, p) -> bool:
-        path = ExPath(p)
-        for ignored in self.paths:
-            if ignored.parent_of(path):
-                return True
+        parent = str(ExPath(p).parent)
+        return parent != '.' and self.tree.match(parent, is_dir=True)
     
     def is_ignored(self, p) -> bool:
-        """Returns True if `p` in .gitignore, or `p` is a subpath of a path in .gitignore"""
-        path = ExPath(p)
-        for ignored in self.paths:
-            if ignored == path:
-                return True
-            if ignored.parent_of(path):
-                return True
-        return False
+        """Returns True if `p` matches any ignore file git reads, or `p` is a subpath of an ignored directory"""
+        return self.tree.match(p, os.path.isdir(p))
     
     def paths_where(self, predicate: Callable[[Any], bool]) -> Generator[ExPath, None, None]:
         for ignored in self.paths:
@@ -0,0 +1,250 @@
+"""Compiles gitignore patterns (see `man gitignore`) once, so checking a path doesn't scan every pattern.
+Literal patterns ('build/', '/setup.cfg', 'node_modules') are dict lookups;
+globs are merged into a single regex, in reverse order so the first alternative that matches is the one git would pick."""
+import os
+import re
+from typing import NamedTuple, Optional, List, Iterable, Dict, Tuple
+
+from igit.util.path import ExPathOrStr
+
+_GLOB_CHARS = frozenset('*?[\\')
+
+
+class Pattern(NamedTuple):
+    source: str  # the line as written in .gitignore
+    negated: bool  # '!pattern'
+    dironly: bool  # 'pattern/'
+    anchored: bool  # contains a slash that isn't trailing: matched against the whole path, not just the name
+    regex: str
+    literal: Optional[str]  # set if the pattern has no glob characters
+
+
+def _strip_trailing_spaces(line: str) -> str:
+    stripped = line.rstrip(' ')
+    if stripped.endswith('\\') and len(stripped) < len(line):
+        # 'foo\ ' keeps its escaped space
+        stripped += ' '
+    return stripped
+
+
+def _translate_class(pattern: str, i: int) -> Tuple[Optional[str], int]:
+    """`pattern[i]` is '['. Returns (regex, index after ']'), or (None, i) if unclosed"""
+    j = i + 1
+    if j < len(pattern) and pattern[j] in '!^':
+        j += 1
+    if j < len(pattern) and pattern[j] == ']':
+        j += 1
+    while j < len(pattern) and pattern[j] != ']':
+        j += 1
+    if j >= len(pattern):
+        return None, i
+    chars = pattern[i + 1:j]
+    negated = chars[0] in '!^'
+    if negated:
+        chars = chars[1:]
+    # keep python's set operations ('&&', '--', '||', '~~') and nested sets out of it
+    chars = re.sub(r'([\\\[\]&~|])', r'\\\1', chars)
+    return f"[{'^/' if negated else ''}{chars}]", j + 1
+
+
+def translate(pattern: str) -> str:
+    """A gitignore glob (already stripped of '!', and of leading and trailing slashes) as a regex"""
+    regex = []
+    i = 0
+    end = len(pattern)
+    while i < end:
+        char = pattern[i]
+        if char == '*':
+            stars = i
+            while i < end and pattern[i] == '*':
+                i += 1
+            doublestar = i - stars == 2 and (stars == 0 or pattern[stars - 1] == '/') and (i == end or pattern[i] == '/')
+            if not doublestar:
+                regex.append('[^/]*')
+            elif i == end:
+                # 'dir/**': everything inside
+                regex.append('.*')
+            else:
+                # '**/name', 'a/**/b': zero or more directories
+                regex.append('(?:.*/)?')
+                i += 1
+            continue
+        if char == '?':
+            regex.append('[^/]')
+        elif char == '[':
+            charclass, i = _translate_class(pattern, i)
+            if charclass:
+                regex.append(charclass)
+                continue
+            regex.append(re.escape(char))
+        elif char == '\\' and i + 1 < end:
+            i += 1
+            regex.append(re.escape(pattern[i]))
+        else:
+            regex.append(re.escape(char))
+        i += 1
+    return ''.join(regex)
+
+
+def compile_pattern(line: str) -> Optional[Pattern]:
+    """Returns None for blank lines and comments"""
+    pattern = _strip_trailing_spaces(line.rstrip('\n\r'))
+    if not pattern or pattern.startswith('#'):
+        return None
+    negated = pattern.startswith('!')
+    if negated:
+        pattern = pattern[1:]
+    elif pattern.startswith(('\\!', '\\#')):
+        pattern = pattern[1:]
+    dironly = pattern.endswith('/')
+    pattern = pattern.rstrip('/')
+    anchored = '/' in pattern
+    pattern = pattern.lstrip('/')
+    if not pattern:
+        return None
+    regex = translate(pattern)
+    if not anchored:
+        regex = f'(?:.*/)?{regex}'
+    literal = None if _GLOB_CHARS & set(pattern) else pattern
+    return Pattern(line, negated, dironly, anchored, regex, literal)
+
+
+class IgnoreMatcher:
+    """
+    ::
+        matcher = IgnoreMatcher(['*.pyc', 'build/', '!build/keep.txt', '/docs/_build'])
+        matcher.match('igit/__pycache__/util.cpython-38.pyc')  # True
+        matcher.match('build', is_dir=True)  # True
+        matcher.match_many(['setup.py', 'docs/_build/index.html'])  # [False, True]
+    Paths are relative to `base` (the directory of the .gitignore), with forward slashes.
+    A trailing slash means a directory.
+    """
+    
+    def __init__(self, lines: Iterable[str], *, base: str = ''):
+        self.base = base.strip('/')
+        self.patterns: List[Pattern] = list(filter(None, map(compile_pattern, lines)))
+        # literal patterns, as {literal: index of the last pattern}. files can't match 'dir/' patterns,
+        # so each kind has a lookup for directories (all patterns) and one for files.
+        self._paths: Tuple[Dict[str, int], Dict[str, int]] = ({}, {})
+        self._names: Tuple[Dict[str, int], Dict[str, int]] = ({}, {})
+        self._regexes: List[Optional['re.Pattern']] = [None, None]
+        globs = ([], [])
+        for index, pattern in enumerate(self.patterns):
+            for is_dir in (True, False):
+                if pattern.dironly and not is_dir:
+                    continue
+                if pattern.literal is None:
+                    globs[is_dir].append(f'(?P<p{index}>{pattern.regex})')
+                elif pattern.anchored:
+                    self._paths[is_dir][pattern.literal] = index
+                else:
+                    self._names[is_dir][pattern.literal] = index
+        for is_dir in (True, False):
+            if globs[is_dir]:
+                # the last pattern in the file takes precedence, so it goes first
+                self._regexes[is_dir] = re.compile('|'.join(reversed(globs[is_dir])), re.DOTALL)
+        self._excluded_dirs: Dict[str, bool] = {}
+    
+    @classmethod
+    def from_file(cls, path: ExPathOrStr, *, base: str = '') -> 'IgnoreMatcher':
+        """An empty matcher if the file doesn't exist"""
+        try:
+            with open(path, encoding='utf-8', errors='surrogateescape') as file:
+                return cls(file.read().splitlines(), base=base)
+        except FileNotFoundError:
+            return cls([], base=base)
+    
+    def __len__(self):
+        return len(self.patterns)
+    
+    def _relative(self, path: ExPathOrStr) -> Optional[str]:
+        path = str(path)
+        if os.sep != '/':
+            path = path.replace(os.sep, '/')
+        while path.startswith('./'):
+            path = path[2:]
+        if not self.base:
+            return path
+        if path.startswith(self.base + '/'):
+            return path[len(self.base) + 1:]
+        # not under this .gitignore
+        return None
+    
+    def _last_match(self, path: str, is_dir: bool) -> Optional[int]:
+        """Index of the pattern that decides `path` (already relative to base), ignoring its parents"""
+        best = self._paths[is_dir].get(path)
+        name = path.rpartition('/')[2]
+        by_name = self._names[is_dir].get(name)
+        if by_name is not None and (best is None or by_name > best):
+            best = by_name
+        regex = self._regexes[is_dir]
+        if regex is not None:
+            match = regex.fullmatch(path)
+            if match:
+                by_glob = int(match.lastgroup[1:])
+                if best is None or by_glob > best:
+                    best = by_glob
+        return best
+    
+    def decide(self, path: ExPathOrStr, is_dir: bool = False) -> Optional[bool]:
+        """True if ignored, False if re-included by a '!pattern', None if no pattern matches.
+        Doesn't look at parent directories"""
+        which = self.which(path, is_dir, parents=False)
+        if which is None:
+            return None
+        return not which.negated
+    
+    def which(self, path: ExPathOrStr, is_dir: bool = False, *, parents=True) -> Optional[Pattern]:
+        """The pattern that decides whether `path` is ignored. With `parents`, that may be a pattern excluding a parent"""
+        relpath = self._relative(path)
+        if relpath is None:
+            return None
+        if relpath.endswith('/'):
+            relpath = relpath.rstrip('/')
+            is_dir = True
+        if parents:
+            parent = relpath.rpartition('/')[0]
+            if parent and self._is_excluded_dir(parent):
+                # find the top-most excluded parent
+                parts = parent.split('/')
+                for i in range(1, len(parts) + 1):
+                    index = self._last_match('/'.join(parts[:i]), True)
+                    if index is not None and not self.patterns[index].negated:
+                        return self.patterns[index]
+        index = self._last_match(relpath, is_dir)
+        return None if index is None else self.patterns[index]
+    
+    def _is_excluded_dir(self, relpath: str) -> bool:
+        """Whether `relpath` or any of its parents is excluded. Cached; a walk asks about the same directories over and over"""
+        try:
+            return self._excluded_dirs[relpath]
+        except KeyError:
+            pass
+        parent = relpath.rpartition('/')[0]
+        if parent and self._is_excluded_dir(parent):
+            excluded = True
+        else:
+            index = self._last_match(relpath, True)
+            excluded = index is not None and not self.patterns[index].negated
+        self._excluded_dirs[relpath] = excluded
+        return excluded
+    
+    def match(self, path: ExPathOrStr, is_dir: bool = False) -> bool:
+        """Whether git would ignore `path`. Files under an excluded directory are ignored, whatever '!' patterns say"""
+        relpath = self._relative(path)
+        if relpath is None:
+            return False
+        if relpath.endswith('/'):
+            relpath = relpath.rstrip('/')
+            is_dir = True
+        if is_dir:
+            return self._is_excluded_dir(relpath)
+        parent = relpath.rpartition('/')[0]
+        if parent and self._is_excluded_dir(parent):
+            return True
+        index = self._last_match(relpath, False)
+        return index is not None and not self.patterns[index].negated
+    
+    def match_many(self, paths: Iterable[ExPathOrStr]) -> List[bool]:
+        """`match()` for each path. Directories are told apart by a trailing slash"""
+        return [self.match(path) for path in paths]
@@ -0,0 +1,198 @@
+"""Every ignore file git reads, not just ./.gitignore: a .gitignore in any directory, .git/info/exclude and core.excludesFile.
+Each file is compiled once into an IgnoreMatcher, and recompiled only when its mtime (or size) changes."""
+import os
+from typing import Dict, Tuple, Optional, List, Generator, Callable
+
+from igit.ignore.matcher import IgnoreMatcher, Pattern
+from igit.util import shell
+from igit.util.path import ExPathOrStr, gitdir, toplevel
+
+Stamp = Optional[Tuple[int, int, int]]
+
+
+def _stamp(stat: os.stat_result) -> Stamp:
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+class IgnoreTree:
+    """
+    ::
+        tree = IgnoreTree()
+        tree.match('igit/__pycache__', is_dir=True)  # True
+        for reldir, dirs, files in tree.walk():  # like os.walk(), minus anything ignored
+            ...
+    Paths are relative to the top of the working tree.
+    """
+    
+    def __init__(self, root: ExPathOrStr = None):
+        self.root = str(root or toplevel())
+        # {reldir: (stamp, matcher)}; None for both if the directory has no .gitignore
+        self._matchers: Dict[str, Tuple[Stamp, Optional[IgnoreMatcher]]] = {}
+        self._excludes: Dict[str, Tuple[Stamp, Optional[IgnoreMatcher]]] = {}
+        self._excludes_file: Optional[str] = None
+    
+    def relpath(self, path: ExPathOrStr) -> str:
+        """`path` (relative to cwd, or absolute) relative to the top of the working tree"""
+        relpath = os.path.relpath(os.path.abspath(path), self.root)
+        return '' if relpath == '.' else relpath
+    
+    # ** Loading
+    def _load(self, cache: Dict, key: str, path: str, stamp: Stamp, base: str) -> Optional[IgnoreMatcher]:
+        try:
+            cached_stamp, matcher = cache[key]
+            if cached_stamp == stamp:
+                return matcher
+        except KeyError:
+            pass
+        matcher = None if stamp is None else IgnoreMatcher.from_file(path, base=base)
+        cache[key] = stamp, matcher
+        return matcher
+    
+    def matcher(self, reldir: str, stat: os.stat_result = None) -> Optional[IgnoreMatcher]:
+        """The compiled .gitignore of `reldir`, or None if it has none. Pass `stat` if you already have it"""
+        path = os.path.join(self.root, reldir, '.gitignore')
+        if stat is None:
+            try:
+                stat = os.stat(path)
+            except (FileNotFoundError, NotADirectoryError):
+                stat = None
+        stamp = None if stat is None else _stamp(stat)
+        return self._load(self._matchers, reldir, path, stamp, reldir)
+    
+    @property
+    def excludes_file(self) -> str:
+        """core.excludesFile, or its default"""
+        if self._excludes_file is None:
+            configured = shell.runquiet(f'git -C "{self.root}" config --path core.excludesFile', raiseonfail=False)
+            if configured:
+                self._excludes_file = os.path.expanduser(configured)
+            else:
+                config_home = os.environ.get('XDG_CONFIG_HOME') or os.path.expanduser('~/.config')
+                self._excludes_file = os.path.join(config_home, 'git', 'ignore')
+        return self._excludes_file
+    
+    def excludes(self) -> List[IgnoreMatcher]:
+        """.git/info/exclude, then core.excludesFile; in order of precedence"""
+        matchers = []
+        for path in (os.path.join(gitdir(self.root), 'info', 'exclude'), self.excludes_file):
+            try:
+                stamp = _stamp(os.stat(path))
+            except (FileNotFoundError, NotADirectoryError):
+                stamp = None
+            matcher = self._load(self._excludes, path, path, stamp, '')
+            if matcher is not None:
+                matchers.append(matcher)
+        return matchers
+    
+    # ** Matching
+    def _which(self, relpath: str, is_dir: bool, excludes: List[IgnoreMatcher]) -> Optional[Pattern]:
+        """Only uses already loaded matchers. Doesn't look at parent directories"""
+        reldir = relpath
+        while reldir:
+            reldir = reldir.rpartition('/')[0]
+            _, matcher = self._matchers.get(reldir, (None, None))
+            if matcher is not None:
+                # the deepest .gitignore that has an opinion wins
+                pattern = matcher.which(relpath, is_dir, parents=False)
+                if pattern is not None:
+                    return pattern
+        for matcher in excludes:
+            pattern = matcher.which(relpath, is_dir, parents=False)
+            if pattern is not None:
+                return pattern
+        return None
+    
+    def _is_excluded(self, relpath: str, is_dir: bool, excludes: List[IgnoreMatcher]) -> bool:
+        if relpath.rpartition('/')[2] == '.git':
+            return True
+        pattern = self._which(relpath, is_dir, excludes)
+        return pattern is not None and not pattern.negated
+    
+    def which(self, path: ExPathOrStr, is_dir: bool = False) -> Optional[Pattern]:
+        """The pattern that decides whether `path` (relative to cwd) is ignored; maybe one excluding a parent directory"""
+        relpath = self.relpath(path)
+        excludes = self.excludes()
+        parts = relpath.split('/')
+        for i in range(len(parts)):
+            self.matcher('/'.join(parts[:i]))
+        for i in range(1, len(parts)):
+            parent = '/'.join(parts[:i])
+            pattern = self._which(parent, True, excludes)
+            if pattern is not None and not pattern.negated:
+                return pattern
+        return self._which(relpath, is_dir, excludes)
+    
+    def match(self, path: ExPathOrStr, is_dir: bool = False) -> bool:
+        """Whether git would ignore `path` (relative to cwd, or absolute)"""
+        relpath = self.relpath(path)
+        if not relpath:
+            return False
+        if '.git' in relpath.split('/'):
+            return True
+        pattern = self.which(path, is_dir)
+        return pattern is not None and not pattern.negated
+    
+    def pruner(self) -> Callable[[str, bool], bool]:
+        """For other walkers, like ExPath.regex(prune=...): `prune(path, is_dir)` is True if `path` (relative to cwd) is ignored.
+        Expects parents to be seen before their children, and doesn't look at parents; a pruned directory is never descended into.
+        Each directory's .gitignore is loaded when first seen, and not checked again"""
+        excludes = self.excludes()
+        cwd = self.relpath(os.getcwd())
+        loaded = set()
+        
+        def prune(path: str, is_dir: bool) -> bool:
+            if os.path.isabs(path) or path.startswith('..'):
+                relpath = self.relpath(path)
+            else:
+                relpath = f'{cwd}/{path}' if cwd else path
+            reldir = relpath.rpartition('/')[0]
+            if reldir not in loaded:
+                parts = reldir.split('/')
+                for i in range(len(parts) + 1):
+                    ancestor = '/'.join(parts[:i])
+                    if ancestor not in loaded:
+                        self.matcher(ancestor)
+                        loaded.add(ancestor)
+            return self._is_excluded(relpath, is_dir, excludes)
+        
+        return prune
+    
+    def walk(self, top: ExPathOrStr = None) -> Generator[Tuple[str, List[str], List[str]], None, None]:
+        """Like os.walk(), but never descends into ignored directories, and leaves ignored files out.
+        Yields paths relative to the top of the working tree. Like os.walk(), `dirs` can be pruned in place"""
+        top = '' if top is None else self.relpath(top)
+        excludes = self.excludes()
+        if top:
+            # make sure the parents' .gitignore files are loaded
+            parts = top.split('/')
+            for i in range(len(parts)):
+                self.matcher('/'.join(parts[:i]))
+        stack = [top]
+        while stack:
+            reldir = stack.pop()
+            try:
+                with os.scandir(os.path.join(self.root, reldir)) as scandir:
+                    entries = list(scandir)
+            except (FileNotFoundError, NotADirectoryError, PermissionError):
+                continue
+            gitignore = next((entry for entry in entries if entry.name == '.gitignore'), None)
+            self.matcher(reldir, gitignore.stat() if gitignore is not None else None)
+            dirs = []
+            files = []
+            for entry in entries:
+                relpath = f'{reldir}/{entry.name}' if reldir else entry.name
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if self._is_excluded(relpath, is_dir, excludes):
+                    continue
+                if is_dir:
+                    dirs.append(entry.name)
+                else:
+                    files.append(entry.name)
+            yield reldir, dirs, files
+            stack.extend(f'{reldir}/{name}' if reldir else name for name in reversed(dirs))
+    
+    def files(self, top: ExPathOrStr = None) -> Generator[str, None, None]:
+        """Every file that isn't ignored, relative to the top of the working tree"""
+        for reldir, _, files in self.walk(top):
+            for name in files:
+                yield f'{reldir}/{name}' if reldir else name
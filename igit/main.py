@@ -1,6 +1,6 @@
 #!/usr/bin/env python3.8
 from prompt_toolkit import prompt as ptprompt, print_formatted_text, HTML, formatted_text, PromptSession
-from prompt_toolkit.completion import WordCompleter
+from prompt_toolkit.completion import WordCompleter, merge_completers
 from prompt_toolkit.styles import Style
 from prompt_toolkit.history import InMemoryHistory
 from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
@@ -9,6 +9,8 @@ import os
 from igit.branch import BranchTree
 from igit.commit import CommitTree
 from igit.repo import Repo
+from igit.status import Status
+from igit.util.completion import SearchCompleter
 
 
 def bottom_toolbar():
@@ -18,23 +20,28 @@ def bottom_toolbar():
 btree = BranchTree()
 ctree = CommitTree()
 repo = Repo()
+status = Status()
 
 uname = os.getlogin()
 session = PromptSession(clipboard=True)
 # prompt_continuation? input_preprocessors, erase_when_done, inputhook, input, output
 # style = Style([('prompt', '#3c055a bold'), ])
 style = Style([('prompt', '#00AFF9 bold'), ])
-completer = WordCompleter([f'%{a}' for a in ['a',  # add
-                                             'br',  # branch
-                                             'c',  # commit
-                                             'co',  # checkout
-                                             'f',  # fetch
-                                             'l',  # log
-                                             'p',  # push
-                                             'pl',  # pull
-                                             'm',  # merge
-                                             'st',  # status
-                                             ]])
+commands = WordCompleter([f'%{a}' for a in ['a',  # add
+                                            'br',  # branch
+                                            'c',  # commit
+                                            'co',  # checkout
+                                            'f',  # fetch
+                                            'l',  # log
+                                            'p',  # push
+                                            'pl',  # pull
+                                            'm',  # merge
+                                            'st',  # status
+                                            ]])
+# read on every completion, so they follow fetches and index changes; neither fetches nor runs git
+completer = merge_completers([commands,
+                              SearchCompleter(lambda: btree.known_branchnames, 'branch'),
+                              SearchCompleter(lambda: status.tracked_paths, 'file')])
 
 
 def get_rprompt():
@@ -50,7 +57,7 @@ while True:
             completer=completer,
             complete_while_typing=True,
             bottom_toolbar=bottom_toolbar,
-            rprompt=get_rprompt()
+            rprompt=get_rprompt
             )
     if text in ('q', 'quit'):
         break
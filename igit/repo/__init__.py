@@ -1 +1,4 @@
 from .repo import Repo
+from . import refs
+
+__all__ = ['Repo', 'refs']
@@ -0,0 +1,146 @@
+"""One `git fetch --all` per repo per INTERVAL, shared by every igit process through a lock file in .git/igit/.
+Commands read the last-known refs right away and let the fetch run in the background (`schedule()`),
+or block on it when they must be up to date (`fetch()`)."""
+import os
+import subprocess as sp
+import time
+from typing import Optional
+
+from igit.util import shell, termcolor, trace
+from igit.util.path import ExPath, gitdir, igitdir
+
+# seconds between two background fetches of the same repo
+INTERVAL = float(os.environ.get('IGIT_FETCH_INTERVAL', 300))
+# a lock older than this was left behind by a fetch that died
+STALE_LOCK = 600
+
+
+def _lockpath() -> ExPath:
+    return igitdir() / 'fetch.lock'
+
+
+def _attemptpath() -> ExPath:
+    return igitdir() / 'fetch.attempted'
+
+
+def _try_lock(lockpath: ExPath) -> bool:
+    try:
+        fd = os.open(lockpath, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, 'w') as file:
+        file.write(str(os.getpid()))
+    return True
+
+
+def _unlock(lockpath: ExPath):
+    try:
+        os.remove(lockpath)
+    except FileNotFoundError:
+        pass
+
+
+def _lock_owner(lockpath: ExPath) -> Optional[int]:
+    """None if not locked, 0 if locked but the pid isn't written yet"""
+    try:
+        with open(lockpath) as file:
+            content = file.read().strip()
+    except FileNotFoundError:
+        return None
+    return int(content) if content.isdigit() else 0
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def last_fetched() -> float:
+    """Epoch time of the last fetch of this repo, by igit or not. 0 if never fetched."""
+    try:
+        return (gitdir() / 'FETCH_HEAD').stat().st_mtime
+    except FileNotFoundError:
+        return 0
+
+
+def last_attempted() -> float:
+    """Epoch time igit last started a fetch of this repo, whether or not it succeeded. 0 if never"""
+    try:
+        return _attemptpath().stat().st_mtime
+    except FileNotFoundError:
+        return 0
+
+
+def _mark_attempt():
+    _attemptpath().touch()
+
+
+def is_running() -> bool:
+    """Whether any process is fetching this repo through igit right now"""
+    lockpath = _lockpath()
+    pid = _lock_owner(lockpath)
+    if pid is None:
+        return False
+    try:
+        age = time.time() - lockpath.stat().st_mtime
+    except FileNotFoundError:
+        return False
+    if age > STALE_LOCK or (pid and not _is_alive(pid)):
+        print(termcolor.yellow(f'Removing stale fetch lock: {lockpath} (pid: {pid}, age: {age:.0f}s)'))
+        _unlock(lockpath)
+        return False
+    return True
+
+
+def schedule(interval: float = INTERVAL) -> bool:
+    """Starts `git fetch --all` in a detached background process, unless one is already running,
+    or the last fetch (or failed attempt, like when offline) is fresher than `interval` seconds.
+    Returns whether a fetch was started."""
+    if time.time() - max(last_fetched(), last_attempted()) < interval:
+        return False
+    if is_running():
+        return False
+    lockpath = _lockpath()
+    if not _try_lock(lockpath):
+        return False
+    _mark_attempt()
+    # the shell takes over the lock, and releases it when the fetch is done, even after we exit.
+    # Nobody is there to answer a credentials prompt, so git and ssh fail instead of asking.
+    # A user's own GIT_SSH_COMMAND, GIT_SSH or core.sshCommand is left alone
+    script = ('echo $$ > "$0"; '
+              'if [ -z "$GIT_SSH_COMMAND" ] && [ -z "$GIT_SSH" ] && ! git config core.sshCommand > /dev/null; then '
+              'export GIT_SSH_COMMAND="ssh -oBatchMode=yes"; fi; '
+              'git fetch --all --quiet; rm -f "$0"')
+    sp.Popen(['sh', '-c', script, str(lockpath)], env=dict(os.environ, GIT_TERMINAL_PROMPT='0'),
+             stdin=sp.DEVNULL, stdout=sp.DEVNULL, stderr=sp.DEVNULL, start_new_session=True)
+    return True
+
+
+def wait(timeout: float = None) -> bool:
+    """Blocks until a running fetch finishes. Returns False if timed out."""
+    start = time.time()
+    while is_running():
+        if timeout is not None and time.time() - start > timeout:
+            return False
+        time.sleep(0.1)
+    return True
+
+
+def fetch():
+    """Fetches in the foreground. If a fetch is already running, waits for it instead of fetching twice."""
+    lockpath = _lockpath()
+    if is_running() or not _try_lock(lockpath):
+        print(termcolor.lightgrey('Waiting for a running fetch...'))
+        with trace.span('fetch: waiting for background fetch'):
+            wait()
+        return
+    try:
+        _mark_attempt()
+        shell.runquiet('git fetch --all')
+    finally:
+        _unlock(lockpath)
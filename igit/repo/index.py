@@ -0,0 +1,236 @@
+"""Reads .git/index (DIRC versions 2, 3 and 4) without spawning git.
+Extensions (cached tree, resolve-undo, untracked cache...) are skipped.
+Entries are kept column-wise in arrays, in git's own sorted path order, so lookups are a bisect away."""
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left
+from typing import NamedTuple, Optional, List, Iterator, Tuple
+
+from igit.util import shell, termcolor
+from igit.util.path import ExPath, ExPathOrStr, gitdir, toplevel
+
+# ctime s, ctime ns, mtime s, mtime ns, dev, ino, mode, uid, gid, size
+_STAT = struct.Struct('>10I')
+_HEADER = struct.Struct('>4sII')
+_FLAGS = struct.Struct('>H')
+_EXTENDED = 0x4000
+_NAME_MASK = 0x0FFF
+_STAGE_SHIFT = 12
+_EXTENSION = struct.Struct('>4sI')
+_SPLIT_INDEX = b'link'
+
+
+class IndexEntry(NamedTuple):
+    path: str
+    mode: int
+    sha: str
+    size: int
+    mtime_ns: int
+    stage: int
+
+
+def _hash_size(_gitdir: ExPath) -> int:
+    """32 if the repo's extensions.objectFormat is sha256, else 20. Reads the config directly, no git"""
+    commondir = _gitdir / 'commondir'
+    if commondir.is_file():
+        # a linked worktree; the config is the main repo's
+        _gitdir = _gitdir / commondir.read_text().strip()
+    try:
+        with open(_gitdir / 'config') as file:
+            lines = file.read().splitlines()
+    except FileNotFoundError:
+        return 20
+    section = None
+    for line in lines:
+        line = line.strip()
+        if line.startswith('['):
+            section = line[1:line.find(']')].strip().lower()
+            line = line[line.find(']') + 1:].strip()
+        if section != 'extensions' or not line or line[0] in '#;':
+            continue
+        key, _, value = line.partition('=')
+        if key.strip().lower() == 'objectformat':
+            value = value.split('#')[0].split(';')[0].strip().strip('"').lower()
+            return 32 if value == 'sha256' else 20
+    return 20
+
+
+def _varint(data, pos: int) -> Tuple[int, int]:
+    """The offset encoding used by v4 path prefixes (same as ofs-delta). Returns (value, new pos)"""
+    byte = data[pos]
+    pos += 1
+    value = byte & 0x7f
+    while byte & 0x80:
+        byte = data[pos]
+        pos += 1
+        value = ((value + 1) << 7) | (byte & 0x7f)
+    return value, pos
+
+
+class GitIndex:
+    """
+    ::
+        index = GitIndex()
+        'igit/main.py' in index  # True
+        index['igit/main.py']  # IndexEntry(path='igit/main.py', mode=33188, sha='4f2a...', size=1024, ...)
+        index.paths_under('igit/util')  # ['igit/util/__init__.py', ...]
+    Lookups take paths relative to cwd (or absolute), like the rest of igit.
+    `paths` are relative to the top of the working tree, like git's.
+    """
+    
+    def __init__(self, path: ExPathOrStr = None):
+        _gitdir = gitdir()
+        self.path = ExPath(path or _gitdir / 'index')
+        self.root = toplevel()
+        self.version = 0
+        self.paths: List[str] = []
+        self.modes = array('I')
+        self.sizes = array('Q')
+        self.mtimes = array('Q')
+        self.stages = array('B')
+        self._shas = bytearray()
+        self._hash_size = _hash_size(_gitdir)
+        self._load()
+    
+    def __len__(self):
+        return len(self.paths)
+    
+    def __contains__(self, path: ExPathOrStr) -> bool:
+        return self._find(path) is not None
+    
+    def __getitem__(self, path: ExPathOrStr) -> IndexEntry:
+        i = self._find(path)
+        if i is None:
+            raise KeyError(path)
+        return self._entry(i)
+    
+    def __iter__(self) -> Iterator[IndexEntry]:
+        return map(self._entry, range(len(self.paths)))
+    
+    def get(self, path: ExPathOrStr) -> Optional[IndexEntry]:
+        i = self._find(path)
+        return None if i is None else self._entry(i)
+    
+    def relpath(self, path: ExPathOrStr) -> str:
+        """`path` (relative to cwd, or absolute) as an index path"""
+        relpath = os.path.relpath(os.path.abspath(path), self.root)
+        return '' if relpath == '.' else relpath
+    
+    def is_tracked(self, path: ExPathOrStr) -> bool:
+        """True if `path` is a tracked file, or a directory with tracked files under it"""
+        return path in self or self.has_under(path)
+    
+    def has_under(self, directory: ExPathOrStr) -> bool:
+        prefix = self._dirprefix(directory)
+        i = bisect_left(self.paths, prefix)
+        return i < len(self.paths) and self.paths[i].startswith(prefix)
+    
+    def paths_under(self, directory: ExPathOrStr) -> List[str]:
+        prefix = self._dirprefix(directory)
+        start = bisect_left(self.paths, prefix)
+        # every path starting with 'dir/' sorts between 'dir/' and 'dir0' ('0' comes right after '/')
+        stop = bisect_left(self.paths, prefix[:-1] + '0', lo=start) if prefix else len(self.paths)
+        return self.paths[start:stop]
+    
+    def _dirprefix(self, directory: ExPathOrStr) -> str:
+        relpath = self.relpath(directory)
+        return relpath + '/' if relpath else ''
+    
+    def _find(self, path: ExPathOrStr) -> Optional[int]:
+        relpath = self.relpath(path)
+        i = bisect_left(self.paths, relpath)
+        if i < len(self.paths) and self.paths[i] == relpath:
+            return i
+        return None
+    
+    def _entry(self, i: int) -> IndexEntry:
+        sha = self._shas[i * self._hash_size:(i + 1) * self._hash_size].hex()
+        return IndexEntry(self.paths[i], self.modes[i], sha, self.sizes[i], self.mtimes[i], self.stages[i])
+    
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as file:
+                if not os.fstat(file.fileno()).st_size:
+                    return
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    self._parse(data)
+        except FileNotFoundError:
+            # fresh repo, nothing staged yet
+            return
+    
+    def _parse(self, data):
+        signature, self.version, count = _HEADER.unpack_from(data, 0)
+        if signature != b'DIRC':
+            raise ValueError(f"{self.path} is not a git index (signature: {signature})")
+        if self.version not in (2, 3, 4):
+            raise NotImplementedError(f"index version {self.version} is not supported", self.path)
+        hash_size = self._hash_size
+        unpack_stat = _STAT.unpack_from
+        unpack_flags = _FLAGS.unpack_from
+        paths = self.paths
+        modes, sizes, mtimes, stages = self.modes, self.sizes, self.mtimes, self.stages
+        shas = self._shas
+        v4 = self.version == 4
+        pos = _HEADER.size
+        prevpath = b''
+        for _ in range(count):
+            start = pos
+            _, _, mtime_s, mtime_ns, _, _, mode, _, _, size = unpack_stat(data, pos)
+            pos += _STAT.size
+            shas += data[pos:pos + hash_size]
+            pos += hash_size
+            flags, = unpack_flags(data, pos)
+            pos += 2
+            if flags & _EXTENDED:
+                pos += 2
+            if v4:
+                strip, pos = _varint(data, pos)
+                end = data.find(b'\0', pos)
+                path = prevpath[:len(prevpath) - strip] + data[pos:end]
+                pos = end + 1
+                prevpath = path
+            else:
+                namelen = flags & _NAME_MASK
+                if namelen < _NAME_MASK:
+                    end = pos + namelen
+                else:
+                    end = data.find(b'\0', pos)
+                path = data[pos:end]
+                # 1-8 NULs pad the entry to a multiple of 8 bytes
+                pos = start + ((end - start + 8) & ~7)
+            paths.append(path.decode('utf-8', 'surrogateescape'))
+            modes.append(mode)
+            sizes.append(size)
+            mtimes.append(mtime_s * 1_000_000_000 + mtime_ns)
+            stages.append((flags >> _STAGE_SHIFT) & 0b11)
+        # extensions until the trailing checksum; only their signatures matter
+        end = len(data) - hash_size
+        while pos + _EXTENSION.size <= end:
+            signature, size = _EXTENSION.unpack_from(data, pos)
+            if signature == _SPLIT_INDEX:
+                # the entries we read are only a delta over a shared index; let git merge them
+                print(termcolor.yellow(f"{self.path} is a split index, falling back to `git ls-files`"))
+                self._load_from_git()
+                return
+            pos += _EXTENSION.size + size
+    
+    def _load_from_git(self):
+        """Slow path, without sizes or mtimes"""
+        self.paths.clear()
+        for array_ in (self.modes, self.sizes, self.mtimes, self.stages):
+            del array_[:]
+        self._shas.clear()
+        out = shell.runraw(f'git -C "{self.root}" ls-files --stage -z')
+        for record in out.split(b'\0'):
+            if not record:
+                continue
+            info, _, path = record.partition(b'\t')
+            mode, sha, stage = info.split()
+            self.paths.append(path.decode('utf-8', 'surrogateescape'))
+            self.modes.append(int(mode, 8))
+            self.sizes.append(0)
+            self.mtimes.append(0)
+            self.stages.append(int(stage))
+            self._shas += bytes.fromhex(sha.decode())
@@ -0,0 +1,84 @@
+import os
+from typing import Dict
+
+from igit.util import shell
+from igit.util.path import ExPath, gitdir
+
+
+def commondir(_gitdir: ExPath = None) -> ExPath:
+    """Where refs and packed-refs live. Same as the git dir, unless in a linked worktree"""
+    if _gitdir is None:
+        _gitdir = gitdir()
+    try:
+        with open(_gitdir / 'commondir') as file:
+            return ExPath(os.path.join(_gitdir, file.read().strip()))
+    except FileNotFoundError:
+        return _gitdir
+
+
+def _read_packed_refs(_commondir: ExPath, prefix: str) -> Dict[str, str]:
+    refs = {}
+    try:
+        with open(_commondir / 'packed-refs', 'rb') as file:
+            data = file.read()
+    except FileNotFoundError:
+        return refs
+    for line in data.splitlines():
+        # skip '# pack-refs with: ...' header and '^<SHA1>' peeled tag lines
+        if not line or line[0] in b'#^':
+            continue
+        sha, _, ref = line.decode().partition(' ')
+        if ref.startswith(prefix):
+            refs[ref] = sha
+    return refs
+
+
+def _read_loose_refs(_commondir: ExPath, prefix: str) -> Dict[str, str]:
+    refs = {}
+    stack = [prefix.rstrip('/')]
+    while stack:
+        ref_dir = stack.pop()
+        try:
+            entries = os.scandir(_commondir / ref_dir)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        with entries:
+            for entry in entries:
+                ref = f'{ref_dir}/{entry.name}'
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(ref)
+                    continue
+                if entry.name.endswith('.lock'):
+                    continue
+                with open(entry.path, 'rb') as file:
+                    content = file.read().strip().decode()
+                if content.startswith('ref: '):
+                    # symbolic ref, like refs/remotes/origin/HEAD
+                    continue
+                refs[ref] = content
+    return refs
+
+
+def read_refs(prefix: str = 'refs/') -> Dict[str, str]:
+    """{'refs/remotes/origin/master': <SHA1>, ...}, read straight from .git/refs/** and .git/packed-refs.
+    Loose refs take precedence over packed ones, like in git."""
+    _commondir = commondir()
+    if (_commondir / 'reftable').is_dir():
+        # reftable backend; no plain files to read
+        lines = shell.runquiet(f'git for-each-ref --format="%(objectname) %(refname)" {prefix}').splitlines()
+        return dict(reversed(line.split(' ', maxsplit=1)) for line in lines)
+    refs = _read_packed_refs(_commondir, prefix)
+    refs.update(_read_loose_refs(_commondir, prefix))
+    return refs
+
+
+def remote_branches(remote: str = 'origin') -> Dict[str, str]:
+    """{'master': <SHA1>}, as of the last fetch"""
+    prefix = f'refs/remotes/{remote}/'
+    return {ref[len(prefix):]: sha for ref, sha in sorted(read_refs(prefix).items()) if ref != f'{prefix}HEAD'}
+
+
+def local_branches() -> Dict[str, str]:
+    """{'master': <SHA1>}"""
+    prefix = 'refs/heads/'
+    return {ref[len(prefix):]: sha for ref, sha in sorted(read_refs(prefix).items())}
@@ -1,20 +1,17 @@
 import re
 import sys
 
-from igit.util import shell, termcolor
+from igit.util import shell, termcolor, cachedprop
 
 
 class Repo:
-    _url = ''
     _weburl = ''
     _host = ''
     _name = ''
     
-    @property
+    @cachedprop(depends_on=('config',), persist=True)
     def url(self) -> str:
-        if not self._url:
-            self._url = shell.runquiet('git remote get-url origin')
-        return self._url
+        return shell.runquiet('git remote get-url origin')
     
     @property
     def host(self) -> str:
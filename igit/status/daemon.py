@@ -0,0 +1,473 @@
+"""An optional background process that keeps `git status` warm, so Status doesn't have to run it.
+It watches the worktree with inotify (or by polling stats where inotify isn't available),
+plus the index, HEAD and the branch HEAD points to (loose or packed), and re-runs `git status` only for the paths that changed since it was last asked.
+Answers queries over .git/igit/status.sock; Status falls back to running git when no daemon is listening.
+::
+    igit statusd start
+"""
+import ctypes
+import ctypes.util
+import errno
+import json
+import os
+import selectors
+import socket
+import struct
+import subprocess as sp
+import sys
+import time
+from typing import Dict, Set, List, Optional, Tuple
+
+from igit.status import porcelain
+from igit.status.porcelain import StatusEntry
+from igit.repo.index import GitIndex
+from igit.util import termcolor, trace
+from igit.util.path import gitdir, igitdir, toplevel
+
+# exits after this many seconds without queries
+IDLE_TIMEOUT = int(os.environ.get('IGIT_STATUSD_IDLE', 60 * 60))
+POLL_INTERVAL = 1
+# more changed paths than this, and a single full `git status` is cheaper
+MAX_PATHSPECS = 1000
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+WORKTREE_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+                 | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK)
+GITDIR_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+# files under .git that change what `git status` says
+GITDIR_FILES = {'index', 'HEAD', 'MERGE_HEAD', 'CHERRY_PICK_HEAD', 'REVERT_HEAD'}
+# shared by all worktrees; besides these, the loose ref of the branch HEAD points to
+COMMONDIR_FILES = {'packed-refs'}
+REFS_DIR = 'refs/heads'
+_EVENT = struct.Struct('iIII')
+
+
+def sockpath() -> str:
+    return str(igitdir() / 'status.sock')
+
+
+# ** Client
+def query(timeout: float = 1) -> Optional[List[StatusEntry]]:
+    """Returns None if no daemon is running for this repository"""
+    try:
+        path = sockpath()
+    except FileNotFoundError:
+        return None
+    if not os.path.exists(path):
+        return None
+    try:
+        reply = _request(path, b'status', timeout)
+    except (ConnectionRefusedError, FileNotFoundError):
+        # daemon died without cleaning up
+        _unlink(path)
+        return None
+    except OSError as e:
+        print(termcolor.yellow(f'igit status daemon: {e.__class__.__name__}: {e}. Running git status instead'))
+        return None
+    if not reply:
+        # git status failed in the daemon
+        return None
+    return [StatusEntry(*fields) for fields in json.loads(reply)]
+
+
+def stop(timeout: float = 1) -> bool:
+    try:
+        return _request(sockpath(), b'stop', timeout) == b'ok'
+    except OSError:
+        return False
+
+
+def _request(path: str, request: bytes, timeout: float) -> bytes:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(path)
+        client.sendall(request + b'\n')
+        client.shutdown(socket.SHUT_WR)
+        chunks = []
+        while True:
+            chunk = client.recv(65536)
+            if not chunk:
+                return b''.join(chunks)
+            chunks.append(chunk)
+
+
+def spawn():
+    """Starts a detached daemon for the current repository"""
+    sp.Popen([sys.executable, '-m', 'igit.status.daemon'], cwd=str(toplevel()),
+             stdin=sp.DEVNULL, stdout=sp.DEVNULL, stderr=sp.DEVNULL, start_new_session=True)
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+# ** Server
+class StatusCache:
+    """The last `git status`, by path. Changed paths are only re-checked when asked"""
+    
+    def __init__(self, root: str):
+        self.root = root
+        self.entries: Dict[str, StatusEntry] = {}
+        self.index: Optional[GitIndex] = None
+        self.changed: Set[str] = set()
+        self.stale = True
+    
+    def mark(self, relpath: str):
+        if os.path.basename(relpath) == '.gitignore':
+            # may (un)ignore anything under it
+            self.stale = True
+        else:
+            self.changed.add(relpath)
+    
+    def get(self) -> List[StatusEntry]:
+        if self.stale or len(self.changed) > MAX_PATHSPECS:
+            self.index = GitIndex()
+            self.entries = {entry.path: entry for entry in self._status()}
+            self.stale = False
+        elif self.changed:
+            pathspecs = self._pathspecs()
+            for path in list(self.entries):
+                stripped = path.rstrip('/')
+                if any(stripped == spec or stripped.startswith(spec + '/') for spec in pathspecs):
+                    del self.entries[path]
+            for entry in self._status(pathspecs):
+                self.entries[entry.path] = entry
+        self.changed.clear()
+        # same order as git: tracked first, then untracked
+        return sorted(self.entries.values(), key=lambda entry: (entry.xy == '??', entry.path))
+    
+    def _pathspecs(self) -> Set[str]:
+        pathspecs = set()
+        for path in sorted(self.changed):
+            path = self._untracked_ancestor(path) or path
+            if not any(path.startswith(spec + '/') for spec in pathspecs):
+                pathspecs.add(path)
+        return pathspecs
+    
+    def _untracked_ancestor(self, path: str) -> Optional[str]:
+        """git collapses untracked directories ('? newdir/'), so they have to be re-checked as a whole"""
+        parts = path.split('/')[:-1]
+        for i in range(1, len(parts) + 1):
+            ancestor = '/'.join(parts[:i])
+            if not self.index.has_under(os.path.join(self.root, ancestor)):
+                return ancestor
+        return None
+    
+    def _status(self, pathspecs=()) -> List[StatusEntry]:
+        cmd = ['git', 'status', '--porcelain=v2', '-z']
+        if pathspecs:
+            cmd += ['--', *pathspecs]
+        # without optional locks, git status won't rewrite .git/index (which we'd then see as a change)
+        env = dict(os.environ, GIT_OPTIONAL_LOCKS='0', GIT_LITERAL_PATHSPECS='1')
+        start = time.time()
+        out = sp.run(cmd, cwd=self.root, env=env, stdout=sp.PIPE, stderr=sp.DEVNULL, check=True).stdout
+        if trace.path:
+            trace.command(' '.join(cmd), start, 0, len(out))
+        return list(porcelain.parse(out))
+
+
+def _commondir(_gitdir: str) -> str:
+    """Where refs live. The gitdir itself, unless it's a linked worktree's"""
+    try:
+        with open(os.path.join(_gitdir, 'commondir')) as file:
+            return os.path.normpath(os.path.join(_gitdir, file.read().strip()))
+    except FileNotFoundError:
+        return _gitdir
+
+
+def _head_ref(_gitdir: str) -> Optional[str]:
+    """Like 'refs/heads/master'. None if HEAD is detached"""
+    try:
+        with open(os.path.join(_gitdir, 'HEAD')) as file:
+            head = file.read().strip()
+    except FileNotFoundError:
+        return None
+    if head.startswith('ref:'):
+        return head[len('ref:'):].strip()
+    return None
+
+
+def _ignored_dirs(root: str) -> Set[str]:
+    """So we don't spend inotify watches on node_modules and friends"""
+    out = sp.run(['git', 'ls-files', '-z', '--others', '--ignored', '--exclude-standard', '--directory'],
+                 cwd=root, stdout=sp.PIPE, stderr=sp.DEVNULL).stdout
+    return {path.decode('utf-8', 'surrogateescape').rstrip('/') for path in out.split(b'\0') if path.endswith(b'/')}
+
+
+def _walk_dirs(root: str, relpath: str, skip: Set[str]):
+    """Yields `relpath` and the relative paths of all directories under it"""
+    stack = [relpath]
+    while stack:
+        relpath = stack.pop()
+        yield relpath
+        try:
+            with os.scandir(os.path.join(root, relpath)) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False) and entry.name != '.git':
+                        child = os.path.join(relpath, entry.name) if relpath else entry.name
+                        if child not in skip:
+                            stack.append(child)
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            continue
+
+
+class InotifyWatcher:
+    """Marks changed paths on a StatusCache as inotify reports them. Linux only"""
+    
+    def __init__(self, root: str, _gitdir: str, cache: StatusCache):
+        libname = ctypes.util.find_library('c')
+        self._libc = ctypes.CDLL(libname, use_errno=True)
+        if not hasattr(self._libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, 'inotify is not available')
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+        self.root = root
+        self.gitdir = _gitdir
+        self.commondir = _commondir(_gitdir)
+        self.cache = cache
+        self._dirs: Dict[int, str] = {}
+        # wd: dir relative to commondir, like 'refs/heads/feature'
+        self._refdirs: Dict[int, str] = {}
+        self._gitdir_wd = None
+        self.watch_all()
+        # the same wd as the gitdir's, unless this is a linked worktree
+        self._commondir_wd = self._add_watch(self.commondir, GITDIR_MASK)
+        self.watch_refs(REFS_DIR)
+    
+    def fileno(self) -> int:
+        return self.fd
+    
+    def close(self):
+        os.close(self.fd)
+    
+    def _add_watch(self, path: str, mask: int) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error == errno.ENOSPC:
+                raise OSError(error, 'out of inotify watches (see /proc/sys/fs/inotify/max_user_watches)')
+            if error not in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                raise OSError(error, os.strerror(error))
+        return wd
+    
+    def watch_all(self):
+        for wd in list(self._dirs):
+            self._libc.inotify_rm_watch(self.fd, wd)
+        self._dirs.clear()
+        self._ignored = _ignored_dirs(self.root)
+        self.watch(self.root, '')
+        self._gitdir_wd = self._add_watch(self.gitdir, GITDIR_MASK)
+    
+    def watch(self, root: str, relpath: str):
+        for reldir in _walk_dirs(root, relpath, self._ignored):
+            wd = self._add_watch(os.path.join(root, reldir), WORKTREE_MASK)
+            if wd >= 0:
+                self._dirs[wd] = reldir
+    
+    def watch_refs(self, relpath: str):
+        """Loose refs nest in directories by their slashes (refs/heads/feature/login)"""
+        for reldir in _walk_dirs(self.commondir, relpath, set()):
+            wd = self._add_watch(os.path.join(self.commondir, reldir), GITDIR_MASK | IN_ONLYDIR)
+            if wd >= 0:
+                self._refdirs[wd] = reldir
+    
+    def read(self):
+        """Drains pending events without blocking"""
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return
+            self._handle(data)
+    
+    def _handle(self, data: bytes):
+        pos = 0
+        while pos < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, pos)
+            pos += _EVENT.size
+            name = os.fsdecode(data[pos:pos + length].rstrip(b'\0'))
+            pos += length
+            if mask & IN_Q_OVERFLOW:
+                self.cache.stale = True
+                continue
+            if wd in (self._gitdir_wd, self._commondir_wd):
+                if (wd == self._gitdir_wd and name in GITDIR_FILES
+                        or wd == self._commondir_wd and name in COMMONDIR_FILES):
+                    self.cache.stale = True
+                continue
+            refdir = self._refdirs.get(wd)
+            if refdir is not None:
+                if mask & IN_IGNORED:
+                    del self._refdirs[wd]
+                elif mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        self.watch_refs(f'{refdir}/{name}')
+                elif f'{refdir}/{name}' == _head_ref(self.gitdir):
+                    # the branch moved (commit, reset, pull...)
+                    self.cache.stale = True
+                continue
+            reldir = self._dirs.get(wd)
+            if reldir is None:
+                continue
+            if mask & IN_IGNORED:
+                del self._dirs[wd]
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                continue
+            relpath = os.path.join(reldir, name) if reldir else name
+            if relpath == '.git' or relpath in self._ignored:
+                continue
+            self.cache.mark(relpath)
+            if name == '.gitignore':
+                self.watch_all()
+            elif mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self.watch(self.root, relpath)
+
+
+class PollingWatcher:
+    """Where inotify isn't available: diffs stat snapshots of the worktree.
+    Still saves running `git status` over paths that didn't change"""
+    
+    def __init__(self, root: str, _gitdir: str, cache: StatusCache):
+        self.root = root
+        self.gitdir = _gitdir
+        self.commondir = _commondir(_gitdir)
+        self.cache = cache
+        self._ignored = _ignored_dirs(root)
+        self._snapshot = self._stat_all()
+    
+    def fileno(self):
+        return None
+    
+    def close(self):
+        pass
+    
+    def _stat_all(self) -> Dict[str, Tuple[int, int, int]]:
+        snapshot = {}
+        gitfiles = [os.path.join(self.gitdir, name) for name in GITDIR_FILES]
+        gitfiles += [os.path.join(self.commondir, name) for name in COMMONDIR_FILES]
+        head_ref = _head_ref(self.gitdir)
+        if head_ref:
+            gitfiles.append(os.path.join(self.commondir, head_ref))
+        for gitfile in gitfiles:
+            try:
+                stat = os.stat(gitfile)
+            except FileNotFoundError:
+                continue
+            snapshot[os.path.join('.git', os.path.relpath(gitfile, self.gitdir))] = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        for reldir in _walk_dirs(self.root, '', self._ignored):
+            try:
+                with os.scandir(os.path.join(self.root, reldir)) as entries:
+                    for entry in entries:
+                        if entry.name == '.git':
+                            continue
+                        stat = entry.stat(follow_symlinks=False)
+                        relpath = os.path.join(reldir, entry.name) if reldir else entry.name
+                        snapshot[relpath] = (stat.st_mtime_ns, stat.st_size, stat.st_mode)
+            except FileNotFoundError:
+                continue
+        return snapshot
+    
+    def read(self):
+        snapshot = self._stat_all()
+        old = self._snapshot
+        for relpath in old.keys() ^ snapshot.keys() | {p for p in snapshot.keys() & old.keys() if snapshot[p] != old[p]}:
+            if relpath.startswith('.git' + os.sep):
+                self.cache.stale = True
+            else:
+                self.cache.mark(relpath)
+        self._snapshot = snapshot
+
+
+def serve():
+    """Runs in the foreground until stopped, or idle for IDLE_TIMEOUT seconds"""
+    root = str(toplevel())
+    _gitdir = str(gitdir())
+    path = sockpath()
+    cache = StatusCache(root)
+    try:
+        watcher = InotifyWatcher(root, _gitdir, cache)
+    except OSError as e:
+        print(termcolor.yellow(f'inotify: {e}. Polling instead'))
+        watcher = PollingWatcher(root, _gitdir, cache)
+    
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        server.connect(path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        _unlink(path)
+    else:
+        server.close()
+        print(termcolor.yellow(f'a status daemon is already listening on {path}'))
+        return
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen()
+    selector = selectors.DefaultSelector()
+    selector.register(server, selectors.EVENT_READ)
+    if watcher.fileno() is not None:
+        selector.register(watcher, selectors.EVENT_READ)
+    cache.get()  # warm up
+    print(termcolor.green(f'igit status daemon listening on {path}'))
+    last_query = time.monotonic()
+    try:
+        while time.monotonic() - last_query < IDLE_TIMEOUT:
+            for key, _ in selector.select(timeout=POLL_INTERVAL):
+                if key.fileobj is watcher:
+                    watcher.read()
+                    continue
+                conn, _ = server.accept()
+                with conn:
+                    last_query = time.monotonic()
+                    if not _answer(conn, watcher, cache):
+                        return
+    finally:
+        selector.close()
+        server.close()
+        watcher.close()
+        _unlink(path)
+
+
+def _answer(conn: socket.socket, watcher, cache: StatusCache) -> bool:
+    """Returns False when asked to stop"""
+    conn.settimeout(1)
+    try:
+        request = conn.recv(64).strip()
+        if request == b'stop':
+            conn.sendall(b'ok')
+            return False
+        if request == b'status':
+            # events for edits made right before the query may still be queued
+            watcher.read()
+            entries = cache.get()
+            conn.sendall(json.dumps([[e.xy, e.mode, e.path, e.origpath] for e in entries]).encode())
+    except OSError as e:
+        print(termcolor.yellow(f'{e.__class__.__name__}: {e}'))
+    except sp.CalledProcessError as e:
+        # e.g. in the middle of a rebase; answer nothing, so the client runs git itself
+        print(termcolor.yellow(f'{e.__class__.__name__}: {e}'))
+        cache.stale = True
+    return True
+
+
+if __name__ == '__main__':
+    serve()
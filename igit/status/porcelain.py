@@ -0,0 +1,84 @@
+"""Parser for `git status --porcelain=v2 -z`.
+Scans the raw bytes once; only the fields that end up in a StatusEntry are ever decoded.
+Unlike `git status -s`, paths are never quoted and may contain spaces, quotes, '->' or newlines."""
+from typing import NamedTuple, Optional, Generator
+
+# record types, as the byte values they start with
+ORDINARY = ord('1')
+RENAMED = ord('2')  # renamed or copied
+UNMERGED = ord('u')
+UNTRACKED = ord('?')
+IGNORED = ord('!')
+HEADER = ord('#')
+
+# how many space-separated fields precede the path, per record type
+_FIELDS_BEFORE_PATH = {ORDINARY: 8, RENAMED: 9, UNMERGED: 10, UNTRACKED: 1, IGNORED: 1}
+# index of the worktree mode field, per record type
+_WORKTREE_MODE_FIELD = {ORDINARY: 5, RENAMED: 5, UNMERGED: 6}
+
+
+class StatusEntry(NamedTuple):
+    xy: str  # index and worktree status, '.' for unmodified: '.M', 'A.', 'R.', 'UU', '??', '!!'
+    mode: Optional[str]  # worktree file mode, e.g. '100644'. None for untracked and ignored
+    path: str
+    origpath: Optional[str] = None  # renames and copies only
+    
+    @property
+    def code(self) -> str:
+        """Like in `git status -s`, stripped: 'M', 'A', 'RM', '??'"""
+        return self.xy.replace('.', ' ').strip()
+
+
+def _decode(view: memoryview) -> str:
+    # like os.fsdecode(), but straight from the buffer
+    return str(view, 'utf-8', 'surrogateescape')
+
+
+def parse(data: bytes) -> Generator[StatusEntry, None, None]:
+    view = memoryview(data)
+    find = data.find
+    end = len(data)
+    pos = 0
+    while pos < end:
+        recend = find(b'\0', pos)
+        if recend == -1:
+            recend = end
+        kind = data[pos]
+        if kind == HEADER:
+            pos = recend + 1
+            continue
+        try:
+            fields_before_path = _FIELDS_BEFORE_PATH[kind]
+        except KeyError:
+            raise ValueError(f"porcelain.parse(): unknown record type {chr(kind)!r} at byte {pos}: "
+                             f"{bytes(view[pos:recend])!r}") from None
+        
+        # walk the space-separated fields without splitting (i.e. copying) the record
+        field_starts = [pos]
+        fieldpos = pos
+        for _ in range(fields_before_path):
+            fieldpos = find(b' ', fieldpos, recend) + 1
+            if not fieldpos:
+                raise ValueError(f"porcelain.parse(): truncated record at byte {pos}: {bytes(view[pos:recend])!r}")
+            field_starts.append(fieldpos)
+        path = _decode(view[fieldpos:recend])
+        
+        if kind in (UNTRACKED, IGNORED):
+            xy = '??' if kind == UNTRACKED else '!!'
+            mode = None
+        else:
+            xy = _decode(view[pos + 2:pos + 4])
+            modefield = _WORKTREE_MODE_FIELD[kind]
+            mode = _decode(view[field_starts[modefield]:field_starts[modefield + 1] - 1])
+        
+        origpath = None
+        if kind == RENAMED:
+            # original path is the next NUL-terminated chunk
+            origend = find(b'\0', recend + 1)
+            if origend == -1:
+                origend = end
+            origpath = _decode(view[recend + 1:origend])
+            recend = origend
+        
+        yield StatusEntry(xy, mode, path, origpath)
+        pos = recend + 1
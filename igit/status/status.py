@@ -1,12 +1,15 @@
 import os
 
-from typing import Tuple, List, Dict
+from typing import List, Dict
 
 from igit.util.misc import try_convert_to_slice
-from igit.util.path import ExPath, ExPathOrStr,has_file_suffix
+from igit.util.path import ExPath, ExPathOrStr, has_file_suffix, toplevel
 from igit.util import shell, termcolor, cachedprop
 from igit import prompt
-from igit.util.search import search_and_prompt
+from igit.util.search import search_and_prompt, SearchIndex
+from igit.status import porcelain, daemon
+from igit.status.porcelain import StatusEntry
+from igit.repo.index import GitIndex
 
 
 class Status:
@@ -38,24 +41,34 @@ class Status:
         return bool(self.status)
     
     @cachedprop
-    def status(self) -> List[str]:
-        return shell.runquiet('git status -s').splitlines()
+    def status(self) -> List[StatusEntry]:
+        entries = daemon.query()
+        if entries is not None:
+            return entries
+        return list(porcelain.parse(shell.runraw('git status --porcelain=v2 -z')))
     
     @cachedprop
     def file_status_map(self) -> Dict[ExPath, str]:
-        def _clean_shortstatus(_x) -> Tuple[ExPath, str]:
-            # _file, _status = _x[3:].replace('"', ''), _x[:3].strip()
-            _status, _file = map(str.strip, _x.split(maxsplit=1))
-            if 'R' in _status:
-                if '->' not in _file:
-                    raise ValueError(f"'R' in status but '->' not in file. file: {_file}, status: {_status}", locals())
-                _, _, _file = _file.partition(' -> ')  # return only existing
-            else:
-                if '->' in _file:
-                    raise ValueError(f"'R' not in status but '->' in file. file: {_file}, status: {_status}", locals())
-            return ExPath(_file), _status
-        
-        return dict([_clean_shortstatus(s) for s in self.status])
+        """{ExPath('igit/status/status.py'): 'M'}. Renamed files are mapped by their new path.
+        Paths are relative to cwd, like `git status -s`"""
+        root = toplevel()
+        return {ExPath(os.path.relpath(os.path.join(root, entry.path))): entry.code for entry in self.status}
+    
+    @cachedprop(depends_on=('index',))
+    def index(self) -> GitIndex:
+        return GitIndex()
+    
+    @cachedprop(depends_on=('index',))
+    def tracked_paths(self) -> List[str]:
+        """Every path in the index, relative to cwd like file_status_map. Reads .git/index, doesn't run git"""
+        root = toplevel()
+        if str(root) == os.getcwd():
+            return self.index.paths
+        return [os.path.relpath(os.path.join(root, path)) for path in self.index.paths]
+    
+    def is_tracked(self, path: ExPathOrStr) -> bool:
+        """Reads .git/index, doesn't run git"""
+        return self.index.is_tracked(path)
     
     @cachedprop
     def files(self) -> List[ExPath]:
@@ -71,6 +84,11 @@ class Status:
         #     self._files = [*newfiles, *knownfiles]
         # return self._files
     
+    @cachedprop
+    def search_indexes(self) -> Dict[bool, SearchIndex]:
+        """{has_suffix: SearchIndex}. search() looks in paths either with or without suffixes"""
+        return dict()
+    
     def search(self, keyword: str) -> str:
         path = ExPath(keyword)
         has_suffix = has_file_suffix(path)
@@ -100,7 +118,10 @@ class Status:
             for i, part in enumerate(f.parts):
                 if part == keyword:
                     return ExPath(os.path.join(*f.parts[0:i + 1]))
-        choice = search_and_prompt(keyword, [str(f) for f in files], criterion='equals')
+        collection = [str(f) for f in files]
+        if has_suffix not in self.search_indexes:
+            self.search_indexes[has_suffix] = SearchIndex(collection)
+        choice = search_and_prompt(keyword, collection, criterion='equals', index=self.search_indexes[has_suffix])
         if choice:
             return choice
         print(termcolor.red(f"'{keyword}' didn't match anything :/"))
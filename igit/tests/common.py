@@ -1,5 +1,6 @@
 import re
 import string
+import subprocess as sp
 from itertools import permutations, chain
 from typing import Sized, List, Tuple, Iterable
 
@@ -11,7 +12,7 @@ letters_and_punc = string.ascii_letters + string.punctuation
 nonregex = string.ascii_letters + string.digits + ''.join(set(string.punctuation) - set(REGEX_CHAR) - set('.'))
 
 
-@memoize
+@memoize(maxsize=64)
 def get_permutations(s: Sized, perm_len: int = None, fltr=None) -> List[str]:
     """('ab', 2) → ['ab', 'ba']"""
     s_len = len(s)
@@ -153,3 +154,40 @@ def mixed_suffixes():
     print('done generating mixed_suffixes')
     assert all(has_letters_and_punc(s) for s in suffixes)
     return suffixes
+
+
+def git(cwd, *args) -> str:
+    """Runs git in `cwd` (None for the current dir) as a throwaway user, and returns its stripped stdout. Raises on failure"""
+    return sp.run(['git', '-c', 'user.name=igit', '-c', 'user.email=igit@igit', *args],
+                  cwd=cwd, capture_output=True, check=True).stdout.decode().strip()
+
+
+def make_git_repo(path, files: dict = None):
+    """Inits a git repo at `path` and commits `files` ({relpath: content}) into it. Returns `path`."""
+    path.mkdir(parents=True, exist_ok=True)
+    git(path, 'init', '-q')
+    for relpath, content in (files or {'README': 'hello\n'}).items():
+        filepath = path / relpath
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        filepath.write_text(content)
+    git(path, 'add', '.')
+    git(path, 'commit', '-q', '-m', 'initial commit')
+    return path
+
+
+def levenshtein(a: str, b: str) -> int:
+    row = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        prev, row[0] = row[0], i
+        for j, char_b in enumerate(b, start=1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (char_a != char_b))
+    return row[-1]
+
+
+def substring_matches(keyword: str, text: str) -> List[Tuple[int, int]]:
+    """Brute force `(edit distance, length)` of every substring of `text`"""
+    return [(levenshtein(keyword, text[i:j]), j - i) for i in range(len(text) + 1) for j in range(i, len(text) + 1)]
+
+
+def substring_distance(keyword: str, text: str) -> int:
+    return min(dist for dist, _ in substring_matches(keyword, text))
@@ -0,0 +1,31 @@
+import pytest
+from hypothesis import given
+from hypothesis.strategies import text, lists
+
+from igit.util import batchmatch
+from igit.util.myers import best_match
+
+pytestmark = pytest.mark.skipif(not batchmatch.available, reason="needs numpy")
+
+
+@given(text('abc-/', min_size=1, max_size=6), lists(text('abc-/', max_size=12), min_size=1, max_size=20))
+def test__best_matches__same_as_myers(keyword, strings):
+    packed = batchmatch.PackedStrings(strings)
+    rows = list(range(len(strings)))
+    for max_dist in range(len(keyword) + 1):
+        expected = []
+        for row in rows:
+            match = best_match(keyword, strings[row], max_dist)
+            if match is not None:
+                expected.append((row, match))
+        assert batchmatch.best_matches(keyword, packed, rows, max_dist) == expected
+
+
+def test__best_matches__chunks_and_rows(monkeypatch):
+    monkeypatch.setattr(batchmatch, 'CHUNK', 3)
+    strings = ['feature/login-page', 'fix/logout', 'x' * 40 + 'login', 'docs', 'login', 'release/1.0', 'lgoin']
+    packed = batchmatch.PackedStrings(strings)
+    rows = [6, 0, 2, 4, 1]
+    expected = [(row, best_match('login', strings[row], 2)) for row in rows
+                if best_match('login', strings[row], 2) is not None]
+    assert batchmatch.best_matches('login', packed, rows, 2) == expected
@@ -0,0 +1,172 @@
+import subprocess as sp
+
+import pytest
+
+from igit.commit import CommitTree
+from igit.tests.common import git, make_git_repo
+from igit.util import cache
+from igit.util.cache import memoize, cachedprop
+
+
+def test__memoize__without_args():
+    calls = []
+    
+    @memoize
+    def double(x):
+        calls.append(x)
+        return x * 2
+    
+    assert double(2) == double(2) == 4
+    assert calls == [2]
+    assert double.cache_info() == (1, 1, 0, None, 1)
+
+
+def test__memoize__unhashable_args():
+    calls = []
+    
+    @memoize
+    def total(numbers, *, extra=None):
+        calls.append(numbers)
+        return sum(numbers) + sum((extra or {}).values())
+    
+    assert total([1, 2]) == total([1, 2]) == 3
+    assert total((1, 2)) == 3
+    assert total([1, 2], extra={'a': 1}) == total([1, 2], extra={'a': 1}) == 4
+    # a list and a tuple with the same items are different calls
+    assert calls == [[1, 2], (1, 2), [1, 2]]
+    
+    @memoize
+    def length(slc: slice):
+        return len(range(100)[slc])
+    
+    assert length(slice(5)) == length(slice(5)) == 5
+    assert length.cache_info().hits == 1
+
+
+def test__memoize__maxsize_evicts_least_recently_used():
+    calls = []
+    
+    @memoize(maxsize=2)
+    def square(x):
+        calls.append(x)
+        return x * x
+    
+    square(1)
+    square(2)
+    square(1)  # 2 is now the least recently used
+    square(3)
+    square(1)
+    square(2)
+    assert calls == [1, 2, 3, 2]
+    assert square.cache_info() == (2, 4, 2, 2, 2)
+    square.cache_clear()
+    assert square.cache_info() == (0, 0, 0, 2, 0)
+
+
+def test__memoize__ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now[0])
+    calls = []
+    
+    @memoize(ttl=10)
+    def stamp(x):
+        calls.append(x)
+        return now[0]
+    
+    assert stamp('a') == 100
+    now[0] = 109
+    assert stamp('a') == 100
+    now[0] = 110
+    assert stamp('a') == 110
+    assert calls == ['a', 'a']
+    assert stamp.cache_info().evictions == 1
+
+
+def test__cachedprop__depends_on(tmp_path, monkeypatch):
+    monkeypatch.chdir(make_git_repo(tmp_path / 'repo'))
+    
+    class Tree:
+        calls = 0
+        
+        @cachedprop(depends_on=('HEAD', 'refs/heads/'))
+        def head(self) -> str:
+            self.calls += 1
+            return sp.run(['git', 'rev-parse', 'HEAD'], stdout=sp.PIPE, check=True).stdout.decode().strip()
+        
+        @cachedprop
+        def forever(self) -> str:
+            return self.head
+    
+    tree = Tree()
+    first = tree.head
+    assert tree.head == tree.forever == first
+    assert tree.calls == 1
+    
+    git(None, 'commit', '-q', '--allow-empty', '-m', 'second')
+    assert tree.head != first
+    assert tree.forever == first
+    assert tree.calls == 2
+    
+    # a branch in a new subdirectory of refs/heads/ doesn't move HEAD, but changes refs/heads/feature/
+    git(None, 'branch', 'feature/login')
+    tree.head
+    assert tree.calls == 3
+    tree.head
+    assert tree.calls == 3
+
+
+def test__CommitTree__current_follows_HEAD(tmp_path, monkeypatch):
+    monkeypatch.chdir(make_git_repo(tmp_path / 'repo'))
+    ctree = CommitTree()
+    first = ctree.current
+    git(None, 'commit', '-q', '--allow-empty', '-m', 'second')
+    assert ctree.current != first
+    git(None, 'checkout', '-q', first)
+    assert ctree.current == first
+
+
+def test__DiskCache(tmp_path, monkeypatch):
+    store = cache.DiskCache(tmp_path / 'cache')
+    assert store.get('Repo.url', ('stamp', 1)) is cache.UNSPECIFIED
+    store.set('Repo.url', ('stamp', 1), 'git@github.com:giladbarnea/igit.git')
+    # another process
+    other = cache.DiskCache(tmp_path / 'cache')
+    assert other.get('Repo.url', ('stamp', 1)) == 'git@github.com:giladbarnea/igit.git'
+    assert other.get('Repo.url', ('stamp', 2)) is cache.UNSPECIFIED
+    other.set('BranchTree.current', ['stamp'], 'master')
+    store.set('CommitTree.current', ['stamp'], 'f' * 40)
+    assert cache.DiskCache(tmp_path / 'cache').get('BranchTree.current', ['stamp']) == 'master'
+    assert [path.name for path in tmp_path.iterdir()] == ['cache']
+    
+    (tmp_path / 'cache').write_text('{"version": 1, "entr')
+    assert cache.DiskCache(tmp_path / 'cache').get('BranchTree.current', ['stamp']) is cache.UNSPECIFIED
+    
+    store.set('BranchTree.current', ['stamp'], 'master')
+    monkeypatch.setattr(cache.DiskCache, 'VERSION', cache.DiskCache.VERSION + 1)
+    assert cache.DiskCache(tmp_path / 'cache').get('BranchTree.current', ['stamp']) is cache.UNSPECIFIED
+
+
+def test__cachedprop__persist(tmp_path, monkeypatch):
+    monkeypatch.chdir(make_git_repo(tmp_path / 'repo'))
+    git(None, 'remote', 'add', 'origin', 'git@github.com:giladbarnea/igit.git')
+    calls = []
+    
+    class Remote:
+        @cachedprop(depends_on=('config',), persist=True)
+        def url(self) -> str:
+            calls.append(1)
+            return sp.run(['git', 'remote', 'get-url', 'origin'], stdout=sp.PIPE, check=True).stdout.decode().strip()
+    
+    assert Remote().url == Remote().url == 'git@github.com:giladbarnea/igit.git'
+    assert len(calls) == 1
+    # a new process only has the file
+    cache._diskcaches.clear()
+    assert Remote().url == 'git@github.com:giladbarnea/igit.git'
+    assert len(calls) == 1
+    
+    git(None, 'remote', 'set-url', 'origin', 'git@github.com:giladbarnea/igit2.git')
+    assert Remote().url == 'git@github.com:giladbarnea/igit2.git'
+    assert len(calls) == 2
+    
+    with pytest.raises(ValueError):
+        cachedprop(persist=True)
@@ -0,0 +1,126 @@
+import itertools
+
+import pytest
+
+from igit.commit import CommitTree, CommitIndex
+from igit.commit.commit import Commits
+from igit.tests.common import git, make_git_repo
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    repo = make_git_repo(tmp_path, {'README': 'hello\n'})
+    for i in range(1, 6):
+        (repo / f'file{i}').write_text(f'{i}\n')
+        git(repo, 'add', '.')
+        git(repo, 'commit', '-q', '-m', f'commit {i}')
+    monkeypatch.chdir(repo)
+    return repo
+
+
+# ** Commits
+def test__Commits__lazy():
+    lines = iter([f'{i:040} message {i}' for i in range(100)])
+    commits = Commits(lines)
+    assert commits['message 2'] == f'{2:040}'
+    assert len(list(lines)) == 97  # stopped reading right after 'message 2'
+
+
+def test__Commits__duplicate_messages_keep_newest():
+    commits = Commits(iter(['a' * 40 + ' same', 'b' * 40 + ' other', 'c' * 40 + ' same']))
+    assert commits['same'] == 'a' * 40
+    assert list(commits) == ['same', 'other']
+    assert len(commits) == 2
+
+
+def test__Commits__concurrent_iterators():
+    commits = Commits(iter([f'{i:040} message {i}' for i in range(5)]))
+    first = iter(commits)
+    second = iter(commits)
+    assert next(first) == 'message 0'
+    assert next(first) == 'message 1'
+    assert list(second) == [f'message {i}' for i in range(5)]
+    assert list(first) == [f'message {i}' for i in range(2, 5)]
+
+
+# ** CommitTree
+def test__CommitTree__log(repo):
+    ctree = CommitTree()
+    assert list(ctree.log(limit=2)) == ['commit 5', 'commit 4']
+    assert list(ctree.log(path='file3')) == ['commit 3']
+    assert ctree.commits['commit 1'] == git(repo, 'rev-parse', 'HEAD~4')
+    assert list(ctree.commithashes)[0] == ctree.current
+
+
+def test__CommitTree__nth(repo):
+    ctree = CommitTree()
+    assert ctree.nth(0) == ctree.current
+    assert ctree.nth(2) == git(repo, 'rev-parse', 'HEAD~2')
+    assert ctree.nth(100) is None
+
+
+# ** CommitIndex
+def test__CommitIndex__incremental(repo, tmp_path):
+    index = CommitIndex(tmp_path / 'commits.sqlite')
+    assert index.update() == 6
+    assert index.update() == 0
+    for i in range(6, 8):
+        git(repo, 'commit', '-q', '--allow-empty', '-m', f'commit {i}')
+    assert index.update() == 2
+    assert len(index) == 8
+    head = git(repo, 'rev-parse', 'HEAD')
+    assert index.heads() == [head]
+    commit = index.get(head)
+    assert commit.subject == 'commit 7'
+    assert commit.parents == (git(repo, 'rev-parse', 'HEAD~1'),)
+
+
+def test__CommitIndex__persistent(repo, tmp_path):
+    CommitIndex(tmp_path / 'commits.sqlite').update()
+    index = CommitIndex(tmp_path / 'commits.sqlite')
+    assert len(index) == 6
+    assert index.update() == 0
+
+
+def test__CommitIndex__rewritten_history(repo, tmp_path):
+    index = CommitIndex(tmp_path / 'commits.sqlite')
+    index.update()
+    git(repo, 'commit', '-q', '--amend', '-m', 'amended')
+    assert index.update() == 1
+    assert [c.subject for c in index.search('amend')] == ['amended']
+
+
+def test__CommitIndex__lookup_and_search(repo, tmp_path):
+    index = CommitIndex(tmp_path / 'commits.sqlite')
+    index.update()
+    head = git(repo, 'rev-parse', 'HEAD')
+    assert [c.sha for c in index.lookup(head[:7])] == [head]
+    assert [c.subject for c in index.search('COMMIT 3')] == ['commit 3']
+    assert len(index.search('commit', limit=2)) == 2
+
+
+def test__CommitIndex__empty_repo(tmp_path, monkeypatch):
+    repo = tmp_path / 'repo'
+    repo.mkdir()
+    git(repo, 'init', '-q')
+    monkeypatch.chdir(repo)
+    index = CommitIndex(tmp_path / 'commits.sqlite')
+    assert index.update() == 0
+    assert len(index) == 0
+    assert len(CommitTree().index) == 0
+
+
+def test__comparecommit__all_digit_short_sha(tmp_path, monkeypatch):
+    from igit.exec.comparecommit import _index_to_hash
+    repo = make_git_repo(tmp_path / 'repo')
+    monkeypatch.chdir(repo)
+    # commit until one's short sha is all digits
+    for i in itertools.count():
+        git(repo, 'commit', '-q', '--allow-empty', '-m', f'commit {i}')
+        sha = git(repo, 'rev-parse', 'HEAD')
+        if sha[:6].isdigit():
+            break
+    git(repo, 'commit', '-q', '--allow-empty', '-m', 'on top')
+    ctree = CommitTree()
+    assert _index_to_hash(ctree, sha[:6]) == sha[:6]
+    assert _index_to_hash(ctree, '1') == sha
@@ -0,0 +1,98 @@
+import os
+import subprocess as sp
+import time
+
+import pytest
+
+from igit.repo import fetcher, refs
+from igit.tests.common import git, make_git_repo
+
+
+@pytest.fixture
+def clone(tmp_path, monkeypatch):
+    upstream = make_git_repo(tmp_path / 'upstream')
+    git(tmp_path, 'clone', '-q', str(upstream), 'clone')
+    git(upstream, 'branch', 'late')
+    monkeypatch.chdir(tmp_path / 'clone')
+    return tmp_path / 'clone'
+
+
+def test__schedule__fetches_in_background(clone):
+    assert 'late' not in refs.remote_branches()
+    assert fetcher.schedule(interval=0) is True
+    assert fetcher.wait(timeout=30) is True
+    assert 'late' in refs.remote_branches()
+    assert not fetcher.is_running()
+
+
+def test__schedule__rate_limited(clone):
+    fetcher.fetch()
+    assert fetcher.last_fetched() > 0
+    assert fetcher.schedule(interval=60) is False
+
+
+def test__schedule__while_running(clone):
+    lockpath = fetcher._lockpath()
+    assert fetcher._try_lock(lockpath)
+    # lock is held by a live process (us): nobody else starts fetching
+    assert fetcher.schedule(interval=0) is False
+    assert fetcher.wait(timeout=0.3) is False
+    fetcher._unlock(lockpath)
+    assert fetcher.wait(timeout=0) is True
+
+
+def test__is_running__stale_lock(clone):
+    lockpath = fetcher._lockpath()
+    dead = sp.Popen(['true'])
+    dead.wait()
+    lockpath.write_text(str(dead.pid))
+    assert fetcher.is_running() is False
+    assert not lockpath.exists()
+    
+    lockpath.write_text(str(os.getpid()))
+    old = time.time() - fetcher.STALE_LOCK - 1
+    os.utime(lockpath, (old, old))
+    assert fetcher.is_running() is False
+
+
+@pytest.fixture
+def unreachable(clone, tmp_path, monkeypatch):
+    """An ssh remote, and a fake `ssh` first on PATH that records how it was called, and fails like an unreachable host"""
+    called = tmp_path / 'ssh-called'
+    bindir = tmp_path / 'bin'
+    bindir.mkdir()
+    fake_ssh = bindir / 'ssh'
+    fake_ssh.write_text(f'#!/bin/sh\necho "$GIT_TERMINAL_PROMPT $@" > "{called}"\nexit 255\n')
+    fake_ssh.chmod(0o755)
+    monkeypatch.setenv('PATH', f"{bindir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.delenv('GIT_SSH_COMMAND', raising=False)
+    monkeypatch.delenv('GIT_SSH', raising=False)
+    git(clone, 'remote', 'set-url', 'origin', 'ssh://git@example.invalid/igit.git')
+    return called
+
+
+def test__schedule__never_prompts(unreachable):
+    assert fetcher.schedule(interval=0) is True
+    assert fetcher.wait(timeout=30) is True
+    prompt, *args = unreachable.read_text().split()
+    assert prompt == '0'
+    assert '-oBatchMode=yes' in args
+
+
+def test__schedule__keeps_own_ssh_command(unreachable, clone, monkeypatch):
+    git(clone, 'config', 'core.sshCommand', 'ssh -oConnectTimeout=3')
+    assert fetcher.schedule(interval=0) is True
+    assert fetcher.wait(timeout=30) is True
+    prompt, *args = unreachable.read_text().split()
+    assert '-oConnectTimeout=3' in args
+    assert '-oBatchMode=yes' not in args
+
+
+def test__schedule__rate_limits_failed_fetches(unreachable):
+    assert fetcher.schedule(interval=0) is True
+    assert fetcher.wait(timeout=30) is True
+    # depending on the git version, a failed fetch may not touch FETCH_HEAD at all
+    (fetcher.gitdir() / 'FETCH_HEAD').unlink(missing_ok=True)
+    assert fetcher.last_fetched() == 0
+    # failed, but attempted just now
+    assert fetcher.schedule(interval=60) is False
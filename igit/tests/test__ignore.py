@@ -0,0 +1,182 @@
+import subprocess as sp
+
+import pytest
+
+import os
+
+from igit.ignore import Gitignore, IgnoreTree
+from igit.ignore.matcher import IgnoreMatcher, translate
+
+FILES = ['setup.py', 'README.md', 'build/lib/igit.py', 'build/keep.txt', 'docs/_build/index.html', 'docs/build.txt',
+         'igit/__pycache__/util.cpython-38.pyc', 'igit/util/path.pyc', 'igit/util/path.py', 'logs/today.log',
+         'logs/important.log', 'a/b/c/deep.tmp', 'a/x/b/deep.tmp', 'abc/file', 'foo/bar/baz.txt', 'foo/baz.txt',
+         'weird [name].txt', 'space .txt', '#hash', '!bang', 'node_modules/pkg/index.js', 'src/node_modules/x.js',
+         'data/keep/me.csv', 'data/drop/me.csv', 'x.o', 'dir.o/file']
+
+PATTERNS = ['*.pyc', 'build/', '!build/keep.txt', '/docs/_build', '*.log', '!important.log', 'a/**/deep.tmp',
+            'abc/**', '**/baz.txt', '!/foo/baz.txt', 'weird\\ \\[name\\].txt', 'space\\ .txt', '\\#hash', '\\!bang',
+            'node_modules', 'data/*', '!data/keep/', '*.o', '!dir.o/', '# a comment', '', '   ']
+
+
+def git_ignored(repo) -> set:
+    out = sp.run(['git', 'ls-files', '-z', '--others', '--ignored', '--exclude-standard'],
+                 cwd=repo, capture_output=True, check=True).stdout.decode()
+    return set(filter(None, out.split('\0')))
+
+
+@pytest.fixture
+def repo(tmp_path):
+    sp.run(['git', 'init', '-q'], cwd=tmp_path, check=True)
+    for path in FILES:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text('')
+    (tmp_path / '.gitignore').write_text('\n'.join(PATTERNS))
+    return tmp_path
+
+
+def test__IgnoreMatcher__same_as_git(repo):
+    matcher = IgnoreMatcher(PATTERNS)
+    assert {path for path in FILES if matcher.match(path)} == git_ignored(repo)
+
+
+def test__IgnoreMatcher__match_many(repo):
+    matcher = IgnoreMatcher(PATTERNS)
+    assert matcher.match_many(FILES) == [path in git_ignored(repo) for path in FILES]
+    assert matcher.match_many(['build/', 'build', 'data/keep/', 'data/drop/']) == [True, False, False, True]
+
+
+def test__IgnoreMatcher__last_pattern_wins():
+    matcher = IgnoreMatcher(['*.txt', '!keep.txt', 'keep*'])
+    assert matcher.match('keep.txt')
+    assert matcher.which('keep.txt').source == 'keep*'
+    assert matcher.decide('other.txt') is True
+    assert IgnoreMatcher(['*.txt', '!keep.txt']).decide('keep.txt') is False
+    assert matcher.decide('file.py') is None
+
+
+def test__IgnoreMatcher__excluded_parent():
+    matcher = IgnoreMatcher(['build/', '!build/keep.txt'])
+    # can't re-include a file if a parent directory is excluded
+    assert matcher.match('build/keep.txt')
+    assert matcher.which('build/keep.txt').source == 'build/'
+    assert matcher.decide('build/keep.txt') is False
+
+
+def test__IgnoreMatcher__base():
+    matcher = IgnoreMatcher(['*.tmp', '/top.txt'], base='sub/dir')
+    assert matcher.match('sub/dir/a/b.tmp')
+    assert matcher.match('sub/dir/top.txt')
+    assert not matcher.match('sub/dir/a/top.txt')
+    assert not matcher.match('other/b.tmp')
+
+
+@pytest.mark.parametrize('glob,regex', [('*.py', r'[^/]*\.py'),
+                                        ('a/**/b', 'a/(?:.*/)?b'),
+                                        ('**/b', '(?:.*/)?b'),
+                                        ('a/**', 'a/.*'),
+                                        ('a**b', 'a[^/]*b'),
+                                        ('[!a-c]?', '[^/a-c][^/]'),
+                                        ('[unclosed', r'\[unclosed')])
+def test__translate(glob, regex):
+    assert translate(glob) == regex
+
+
+def test__Gitignore__is_ignored(repo, monkeypatch):
+    monkeypatch.chdir(repo)
+    gitignore = Gitignore()
+    assert gitignore.is_ignored('build')
+    assert gitignore.is_ignored('build/keep.txt')
+    assert gitignore.is_ignored('.git')
+    assert gitignore.is_ignored('.git/HEAD')
+    assert not gitignore.is_ignored('setup.py')
+    assert gitignore.is_subpath_of_ignored('build/lib/igit.py')
+    assert not gitignore.is_subpath_of_ignored('build')
+    assert not gitignore.should_be_ignored('logs/today.log', quiet=True)
+    assert gitignore.should_be_ignored('logs/important.log', quiet=True)
+
+
+# ** IgnoreTree
+NESTED = {'.gitignore': '*.log\n/top-only\nvendor/\n',
+          'sub/.gitignore': '!keep.log\n*.tmp\ntop-only\n',
+          'sub/deeper/.gitignore': 'keep.log\n',
+          }
+NESTED_FILES = ['a.log', 'top-only', 'sub/top-only', 'sub/keep.log', 'sub/other.log', 'sub/x.tmp', 'x.tmp',
+                'sub/deeper/keep.log', 'sub/deeper/fine.txt', 'vendor/lib.js', 'sub/vendor/lib.js',
+                'excluded.txt', 'sub/global.bak', 'src/main.py']
+
+
+@pytest.fixture
+def nested(tmp_path, monkeypatch):
+    sp.run(['git', 'init', '-q'], cwd=tmp_path, check=True)
+    for path, content in NESTED.items():
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text(content)
+    for path in NESTED_FILES:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text('')
+    (tmp_path / '.git' / 'info').mkdir(exist_ok=True)
+    (tmp_path / '.git' / 'info' / 'exclude').write_text('excluded.txt\n')
+    (tmp_path / 'global-ignore').write_text('*.bak\n')
+    sp.run(['git', 'config', 'core.excludesFile', str(tmp_path / 'global-ignore')], cwd=tmp_path, check=True)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def git_unignored(repo) -> set:
+    out = sp.run(['git', 'ls-files', '-z', '--others', '--exclude-standard'],
+                 cwd=repo, capture_output=True, check=True).stdout.decode()
+    return set(filter(None, out.split('\0')))
+
+
+def test__IgnoreTree__walk_same_as_git(nested):
+    assert set(IgnoreTree().files()) == git_unignored(nested)
+
+
+def test__IgnoreTree__match_same_as_git(nested):
+    tree = IgnoreTree()
+    unignored = git_unignored(nested)
+    for path in NESTED_FILES:
+        assert tree.match(path) == (path not in unignored), path
+    assert tree.match('vendor', is_dir=True)
+    assert tree.match('.git/config')
+    assert tree.which('sub/keep.log').source == '!keep.log'
+
+
+def test__IgnoreTree__walk_prunes(nested, monkeypatch):
+    scanned = []
+    scandir = os.scandir
+    
+    def spy(path):
+        scanned.append(os.path.relpath(path, nested))
+        return scandir(path)
+    
+    monkeypatch.setattr(os, 'scandir', spy)
+    dirs = [reldir for reldir, _, _ in IgnoreTree().walk()]
+    assert 'vendor' not in dirs and 'vendor' not in scanned
+    assert 'sub/vendor' not in dirs and 'sub/vendor' not in scanned
+    assert '.git' not in scanned
+    assert 'sub/deeper' in dirs
+
+
+def test__IgnoreTree__reloads_modified_gitignore(nested):
+    tree = IgnoreTree()
+    assert tree.match('src/main.py') is False
+    gitignore = nested / 'src' / '.gitignore'
+    gitignore.write_text('*.py\n')
+    assert tree.match('src/main.py') is True
+    matcher = tree.matcher('src')
+    assert tree.matcher('src') is matcher  # unchanged, not recompiled
+    gitignore.write_text('*.pyc\n')
+    stat = gitignore.stat()
+    os.utime(gitignore, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert tree.match('src/main.py') is False
+
+
+def test__IgnoreTree__pruner(nested, monkeypatch):
+    from igit.util.path import ExPath
+    tree = IgnoreTree()
+    assert {str(p) for p in ExPath('.').regex('.*', prune=tree.pruner())} == git_unignored(nested) | set(NESTED)
+    monkeypatch.chdir(nested / 'sub')
+    assert {str(p) for p in ExPath('.').regex('.*', prune=IgnoreTree().pruner())} == {'.gitignore', 'keep.log',
+                                                                                    'deeper/.gitignore',
+                                                                                    'deeper/fine.txt'}
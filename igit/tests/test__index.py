@@ -0,0 +1,130 @@
+import os
+import subprocess as sp
+
+import pytest
+
+from igit.repo.index import GitIndex, _hash_size
+from igit.tests.common import git, make_git_repo
+
+FILES = {'README': 'hello\n',
+         'setup.py': 'from setuptools import setup\n',
+         'igit/__init__.py': '',
+         'igit/util/path.py': 'import os\n' * 100,
+         'igit/util/shell.py': 'import subprocess\n',
+         'igit-extras/notes.txt': 'sorts between igit/ and igit0\n',
+         'spaces in name/file name.txt': 'x\n',
+         }
+
+
+def ls_files(cwd) -> list:
+    entries = []
+    for record in git(cwd, 'ls-files', '--stage', '-z').split('\0'):
+        if not record:
+            continue
+        info, _, path = record.partition('\t')
+        mode, sha, stage = info.split()
+        entries.append((path, int(mode, 8), sha, int(stage)))
+    return entries
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    repo = make_git_repo(tmp_path / 'repo', FILES)
+    monkeypatch.chdir(repo)
+    return repo
+
+
+@pytest.mark.parametrize('version', [2, 3, 4])
+def test__GitIndex__same_as_ls_files(repo, version):
+    if version >= 3:
+        # intent-to-add entries need extended flags, which git won't write in a v2 index
+        (repo / 'new.py').write_text('')
+        git(repo, 'add', '-N', 'new.py')
+    git(repo, 'update-index', '--index-version', str(version))
+    index = GitIndex()
+    assert index.version == version
+    assert [(e.path, e.mode, e.sha, e.stage) for e in index] == ls_files(repo)
+    for entry in index:
+        if entry.path == 'new.py':
+            # intent-to-add entries have no stat data
+            continue
+        assert entry.size == os.lstat(entry.path).st_size
+        assert entry.mtime_ns // 1_000_000_000 == int(os.lstat(entry.path).st_mtime)
+
+
+def test__GitIndex__lookup(repo):
+    index = GitIndex()
+    assert 'igit/util/path.py' in index
+    assert 'igit/util' not in index
+    assert 'nope.py' not in index
+    assert index['setup.py'].size == len(FILES['setup.py'])
+    assert index.get('nope.py') is None
+    with pytest.raises(KeyError):
+        index['nope.py']
+
+
+def test__GitIndex__paths_under(repo):
+    index = GitIndex()
+    assert index.paths_under('igit') == ['igit/__init__.py', 'igit/util/path.py', 'igit/util/shell.py']
+    assert index.paths_under('igit/util/') == ['igit/util/path.py', 'igit/util/shell.py']
+    assert index.paths_under('spaces in name') == ['spaces in name/file name.txt']
+    assert index.paths_under('nope') == []
+    assert index.paths_under('.') == index.paths
+    assert index.is_tracked('igit-extras')
+    assert not index.is_tracked('nope')
+
+
+def test__GitIndex__relative_to_cwd(repo, monkeypatch):
+    monkeypatch.chdir(repo / 'igit')
+    index = GitIndex()
+    assert 'util/path.py' in index
+    assert index.paths_under('util') == ['igit/util/path.py', 'igit/util/shell.py']
+
+
+def test__GitIndex__unmerged(repo):
+    git(repo, 'checkout', '-q', '-b', 'other')
+    (repo / 'README').write_text('other\n')
+    git(repo, 'commit', '-q', '-am', 'other')
+    git(repo, 'checkout', '-q', '-')
+    (repo / 'README').write_text('mine\n')
+    git(repo, 'commit', '-q', '-am', 'mine')
+    with pytest.raises(sp.CalledProcessError):
+        git(repo, 'merge', 'other')
+    index = GitIndex()
+    assert [(e.path, e.mode, e.sha, e.stage) for e in index] == ls_files(repo)
+    assert {e.stage for e in index if e.path == 'README'} == {1, 2, 3}
+
+
+def test__GitIndex__split_index(repo):
+    git(repo, 'update-index', '--split-index')
+    (repo / 'another.py').write_text('')
+    git(repo, 'add', 'another.py')
+    index = GitIndex()
+    assert [(e.path, e.mode, e.sha, e.stage) for e in index] == ls_files(repo)
+
+
+def test__GitIndex__no_index(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sp.run(['git', 'init', '-q'], check=True)
+    assert len(GitIndex()) == 0
+
+
+@pytest.mark.parametrize('config, size', [('[extensions]\n\tobjectformat = sha256\n', 32),
+                                          ('[extensions]\n\tobjectFormat=sha256\n', 32),
+                                          ('[Extensions]\n  objectformat =  "SHA256"  # comment\n', 32),
+                                          ('[extensions]\n\tobjectformat = sha1\n', 20),
+                                          ('[core]\n\tobjectformat = sha256\n', 20),
+                                          ('[core]\n\tbare = false\n', 20)])
+def test__hash_size(tmp_path, config, size):
+    (tmp_path / 'config').write_text(config)
+    assert _hash_size(tmp_path) == size
+
+
+def test__GitIndex__sha256(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sp.run(['git', 'init', '-q', '--object-format=sha256'], check=True)
+    (tmp_path / 'file.py').write_text('x = 1\n')
+    git(tmp_path, 'add', 'file.py')
+    index = GitIndex()
+    assert [(e.path, e.mode, e.sha, e.stage) for e in index] == ls_files(tmp_path)
+    assert len(index.get('file.py').sha) == 64
@@ -0,0 +1,42 @@
+import subprocess as sp
+import sys
+import types
+
+import pytest
+
+from igit.util import lazy
+
+
+@pytest.fixture
+def unimported(monkeypatch):
+    # some small stdlib module nothing here imports
+    name = 'colorsys'
+    monkeypatch.delitem(sys.modules, name, raising=False)
+    return name
+
+
+def test__module__imports_on_first_use(unimported):
+    module = lazy.module(unimported)
+    assert sys.modules[unimported] is module
+    # type() doesn't trigger the import, any attribute does
+    assert type(module) is not types.ModuleType
+    assert module.rgb_to_hsv(1, 0, 0) == (0, 1, 1)
+    assert type(module) is types.ModuleType
+
+
+def test__module__already_imported():
+    assert lazy.module('os') is sys.modules['os']
+
+
+def test__module__missing():
+    assert not lazy.available('igit_no_such_module')
+    with pytest.raises(ModuleNotFoundError):
+        lazy.module('igit_no_such_module')
+
+
+def test__import_igit__no_heavy_imports():
+    code = ('import sys, igit.util.batchmatch, igit.util.shell; '
+            'print(*[name for name in ("IPython", "ipdb", "asyncio", "numpy", "prompt_toolkit") '
+            'if name in sys.modules and type(sys.modules[name]).__name__ == "module"])')
+    out = sp.run([sys.executable, '-c', code], stdout=sp.PIPE, check=True).stdout.decode()
+    assert out.splitlines()[-1] == ''
@@ -0,0 +1,43 @@
+import random
+
+from fuzzysearch import find_near_matches
+from hypothesis import given
+from hypothesis.strategies import text
+
+from igit.tests.common import substring_matches
+from igit.util.myers import best_match, distance
+
+
+@given(text('abc-/', min_size=1, max_size=6), text('abc-/', max_size=12))
+def test__best_match__same_as_brute_force(keyword, text_):
+    matches = substring_matches(keyword, text_)
+    dist = min(dist for dist, _ in matches)
+    length = max(length for d, length in matches if d == dist)
+    assert best_match(keyword, text_, len(keyword)) == (dist, length)
+    assert distance(keyword, text_) == dist
+    if dist:
+        assert best_match(keyword, text_, dist - 1) is None
+
+
+@given(text('abcd-/', min_size=2, max_size=8), text('abcd-/', min_size=1, max_size=24))
+def test__best_match__same_as_find_near_matches(keyword, text_):
+    for max_dist in range(len(keyword)):
+        near_matches = find_near_matches(keyword, text_, max_l_dist=max_dist)
+        match = best_match(keyword, text_, max_dist)
+        if not near_matches:
+            assert match is None
+        else:
+            assert match is not None and match[0] == min(near_match.dist for near_match in near_matches)
+
+
+def test__best_match__matched_length():
+    assert best_match('login', 'feature/login-page', 2) == (0, 5)
+    assert best_match('feture', 'feature/login-page', 2) == (1, 7)
+    assert best_match('xyz', 'feature/login-page', 2) is None
+
+
+def test__best_match__long_keyword():
+    rng = random.Random(0)
+    keyword = ''.join(rng.choice('abcdef') for _ in range(100))
+    text_ = 'x' * 50 + keyword[:40] + 'y' + keyword[41:] + 'x' * 50
+    assert best_match(keyword, text_, 3) == (1, 100)
@@ -117,3 +117,85 @@ def test__ExPath__subpath_of__wildcard():
     assert gilad.subpath_of(home)
     assert gilad.subpath_of('/home/')
     assert gilad.subpath_of(Path('/home'))
+
+
+def iterdir_regex(path: ExPath, pattern, predicate=bool):
+    """The recursive implementation ExPath.regex() replaced"""
+    import re
+    for item in filter(predicate, path.iterdir()):
+        if item.is_dir():
+            yield from iterdir_regex(item, pattern, predicate)
+            continue
+        if re.match(pattern, str(item)):
+            yield item
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    for relpath in ['a.py', 'b.ts', 'b.d.ts', 'src/main.py', 'src/util/x.ts', 'src/util/y.py', 'node_modules/m/index.ts',
+                    'node_modules/m/deep/z.ts', 'docs/readme.md', 'empty/.keep']:
+        (tmp_path / relpath).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / relpath).write_text('')
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.mark.parametrize('pattern', [r'.*\.ts', r'[^.]*\.ts', r'src/.*', r'.*util/[xy]', 'nothing'])
+def test__ExPath__regex__same_as_iterdir(tree, pattern):
+    assert list(ExPath('.').regex(pattern)) == list(iterdir_regex(ExPath('.'), pattern))
+    assert list(ExPath('src').regex(pattern)) == list(iterdir_regex(ExPath('src'), pattern))
+    predicate = lambda p: p.name != 'node_modules'
+    assert list(ExPath('.').regex(pattern, predicate)) == list(iterdir_regex(ExPath('.'), pattern, predicate))
+
+
+def test__ExPath__regex__workers(tree):
+    assert list(ExPath('.').regex(r'.*\.ts', workers=4)) == list(ExPath('.').regex(r'.*\.ts'))
+
+
+def test__ExPath__regex__prune(tree, monkeypatch):
+    import os
+    scanned = []
+    scandir = os.scandir
+    
+    def spy(path):
+        scanned.append(path)
+        return scandir(path)
+    
+    monkeypatch.setattr(os, 'scandir', spy)
+    pruned = list(ExPath('.').regex(r'.*\.ts', prune=lambda path, is_dir: is_dir and path == 'node_modules'))
+    assert set(pruned) == {ExPath('b.ts'), ExPath('b.d.ts'), ExPath('src/util/x.ts')}
+    assert not any(path.startswith('node_modules') for path in scanned)
+
+
+@pytest.fixture
+def sized(tmp_path):
+    for i in range(4):
+        for j in range(5):
+            sub = tmp_path / f'd{i}' / f'sub{j}'
+            sub.mkdir(parents=True)
+            (sub / 'file').write_bytes(b'x' * 1000)
+    (tmp_path / 'top').write_bytes(b'x' * 500)
+    (tmp_path / 'link').symlink_to(tmp_path / 'd0')
+    return tmp_path
+
+
+def test__dirsize(sized):
+    from igit.util.path import dirsize
+    expected = sum(f.lstat().st_size for f in sized.glob('**/*') if f.is_file())
+    assert dirsize(sized) == expected == 20500
+    assert dirsize(str(sized / 'd1'), workers=3) == 5000
+
+
+def test__dirsize__threshold(sized):
+    from igit.util.path import dirsize
+    assert 3000 <= dirsize(sized, threshold=3000) < 20500
+    assert 3000 <= dirsize(sized, threshold=3000, workers=4) <= 20500
+    assert dirsize(sized, threshold=10 ** 9) == 20500
+
+
+def test__dirsize__cache(sized):
+    from igit.util import path
+    assert path.dirsize(sized) == 20500
+    assert path._dirsizes[str(sized)][1:] == (20500, True)
+    (sized / 'new').write_bytes(b'x' * 10)
+    assert path.dirsize(sized) == 20510
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from igit.repo import refs
+from igit.tests.common import git, make_git_repo
+from igit.util.path import gitdir
+
+
+def for_each_ref(cwd, prefix) -> dict:
+    lines = git(cwd, 'for-each-ref', '--format=%(objectname) %(refname)', prefix).splitlines()
+    return dict(reversed(line.split(' ', maxsplit=1)) for line in lines)
+
+
+@pytest.fixture
+def clone(tmp_path, monkeypatch):
+    upstream = make_git_repo(tmp_path / 'upstream')
+    git(upstream, 'branch', 'feature/nested/name')
+    git(upstream, 'branch', 'dev')
+    git(tmp_path, 'clone', '-q', str(upstream), 'clone')
+    clone = tmp_path / 'clone'
+    # a branch pushed after the clone, so some refs are loose and some packed
+    git(upstream, 'commit', '-q', '--allow-empty', '-m', 'second')
+    git(upstream, 'branch', 'late')
+    git(clone, 'fetch', '-q', '--all')
+    monkeypatch.chdir(clone)
+    return clone
+
+
+def test__gitdir(clone):
+    assert gitdir() == clone / '.git'
+    os.mkdir(clone / 'sub')
+    assert gitdir(clone / 'sub') == clone / '.git'
+
+
+def test__read_refs__same_as_for_each_ref(clone):
+    assert refs.read_refs('refs/remotes/') == {ref: sha for ref, sha in for_each_ref(clone, 'refs/remotes/').items()
+                                              if not ref.endswith('/HEAD')}
+
+
+def test__remote_branches(clone):
+    branches = refs.remote_branches('origin')
+    assert {'dev', 'feature/nested/name', 'late'} <= set(branches)
+    assert 'HEAD' not in branches
+    assert branches['late'] == git(clone, 'rev-parse', 'origin/late')
+
+
+def test__remote_branches__loose_overrides_packed(clone):
+    git(clone, 'pack-refs', '--all')
+    head = git(clone, 'rev-parse', 'HEAD')
+    git(clone, 'update-ref', 'refs/remotes/origin/dev', 'origin/late')
+    assert refs.remote_branches('origin')['dev'] == git(clone, 'rev-parse', 'origin/late') != head
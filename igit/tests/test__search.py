@@ -0,0 +1,179 @@
+import multiprocessing
+import random
+import re
+
+import pytest
+from hypothesis import given
+from hypothesis.strategies import text, lists, integers
+
+from igit.tests.common import substring_distance
+from igit.util import batchmatch
+from igit.util.search import SearchIndex, fuzzy, iter_maybes, Matches, SearchSession
+
+
+@given(text('abcd', min_size=3, max_size=8), text('abcd', max_size=16))
+def test__SearchIndex__candidates_never_misses(keyword, text_):
+    index = SearchIndex(['', text_])
+    for max_dist in range(len(keyword)):
+        if substring_distance(keyword, text_) <= max_dist:
+            assert 1 in index.candidates(keyword, max_dist)
+
+
+def branchnames(count: int):
+    rng = random.Random(0)
+    words = ['feature', 'fix', 'login', 'page', 'api', 'user', 'cache', 'search', 'index', 'refactor', 'docs', 'release']
+    return [f'{rng.choice(words)}/{rng.choice(words)}-{rng.choice(words)}-{i}' for i in range(count)]
+
+
+def test__SearchIndex__fuzzy():
+    names = branchnames(10_000) + ['feature/incremental-status-daemon']
+    index = SearchIndex(names)
+    assert index.fuzzy('incremntal-stat-deamon').best() == ['feature/incremental-status-daemon']
+    assert fuzzy('incremntal', names, index=index).best() == ['feature/incremental-status-daemon']
+
+
+def test__SearchIndex__fuzzy__case():
+    names = ['feature/Login', 'feature/login', 'fix/LOGIN']
+    # case sensitive by default: an exact match is skipped, and each case difference is an edit
+    assert SearchIndex(names).fuzzy('login').best() == ['feature/Login']
+    assert SearchIndex(names).fuzzy('Login').best() == ['feature/login']
+    assert SearchIndex(names).fuzzy('LOGIN').matches == {3.6: ['feature/Login']}
+    # ignoring case, all three are exact matches
+    assert not SearchIndex(names, ignore_case=True).fuzzy('login')
+    index = SearchIndex(branchnames(1000) + ['feature/incremental-status-daemon'], ignore_case=True)
+    assert index.fuzzy('INCREMNTAL').best() == ['feature/incremental-status-daemon']
+
+
+def test__SearchIndex__fuzzy__skips_exact_matches():
+    names = ['feature/login', 'fix/LOGIN', 'feature/logon', 'fix/lgn', 'docs/readme']
+    matches = SearchIndex(names).fuzzy('login').matches
+    found = [item for items in matches.values() for item in items]
+    # one item at 1 edit doesn't hide the ones at 2
+    assert sorted(found) == ['feature/logon', 'fix/lgn']
+
+
+def test__iter_maybes__fuzzy_offers_other_items():
+    names = ['feature/login', 'feature/logon', 'docs/readme']
+    stages = iter_maybes('login', names)
+    maybes, is_last = next(stages)
+    assert maybes == ['feature/login'] and not is_last
+    # rejected; the fuzzy stage shouldn't offer it again
+    maybes, is_last = next(stages)
+    assert maybes == ['feature/logon'] and is_last
+
+
+def test__iter_maybes__pseudo_fuzzy():
+    names = ['feature/login_page', 'fix/logout']
+    # the fuzzy stage is case sensitive: 'LOGIN-PAGE' is too far from anything
+    assert [maybes for maybes, _ in iter_maybes('LOGIN-PAGE', names)] == [[], ['feature/login_page'], []]
+
+
+@pytest.mark.skipif(not batchmatch.available, reason="needs numpy")
+def test__SearchIndex__batch_same_as_per_item(monkeypatch):
+    names = branchnames(3_000) + ['feature/incremental-status-daemon']
+    index = SearchIndex(names)
+    for keyword in ('incremntal-stat-deamon', 'login-pag', 'xqzv'):
+        monkeypatch.setattr(SearchIndex, 'BATCH_THRESHOLD', 0)
+        batched = index.fuzzy(keyword)
+        monkeypatch.setattr(SearchIndex, 'BATCH_THRESHOLD', len(names) + 1)
+        per_item = index.fuzzy(keyword)
+        assert batched.matches == per_item.matches
+
+
+def bucketed_matches(scores, maxsize):
+    """What Matches kept before it was a heap: {score: items}, dropping the whole worst bucket when full"""
+    matches = {}
+    for item, score in enumerate(scores):
+        count = sum(map(len, matches.values()))
+        worst = max(matches, default=None)
+        if count < maxsize or score == worst:
+            matches.setdefault(score, []).append(item)
+        elif score < worst:
+            del matches[worst]
+            matches.setdefault(score, []).append(item)
+    return dict(sorted(matches.items()))
+
+
+@given(lists(integers(0, 6), max_size=40), integers(1, 6))
+def test__Matches__same_as_buckets(scores, maxsize):
+    matches = Matches(maxsize=maxsize)
+    for item, score in enumerate(scores):
+        matches.append(item, score)
+    expected = bucketed_matches(scores, maxsize)
+    assert matches.matches == expected
+    assert bool(matches) == bool(expected)
+    if expected:
+        assert matches.best() == next(iter(expected.values()))
+        assert matches.worst_score == max(expected)
+
+
+def test__Matches__top():
+    matches = Matches(maxsize=3)
+    for item, score in [('c', 2), ('a', 0.4), ('b', 1), ('b2', 1), ('d', 3), ('c2', 2)]:
+        matches.append(item, score)
+    # 'c' was dropped when 'b2' came in, 'd' and 'c2' are worse than the worst
+    assert matches.top(2) == ['a', 'b']
+    assert matches.top(10) == ['a', 'b', 'b2']
+    assert matches.best() == ['a']
+
+
+def test__SearchSession__narrows_survivors():
+    names = ['feature/login_page', 'fix/logout', 'Feature/Signup', 'docs/readme']
+    session = SearchSession(names)
+    assert session.maybes('fe') == (['feature/login_page'], ['feature/login_page', 'Feature/Signup'])
+    assert session.maybes('feature-log') == ([], ['feature/login_page'])
+    # the survivors of 'fe' were filtered, not the whole collection
+    session.collection = names + ['feature/login_page']
+    assert session.maybes('feature-lo') == ([], ['feature/login_page'])
+    # 'f' wasn't searched before, so it sees everything
+    assert session.maybes('f')[0] == ['feature/login_page', 'fix/logout', 'feature/login_page']
+
+
+@given(text('ab-_.', max_size=5), lists(text('aAb-_./', max_size=8), max_size=10))
+def test__SearchSession__same_as_from_scratch(keyword, names):
+    session = SearchSession(names)
+    for end in range(len(keyword) + 1):
+        session.maybes(keyword[:end])
+    expected = ([name for name in names if keyword in name],
+                [name for name in names if re.search(re.sub(r'[-_./ ]', '[-_./ ]?', keyword), name, re.IGNORECASE)])
+    assert session.maybes(keyword) == expected
+    assert SearchSession(names).maybes(keyword) == expected
+
+
+def test__SearchSession__complete():
+    session = SearchSession(branchnames(1000) + ['feature/incremental-status-daemon'])
+    assert session.complete('incremental') == ['feature/incremental-status-daemon']
+    assert session.complete('incremntal-stat') == ['feature/incremental-status-daemon']
+    assert len(session.complete('login', limit=5)) == 5
+
+
+def test__iter_maybes__parallel():
+    names = branchnames(2000) + ['feature/incremental-status-daemon']
+    index = SearchIndex(names)
+    for keyword in ('login-page', 'incremntal-stat-deamon'):
+        assert list(iter_maybes(keyword, names, index=index, parallel=True)) == list(iter_maybes(keyword, names, index=index))
+    
+    # accepting an early match kills the fuzzy search
+    stages = iter_maybes('login-page', names, parallel=True)
+    next(stages)
+    assert multiprocessing.active_children()
+    stages.close()
+    assert not multiprocessing.active_children()
+
+
+def test__SearchCompleter__follows_collection():
+    from prompt_toolkit.document import Document
+    from igit.util.completion import SearchCompleter
+    
+    collection = ['feature/login', 'fix/logout']
+    completer = SearchCompleter(lambda: collection)
+    
+    def complete(text):
+        return [completion.text for completion in completer.get_completions(Document(text), None)]
+    
+    assert complete('co log') == ['feature/login', 'fix/logout']
+    session = completer.session
+    assert completer.session is session
+    collection = ['feature/login-page']
+    assert complete('co log') == ['feature/login-page']
+    assert completer.session is not session
@@ -0,0 +1,147 @@
+import subprocess as sp
+import sys
+import time
+
+import pytest
+
+from igit.tests.common import make_git_repo
+from igit.util import shell
+from igit.util.shell import ObjectReader, runmany
+
+
+@pytest.fixture
+def repo(tmp_path):
+    return make_git_repo(tmp_path, {'README': 'hello\n', 'src/main.py': 'print(1)\n'})
+
+
+def rev_parse(repo, rev) -> str:
+    return sp.run(['git', 'rev-parse', rev], cwd=repo, capture_output=True).stdout.decode().strip()
+
+
+# ** ObjectReader
+def test__ObjectReader__info(repo):
+    with ObjectReader(cwd=repo) as reader:
+        info = reader.info('HEAD')
+        assert info.sha == rev_parse(repo, 'HEAD')
+        assert info.type == 'commit'
+        blob = reader.info('HEAD:README')
+        assert blob.type == 'blob'
+        assert blob.size == len('hello\n')
+
+
+def test__ObjectReader__missing(repo):
+    with ObjectReader(cwd=repo) as reader:
+        assert reader.info('nosuchbranch') is None
+        assert reader.read('HEAD:nosuchfile') is None
+        # still usable after a miss
+        assert reader.info('HEAD') is not None
+
+
+def test__ObjectReader__path_with_spaces(tmp_path):
+    repo = make_git_repo(tmp_path, {'c d': 'spaced\n', 'a b c': 'more\n'})
+    with ObjectReader(cwd=repo) as reader:
+        assert reader.info('HEAD:c d').size == len('spaced\n')
+        assert reader.read('HEAD:a b c') == b'more\n'
+        assert reader.info('HEAD:c e') is None
+        assert reader.info('HEAD:a b d') is None
+        assert reader.read('HEAD:x y') is None
+
+
+def test__ObjectReader__read(repo):
+    with ObjectReader(cwd=repo) as reader:
+        assert reader.read('HEAD:src/main.py') == b'print(1)\n'
+        assert reader.read('HEAD:README') == b'hello\n'
+
+
+def test__ObjectReader__info_many__more_than_chunk(repo):
+    revs = ['HEAD', 'HEAD:README', 'nosuchbranch'] * (ObjectReader.CHUNK // 2)
+    with ObjectReader(cwd=repo) as reader:
+        infos = reader.info_many(revs)
+    assert infos['HEAD'].sha == rev_parse(repo, 'HEAD')
+    assert infos['HEAD:README'].type == 'blob'
+    assert infos['nosuchbranch'] is None
+
+
+# ** runmany
+def test__runmany__concurrent_and_in_order():
+    start = time.time()
+    outs = runmany('sh -c "sleep 0.3; echo first"', 'sh -c "sleep 0.1; echo second"', 'true', 'echo third',
+                   printcmd=False, printout=False)
+    assert time.time() - start < 0.55
+    assert outs == ['first', 'second', 'third']
+    assert runmany('echo only', printcmd=False, printout=False) == 'only'
+
+
+def test__runmany__after(tmp_path):
+    log = tmp_path / 'log'
+    first = f'sh -c "sleep 0.2; echo first >> {log}"'
+    second = f'sh -c "echo second >> {log}"'
+    third = f'sh -c "echo third >> {log}"'
+    runmany(third, second, first, after={third: [second], second: [first]}, printcmd=False)
+    assert log.read_text().split() == ['first', 'second', 'third']
+    
+    with pytest.raises(ValueError):
+        runmany(first, second, after={first: [second], second: [first]})
+    with pytest.raises(ValueError):
+        runmany(first, after={first: ['echo not run']})
+
+
+def test__runmany__failures(tmp_path, capsys):
+    marker = tmp_path / 'marker'
+    failing = 'sh -c "echo partial; exit 1"'
+    # a non-zero exit skips dependents only, and its output is kept, like in run()
+    outs = runmany(failing, f'touch {marker}', 'echo independent', after={f'touch {marker}': [failing]},
+                   printcmd=False)
+    assert outs == ['partial', 'independent']
+    assert not marker.exists()
+    assert 'SKIPPED' in capsys.readouterr().out
+    assert runmany(failing, printcmd=False) == shell.run(failing, printcmd=False) == 'partial'
+    
+    # without raiseonfail, dependents run anyway
+    outs = runmany(failing, f'touch {marker}', 'nosuchcommand-igit', 'echo after',
+                   after={f'touch {marker}': [failing], 'echo after': ['nosuchcommand-igit']},
+                   raiseonfail=False, printcmd=False)
+    assert outs == ['partial', 'after']
+    assert marker.exists()
+    
+    # an exception raises, and cancels whatever hasn't finished
+    start = time.time()
+    with pytest.raises(FileNotFoundError):
+        runmany('sleep 5', 'nosuchcommand-igit', printcmd=False)
+    assert time.time() - start < 2
+    assert runmany('nosuchcommand-igit', 'echo still', raiseonfail=False, printcmd=False) == 'still'
+
+
+def test__runmany__streams_stderr(capsys):
+    runmany('sh -c "echo oops >&2; echo out"', printcmd=False)
+    out = capsys.readouterr().out
+    assert out.index('oops') < out.index('out\n')
+
+
+# ** stream
+def test__stream__forwards_as_it_arrives(capfd):
+    streamed = shell.stream('sh -c "printf \'10%%\\r50%%\\r100%%\\n\' >&2; echo done"', printcmd=False)
+    out, err = capfd.readouterr()
+    assert err == '10%\r50%\r100%\n'
+    assert out == 'done\n'
+    assert streamed.returncode == 0
+    assert streamed.out() == 'done'
+    assert streamed.stderr.read() == b'10%\r50%\r100%\n'
+
+
+def test__stream__big_outputs_spill_to_disk(capfd):
+    # both pipes fill up way past their buffers; reading only one of them at a time would deadlock
+    cmd = f'{sys.executable} -c "import sys; sys.stdout.write(\'o\' * 3_000_000); sys.stderr.write(\'e\' * 3_000_000)"'
+    streamed = shell.stream(cmd, printcmd=False, forward=False, spool_size=1_000_000)
+    assert capfd.readouterr() == ('', '')
+    assert streamed.stdout._rolled and streamed.stderr._rolled
+    assert len(streamed.out()) == 3_000_000
+    assert streamed.stderr.read(10) == b'e' * 10
+
+
+def test__stream__raiseonfail():
+    with pytest.raises(sp.CalledProcessError) as excinfo:
+        shell.stream('sh -c "echo nope >&2; exit 3"', printcmd=False, forward=False)
+    assert excinfo.value.returncode == 3
+    assert excinfo.value.stderr == 'nope'
+    assert shell.stream('false', printcmd=False, raiseonfail=False).returncode == 1
@@ -0,0 +1,178 @@
+import os
+import subprocess as sp
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+from igit.status import Status, daemon
+from igit.status.daemon import StatusCache
+from igit.status.porcelain import parse, StatusEntry
+from igit.tests.common import git, make_git_repo
+from igit.util.path import ExPath
+
+SHA = 'a' * 40
+
+
+# ** porcelain.parse
+def test__parse__ordinary():
+    data = f'1 .M N... 100644 100644 100644 {SHA} {SHA} igit/main.py\0'.encode()
+    assert list(parse(data)) == [StatusEntry('.M', '100644', 'igit/main.py')]
+
+
+def test__parse__renamed():
+    data = f'2 R. N... 100644 100644 100644 {SHA} {SHA} R100 new name.py\0old -> name.py\0'.encode()
+    entry, = parse(data)
+    assert entry == StatusEntry('R.', '100644', 'new name.py', 'old -> name.py')
+    assert entry.code == 'R'
+
+
+def test__parse__unmerged():
+    data = f'u UU N... 100644 100644 100644 100644 {SHA} {SHA} {SHA} conflict.txt\0'.encode()
+    assert list(parse(data)) == [StatusEntry('UU', '100644', 'conflict.txt')]
+
+
+def test__parse__untracked_ignored_and_headers():
+    data = b'# branch.oid (initial)\0? "quoted" \xc3\xa9.txt\0? dir/\0! build/\0'
+    assert [(e.code, e.path) for e in parse(data)] == [('??', '"quoted" é.txt'), ('??', 'dir/'), ('!!', 'build/')]
+
+
+def test__parse__many():
+    record = f'1 A. N... 000000 100644 100644 {"0" * 40} {SHA} file'.encode()
+    data = b'\0'.join(record + str(i).encode() for i in range(100_000)) + b'\0'
+    entries = list(parse(data))
+    assert len(entries) == 100_000
+    assert entries[-1].path == 'file99999'
+
+
+def test__parse__unknown_record():
+    with pytest.raises(ValueError):
+        list(parse(b'x what\0'))
+
+
+# ** Status
+def test__Status__file_status_map(tmp_path, monkeypatch):
+    repo = make_git_repo(tmp_path, {'README': 'hello\n', 'old name.txt': 'content\n'})
+    monkeypatch.chdir(repo)
+    (repo / 'README').write_text('changed\n')
+    (repo / 'new file.txt').write_text('new\n')
+    sp.run(['git', 'mv', 'old name.txt', 'new -> name.txt'], check=True)
+    assert Status().file_status_map == {ExPath('README'): 'M',
+                                        ExPath('new file.txt'): '??',
+                                        ExPath('new -> name.txt'): 'R'}
+
+
+def test__Status__file_status_map__relative_to_cwd(tmp_path, monkeypatch):
+    repo = make_git_repo(tmp_path, {'README': 'hello\n', 'sub/file.txt': 'content\n'})
+    (repo / 'README').write_text('changed\n')
+    (repo / 'sub' / 'file.txt').write_text('changed\n')
+    monkeypatch.chdir(repo / 'sub')
+    assert Status().file_status_map == {ExPath('../README'): 'M',
+                                        ExPath('file.txt'): 'M'}
+
+
+def test__Status__tracked_paths__relative_to_cwd(tmp_path, monkeypatch):
+    repo = make_git_repo(tmp_path, {'README': 'hello\n', 'sub/file.txt': 'content\n'})
+    monkeypatch.chdir(repo)
+    status = Status()
+    assert status.tracked_paths == ['README', 'sub/file.txt']
+    monkeypatch.chdir(repo / 'sub')
+    assert Status().tracked_paths == ['../README', 'file.txt']
+    (repo / 'new.txt').write_text('new\n')
+    sp.run(['git', 'add', 'new.txt'], cwd=repo, check=True)
+    assert '../new.txt' in status.tracked_paths
+
+
+# ** daemon
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    repo = make_git_repo(tmp_path / 'repo', {'README': 'hello\n', 'src/main.py': 'main\n', '.gitignore': 'build/\n'})
+    monkeypatch.chdir(repo)
+    return repo
+
+
+def git_status(repo) -> list:
+    return sorted(parse(sp.run(['git', 'status', '--porcelain=v2', '-z'], cwd=repo, capture_output=True).stdout))
+
+
+def test__StatusCache__incremental(repo):
+    cache = StatusCache(str(repo))
+    assert cache.get() == []
+    changes = [('README', lambda: (repo / 'README').write_text('changed\n')),
+               ('newdir', lambda: (repo / 'newdir').mkdir()),
+               ('newdir/a', lambda: (repo / 'newdir' / 'a').write_text('a\n')),
+               ('newdir/b', lambda: (repo / 'newdir' / 'b').write_text('b\n')),
+               ('newdir/a', lambda: (repo / 'newdir' / 'a').unlink()),
+               ('src/main.py', lambda: (repo / 'src' / 'main.py').unlink()),
+               ('build', lambda: (repo / 'build').mkdir()),
+               ('README', lambda: (repo / 'README').write_text('hello\n')),
+               ]
+    for path, change in changes:
+        change()
+        cache.mark(path)
+        assert sorted(cache.get()) == git_status(repo), path
+    (repo / '.gitignore').write_text('')
+    cache.mark('.gitignore')
+    assert sorted(cache.get()) == git_status(repo)
+
+
+@contextmanager
+def serving():
+    server = threading.Thread(target=daemon.serve, daemon=True)
+    server.start()
+    for _ in range(100):
+        if os.path.exists(daemon.sockpath()):
+            break
+        time.sleep(0.05)
+    try:
+        yield
+    finally:
+        assert daemon.stop()
+        server.join(timeout=5)
+
+
+def test__daemon__serve(repo):
+    assert daemon.query() is None
+    with serving():
+        assert daemon.query() == []
+        (repo / 'README').write_text('changed\n')
+        (repo / 'new.txt').write_text('new\n')
+        assert Status().file_status_map == {ExPath('README'): 'M', ExPath('new.txt'): '??'}
+        sp.run(['git', 'add', 'new.txt'], check=True)
+        assert sorted(daemon.query()) == git_status(repo)
+    assert not os.path.exists(daemon.sockpath())
+    assert daemon.query() is None
+
+
+@pytest.fixture(params=['inotify', 'polling'])
+def watcher(request, monkeypatch):
+    if request.param == 'polling':
+        def no_inotify(*args):
+            raise OSError('no inotify')
+        
+        monkeypatch.setattr(daemon, 'InotifyWatcher', no_inotify)
+    return request.param
+
+
+@pytest.mark.parametrize('branch', ['master', 'feature/login'])
+def test__daemon__branch_moved(repo, watcher, branch):
+    """Moving the branch HEAD points to changes the staged diff, without touching the index or HEAD"""
+    git(repo, 'checkout', '-q', '-B', branch)
+    (repo / 'README').write_text('second\n')
+    git(repo, 'commit', '-q', '-am', 'second commit')
+    with serving():
+        assert daemon.query() == []
+        git(repo, 'reset', '-q', '--soft', 'HEAD~1')
+        assert sorted(daemon.query()) == git_status(repo) != []
+        git(repo, 'reset', '-q', '--soft', 'HEAD@{1}')
+        assert sorted(daemon.query()) == git_status(repo) == []
+        # once packed, a branch lives in .git/packed-refs alone
+        git(repo, 'pack-refs', '--all', '--prune')
+        assert not (repo / '.git' / 'refs' / 'heads' / branch).exists()
+        assert daemon.query() == []
+        packed = repo / '.git' / 'packed-refs'
+        moved = packed.read_text().replace(git(repo, 'rev-parse', 'HEAD'), git(repo, 'rev-parse', 'HEAD~1'))
+        (repo / '.git' / 'packed-refs.lock').write_text(moved)
+        os.replace(repo / '.git' / 'packed-refs.lock', packed)
+        assert sorted(daemon.query()) == git_status(repo) != []
@@ -0,0 +1,75 @@
+import json
+import sys
+
+import pytest
+
+from igit.util import shell, trace
+
+
+@pytest.fixture
+def tracefile(tmp_path, monkeypatch):
+    path = tmp_path / 'igit.trace'
+    monkeypatch.setattr(trace, 'path', str(path))
+    monkeypatch.setattr(trace, '_subcommand', 'co')
+    return path
+
+
+def test__trace__disabled_by_default(tmp_path, monkeypatch):
+    monkeypatch.setattr(trace, 'path', None)
+    shell.runquiet(f'{sys.executable} -c "print(1)"')
+    with trace.span('nothing'):
+        pass
+    assert not list(tmp_path.iterdir())
+
+
+def test__trace__records_commands(tracefile):
+    cmd = f'{sys.executable} -c "import sys; print(12345); sys.stderr.write(\'oops\')"'
+    shell.runquiet(cmd)
+    shell.runraw(cmd)
+    list(shell.iterlines(cmd))
+    shell.stream(cmd, printcmd=False, forward=False)
+    shell.runmany(cmd, printout=False, printcmd=False)
+    events = trace.read(str(tracefile))
+    assert len(events) == 5
+    for event in events:
+        assert event.name == cmd
+        assert event.cat == 'shell'
+        assert event.duration >= 0
+        assert event.args == dict(subcommand='co', returncode=0, stdout=len(b'12345\n'), stderr=len(b'oops'))
+
+
+def test__trace__records_failures(tracefile):
+    shell.runraw(f'{sys.executable} -c "raise SystemExit(3)"', raiseonfail=False)
+    event, = trace.read(str(tracefile))
+    assert event.args['returncode'] == 3
+
+
+def test__trace__loads_as_chrome_trace(tracefile):
+    shell.runquiet(f'{sys.executable} -c "print(1)"')
+    with trace.span('fetch: waiting'):
+        pass
+    text = tracefile.read_text()
+    assert text.startswith('[\n')
+    # the chrome trace format allows the closing bracket and a trailing comma to be missing
+    events = json.loads(text.rstrip().rstrip(',') + ']')
+    assert [event['ph'] for event in events] == ['X', 'X']
+    assert events[1]['cat'] == 'igit'
+
+
+def test__aggregate__slowest_first():
+    events = [trace.Event('git fetch --all', 'shell', 0, 2.0, 1, {'returncode': 0}),
+              trace.Event('git status --porcelain', 'shell', 0, 0.5, 1, {'returncode': 0}),
+              trace.Event('git status -z', 'shell', 0, 1.0, 1, {'returncode': 128}),
+              trace.Event('git fetch --all', 'shell', 0, 1.0, 1, {'returncode': 1})]
+    fetch, status = trace.aggregate(events)
+    assert fetch == trace.Aggregate('git fetch', 2, 3.0, 2.0, 1)
+    assert status == trace.Aggregate('git status', 2, 1.5, 1.0, 1)
+
+
+def test__import_times():
+    times = trace.import_times('igit.util.lazy')
+    assert times[-1].module == 'igit.util.lazy'
+    assert times[-1].depth == 0
+    assert times[-1].cumulative >= max(time.own for time in times)
+    with pytest.raises(ImportError):
+        trace.import_times('igit.no_such_module')
@@ -0,0 +1,93 @@
+"""Approximate substring matching for many strings at once, with numpy.
+The edit distance table is computed one text column at a time, for every string in the batch together,
+so the per-item Python loop becomes a per-char one. Optional: `available` is False if numpy isn't installed,
+and search falls back to myers.best_match() per item. numpy is imported on first use, not with this module."""
+from typing import List, Tuple, Sequence
+
+from igit.util import lazy
+
+available = lazy.available('numpy')
+np = lazy.module('numpy') if available else None
+
+# cells hold `dist << 32 | start`, so np.minimum() prefers the smaller distance, then the earlier start (the longer match)
+_SHIFT = 32
+_DIST = 1 << _SHIFT
+_START_MASK = _DIST - 1
+# rows per batch; strings are sorted by length first, so a batch is only as wide as its longest string
+CHUNK = 8192
+
+
+class PackedStrings:
+    """Strings as one flat array of char codes, so any subset can be laid out as a padded matrix cheaply"""
+    
+    def __init__(self, strings: Sequence[str]):
+        if not available:
+            raise ModuleNotFoundError("PackedStrings needs numpy", name='numpy')
+        self.lengths = np.fromiter(map(len, strings), dtype=np.int64, count=len(strings))
+        self.offsets = np.zeros(len(strings), dtype=np.int64)
+        np.cumsum(self.lengths[:-1], out=self.offsets[1:])
+        joined = ''.join(strings)
+        self.codes = np.frombuffer(joined.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32) if joined else np.zeros(0, np.uint32)
+    
+    def __len__(self):
+        return len(self.lengths)
+    
+    def matrix(self, rows: 'np.ndarray') -> 'np.ndarray':
+        """The strings at `rows`, as a matrix of char codes. Rows are padded with zeros past their length"""
+        lengths = self.lengths[rows]
+        width = int(lengths.max()) if len(rows) else 0
+        columns = np.arange(width)
+        valid = columns < lengths[:, None]
+        matrix = np.zeros((len(rows), width), dtype=np.uint32)
+        matrix[valid] = self.codes[(self.offsets[rows][:, None] + columns)[valid]]
+        return matrix
+
+
+def _best_matches(keyword: str, matrix: 'np.ndarray', lengths: 'np.ndarray') -> Tuple['np.ndarray', 'np.ndarray']:
+    """(distances, matched lengths) of the closest, then longest, occurrence of `keyword` in each row"""
+    m = len(keyword)
+    count, width = matrix.shape
+    # column j of the table, row by row: cells[i] is keyword[:i] against the best substring ending at the j-th char
+    cells = [np.full(count, i << _SHIFT, dtype=np.int64) for i in range(m + 1)]
+    # `dist << 32` minus the matched length: lower is better, the same way best_match() picks
+    best = np.full(count, m << _SHIFT, dtype=np.int64)
+    keycodes = [ord(char) for char in keyword]
+    for j in range(width):
+        column = matrix[:, j]
+        mismatch = {code: (column != code).astype(np.int64) << _SHIFT for code in set(keycodes)}
+        diag = cells[0]
+        # an occurrence may start anywhere, so row 0 is always free, starting here
+        cells[0] = np.full(count, j + 1, dtype=np.int64)
+        for i in range(1, m + 1):
+            left = cells[i]
+            cell = np.minimum(diag + mismatch[keycodes[i - 1]], left + _DIST)
+            np.minimum(cell, cells[i - 1] + _DIST, out=cell)
+            cells[i] = cell
+            diag = left
+        last = cells[m]
+        score = (last & ~_START_MASK) - (j + 1 - (last & _START_MASK))
+        np.minimum(best, np.where(j < lengths, score, best), out=best)
+    # round the negative length back up to a whole distance
+    dists = (best + _START_MASK) >> _SHIFT
+    return dists, (dists << _SHIFT) - best
+
+
+def best_matches(keyword: str, packed: PackedStrings, rows: Sequence[int],
+                 max_dist: int) -> List[Tuple[int, Tuple[int, int]]]:
+    """`(row, (edit distance, matched length))` for each of `rows` (indexes into `packed`) within `max_dist` of `keyword`,
+    in the order of `rows`. Same results as myers.best_match()"""
+    rows = np.asarray(rows, dtype=np.int64)
+    if not len(rows):
+        return []
+    if not keyword:
+        return [(int(row), (0, 0)) for row in rows]
+    found = []
+    by_length = rows[np.argsort(packed.lengths[rows], kind='stable')]
+    for start in range(0, len(by_length), CHUNK):
+        chunk = by_length[start:start + CHUNK]
+        dists, lengths = _best_matches(keyword, packed.matrix(chunk), packed.lengths[chunk])
+        within = np.flatnonzero(dists <= max_dist)
+        found.extend(zip(chunk[within].tolist(), zip(dists[within].tolist(), lengths[within].tolist())))
+    order = {row: i for i, row in enumerate(rows.tolist())}
+    found.sort(key=lambda match: order[match[0]])
+    return found
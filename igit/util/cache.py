@@ -1,16 +1,156 @@
 import functools
-from typing import Optional, Callable, Any
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Optional, Callable, Any, NamedTuple, Hashable, Iterable, Tuple, Dict
 
+from igit.util import termcolor
 from igit.util.misc import deephash
+from igit.util.path import ExPath, gitdir, igitdir
 
 UNSPECIFIED = object()
+# these live in the worktree's own git dir; anything else in the common one (they differ for `git worktree`s)
+_PER_WORKTREE = frozenset({'HEAD', 'index', 'ORIG_HEAD', 'FETCH_HEAD', 'MERGE_HEAD', 'CHERRY_PICK_HEAD'})
 
 
-def cachedprop(_fn=None):
+def _common_dir(_gitdir: str) -> str:
+    try:
+        with open(os.path.join(_gitdir, 'commondir')) as file:
+            return os.path.join(_gitdir, file.read().strip())
+    except FileNotFoundError:
+        return _gitdir
+
+
+def git_stamp(depends_on: Iterable[str]) -> Optional[Tuple]:
+    """What changes whenever any of `depends_on` (paths in the git dir, like 'HEAD' or 'refs/') changes.
+    Trailing slash means a directory, recursively: git writes refs to a lock file and renames it,
+    so only directories' mtimes need checking. None when not in a git repo"""
+    try:
+        _gitdir = str(gitdir())
+    except FileNotFoundError:
+        return None
+    common = None
+    stamp = []
+    for name in depends_on:
+        if name in _PER_WORKTREE:
+            path = os.path.join(_gitdir, name)
+        else:
+            if common is None:
+                common = _common_dir(_gitdir)
+            path = os.path.join(common, name)
+        if not name.endswith('/'):
+            try:
+                stat = os.stat(path)
+                stamp.append((stat.st_mtime_ns, stat.st_ino, stat.st_size))
+            except FileNotFoundError:
+                stamp.append(None)
+            continue
+        stack = [path]
+        while stack:
+            directory = stack.pop()
+            try:
+                stat = os.stat(directory)
+                with os.scandir(directory) as entries:
+                    stack.extend(entry.path for entry in entries if entry.is_dir(follow_symlinks=False))
+            except (FileNotFoundError, NotADirectoryError):
+                stamp.append((directory, None))
+                continue
+            stamp.append((directory, stat.st_mtime_ns, stat.st_ino))
+    return tuple(stamp)
+
+
+class DiskCache:
+    """{key: [stamp, value]} in .git/igit/cache, shared by every igit process. JSON; written to a temp file
+    and renamed over the old one, so readers never see half a file. Entries written by an older VERSION are dropped."""
+    VERSION = 1
+    
+    def __init__(self, path: ExPath = None):
+        self.path = path or igitdir() / 'cache'
+        self._entries: Optional[Dict[str, list]] = None
+    
+    def _read(self) -> Dict[str, list]:
+        try:
+            with open(self.path) as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return dict()
+        except ValueError:
+            print(termcolor.yellow(f'{self.path} is corrupt, starting over'))
+            return dict()
+        if not isinstance(data, dict) or data.get('version') != self.VERSION:
+            return dict()
+        return data.get('entries', dict())
+    
+    def get(self, key: str, stamp) -> Any:
+        """The value stored under `key` if it was stored with the same `stamp`, else UNSPECIFIED"""
+        if self._entries is None:
+            self._entries = self._read()
+        try:
+            stored_stamp, value = self._entries[key]
+        except (KeyError, ValueError):
+            return UNSPECIFIED
+        if stored_stamp != _jsonable(stamp):
+            return UNSPECIFIED
+        return value
+    
+    def set(self, key: str, stamp, value):
+        # re-read, so entries other processes wrote in the meantime aren't lost
+        self._entries = self._read()
+        self._entries[key] = [_jsonable(stamp), value]
+        data = json.dumps({'version': self.VERSION, 'entries': self._entries})
+        try:
+            with tempfile.NamedTemporaryFile('w', dir=self.path.parent, prefix='.cache.', delete=False) as file:
+                file.write(data)
+            os.replace(file.name, self.path)
+        except OSError as e:
+            print(termcolor.yellow(f'DiskCache: failed writing {self.path}: {e}'))
+    
+    def clear(self):
+        self._entries = dict()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _jsonable(obj):
+    """Tuples become lists, like after a round trip through JSON"""
+    return json.loads(json.dumps(obj))
+
+
+_diskcaches: Dict[str, DiskCache] = {}
+
+
+def diskcache() -> DiskCache:
+    """The DiskCache of the current repository"""
+    _gitdir = str(gitdir())
+    try:
+        return _diskcaches[_gitdir]
+    except KeyError:
+        cache = _diskcaches[_gitdir] = DiskCache()
+        return cache
+
+
+def cachedprop(_fn=None, *, depends_on: Iterable[str] = (), persist=False):
+    """Caches the property's value on the instance.
+    With `depends_on` (paths in the git dir, see git_stamp()), the value is recalculated whenever one of them changes:
+    ::
+        @cachedprop(depends_on=('HEAD',))
+        def current(self) -> str: ...
+    With `persist`, the value is also kept in .git/igit/cache (see DiskCache) for the next igit process,
+    as long as `depends_on` don't change. It has to be JSON serializable."""
+    if persist and not depends_on:
+        raise ValueError("cachedprop(persist=True) needs depends_on, or it would never be invalidated")
+    
     def wrap(fn):
-        ret = PropCache(fn)
+        ret = PropCache(fn, depends_on=depends_on, persist=persist)
         return ret
     
+    if _fn is None:
+        # We're called as @cachedprop(...)
+        return wrap
     # We're called as @cachedprop without parens.
     return wrap(_fn)
 
@@ -20,10 +160,12 @@ class PropCache(property):
     def __init__(self, fget: Optional[Callable[[Any], Any]] = None,
                  fset: Optional[Callable[[Any, Any], None]] = None,
                  fdel: Optional[Callable[[Any], None]] = None,
-                 doc: Optional[str] = None) -> None:
+                 doc: Optional[str] = None, *, depends_on: Iterable[str] = (), persist=False) -> None:
         """fget: function TrichDay.sleep"""
         
         self._propname = fget.__name__
+        self._depends_on = tuple(depends_on)
+        self._persist = persist
         super().__init__(fget, fset, fdel, doc)
     
     def __str__(self):
@@ -48,6 +190,14 @@ class PropCache(property):
             obj._cache[self._propname] = UNSPECIFIED
             return UNSPECIFIED
     
+    def _is_stale(self, obj, stamp) -> bool:
+        """Whether any of the files the prop depends on changed since it was calculated. Records the new stamp"""
+        stamps = obj.__dict__.setdefault('_cache_stamps', dict())
+        if stamps.get(self._propname, UNSPECIFIED) == stamp:
+            return False
+        stamps[self._propname] = stamp
+        return True
+    
     def _calculate_value(self, obj, objtype: Optional[type] = None):
         ret = super().__get__(obj, objtype)
         obj._cache[self._propname] = ret
@@ -56,13 +206,27 @@ class PropCache(property):
     def __get__(self, obj, objtype: Optional[type] = None):
         self._qname = f'{obj.__class__.__qualname__}.{self._propname}'
         cached_val = self._try_get_from_cache(obj)
+        stamp = None
+        if self._depends_on:
+            stamp = git_stamp(self._depends_on)
+            if self._is_stale(obj, stamp):
+                cached_val = UNSPECIFIED
         if cached_val is not UNSPECIFIED:
             # _calculate_value() was called before
             return cached_val
         
         # * cached_val is UNSPECIFIED
+        # stamp is None outside a git repo, where there's nowhere to persist to
+        persist = self._persist and stamp is not None
+        if persist:
+            stored_val = diskcache().get(self._qname, stamp)
+            if stored_val is not UNSPECIFIED:
+                obj._cache[self._propname] = stored_val
+                return stored_val
         calculated_val = self._calculate_value(obj, objtype)
         assert calculated_val is not UNSPECIFIED
+        if persist:
+            diskcache().set(self._qname, stamp, calculated_val)
         return calculated_val
     
     def __set__(self, obj, value) -> None:
@@ -70,42 +234,99 @@ class PropCache(property):
         obj._cache[self._propname] = value
 
 
-def memoize(fun):
-    """A simple memoize decorator for functions supporting (hashable)
-    positional arguments.
-    It also provides a cache_clear() function for clearing the cache:
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int  # dropped for room, or expired
+    maxsize: Optional[int]
+    currsize: int
+
+
+_KWARGS = object()
+
+
+def _hashable(obj) -> Hashable:
+    """`obj` if hashable, else a hashable stand-in for common unhashable types. deephash() is the last resort"""
+    try:
+        hash(obj)
+        return obj
+    except TypeError:
+        pass
+    if isinstance(obj, (list, tuple)):
+        return type(obj), tuple(map(_hashable, obj))
+    if isinstance(obj, dict):
+        return type(obj), frozenset((key, _hashable(value)) for key, value in obj.items())
+    if isinstance(obj, set):
+        return set, frozenset(obj)
+    if isinstance(obj, slice):
+        return slice, _hashable(obj.start), _hashable(obj.stop), _hashable(obj.step)
+    if isinstance(obj, bytearray):
+        return bytearray, bytes(obj)
+    return type(obj), deephash(obj)
 
-    >>> @memoize
-    ... def foo()
+
+def _make_key(args: tuple, kwargs: dict) -> Hashable:
+    key = tuple(map(_hashable, args))
+    if kwargs:
+        key += (_KWARGS, *sorted((name, _hashable(value)) for name, value in kwargs.items()))
+    return key
+
+
+def memoize(fun=None, *, maxsize: int = None, ttl: float = None):
+    """A memoize decorator, with or without args. Unhashable args (lists, dicts, slices...) are fine.
+    `maxsize` evicts the least recently used; `ttl` expires entries after that many seconds.
+    It also provides cache_info() and cache_clear():
+    
+    >>> @memoize(maxsize=128)
+    ... def foo(bar):
     ...     return 1
         ...
-    >>> foo()
+    >>> foo([1, 2])
     1
+    >>> foo.cache_info()
+    CacheInfo(hits=0, misses=1, evictions=0, maxsize=128, currsize=1)
     >>> foo.cache_clear()
     >>>
     """
+    if fun is None:
+        # We're called as @memoize(...)
+        return functools.partial(memoize, maxsize=maxsize, ttl=ttl)
+    
+    # {key: (value, expiry or None)}, least recently used first
+    cache: OrderedDict = OrderedDict()
+    stats = dict(hits=0, misses=0, evictions=0)
     
     @functools.wraps(fun)
     def wrapper(*args, **kwargs):
-        key = (args, frozenset(sorted(kwargs.items())))
+        key = _make_key(args, kwargs)
         try:
-            try:
-                return cache[key]
-            except TypeError as e:  # unhashable type: 'slice'
-                return cache[deephash(key)]
-        
+            value, expiry = cache[key]
         except KeyError:
-            ret = fun(*args, **kwargs)
-            try:
-                cache[key] = ret
-            except TypeError as e:  # unhashable type: 'slice'
-                cache[deephash(key)] = ret
-            return ret
+            pass
+        else:
+            if expiry is None or time.monotonic() < expiry:
+                cache.move_to_end(key)
+                stats['hits'] += 1
+                return value
+            del cache[key]
+            stats['evictions'] += 1
+        
+        stats['misses'] += 1
+        value = fun(*args, **kwargs)
+        cache[key] = value, None if ttl is None else time.monotonic() + ttl
+        if maxsize is not None and len(cache) > maxsize:
+            cache.popitem(last=False)
+            stats['evictions'] += 1
+        return value
+    
+    def cache_info() -> CacheInfo:
+        return CacheInfo(stats['hits'], stats['misses'], stats['evictions'], maxsize, len(cache))
     
     def cache_clear():
-        """Clear cache."""
+        """Clear cache and stats."""
         cache.clear()
+        stats.update(hits=0, misses=0, evictions=0)
     
-    cache = {}
+    wrapper.cache_info = cache_info
     wrapper.cache_clear = cache_clear
     return wrapper
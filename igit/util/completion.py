@@ -0,0 +1,34 @@
+from typing import List, Iterable, Callable, Optional
+
+from prompt_toolkit.completion import Completer, Completion, CompleteEvent
+from prompt_toolkit.document import Document
+
+from igit.util.search import SearchSession
+
+
+class SearchCompleter(Completer):
+    """Completes the word before the cursor from a collection (branch names, files...) as you type.
+    `collection` is called on every completion, so completions are as fresh as what it returns; usually a cachedprop,
+    which stays the same list until git changes it. The SearchSession is kept as long as the list is the same one,
+    so each keystroke only narrows down the previous results"""
+    
+    def __init__(self, collection: Callable[[], List[str]], meta: str = None, *, limit=20):
+        self.collection = collection
+        self.meta = meta
+        self.limit = limit
+        self._session: Optional[SearchSession] = None
+    
+    @property
+    def session(self) -> SearchSession:
+        collection = self.collection()
+        if self._session is None or self._session.collection is not collection:
+            self._session = SearchSession(collection)
+        return self._session
+    
+    def get_completions(self, document: Document, complete_event: CompleteEvent) -> Iterable[Completion]:
+        word = document.get_word_before_cursor(WORD=True)
+        if not word or word.startswith('%'):
+            # igit's own commands are someone else's
+            return
+        for item in self.session.complete(word, self.limit):
+            yield Completion(item, start_position=-len(word), display_meta=self.meta)
@@ -0,0 +1,33 @@
+"""Modules that are imported on first use, not at import time, so commands that don't need them don't pay for them.
+::
+    np = lazy.module('numpy')  # a placeholder; nothing is imported yet
+    np.zeros(3)  # numpy is imported here
+`module()` finds the module up front (cheap; raises ModuleNotFoundError like `import` would), and defers executing it."""
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def available(name: str) -> bool:
+    """Whether `name` can be imported, without importing it. A dotted name imports its parent packages"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except ModuleNotFoundError:
+        return False
+
+
+def module(name: str) -> ModuleType:
+    """`name`, imported when an attribute of it is first accessed. Returns the module itself if it's already imported"""
+    try:
+        return sys.modules[name]
+    except KeyError:
+        pass
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f'No module named {name!r}', name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    lazy = importlib.util.module_from_spec(spec)
+    sys.modules[name] = lazy
+    loader.exec_module(lazy)
+    return lazy
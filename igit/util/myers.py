@@ -0,0 +1,98 @@
+"""Bit-parallel approximate substring matching (Myers 1999, in Hyyrö's formulation).
+A column of the edit distance table is kept as two bit vectors of vertical deltas (+1 / -1),
+so each char of the text costs a handful of integer operations instead of a loop over the keyword.
+Python ints are the bit vectors; keywords up to 64 chars fit a machine word, longer ones just cost a bit more."""
+from typing import Dict, Optional, Tuple, Generator
+
+from igit.util.cache import memoize
+
+
+@memoize(maxsize=256)
+def _peq(keyword: str) -> Dict[str, int]:
+    """{char: bitmask of its positions in keyword}"""
+    peq = {}
+    for i, char in enumerate(keyword):
+        peq[char] = peq.get(char, 0) | (1 << i)
+    return peq
+
+
+def _scores(peq: Dict[str, int], m: int, text: str, *, anchored: bool) -> Generator[int, None, None]:
+    """The edit distance at the last row of each column, i.e. after each char of `text`.
+    If not `anchored`, a match may start anywhere in `text` (row 0 is all zeros);
+    if `anchored`, it starts at text[0] (row 0 is 0, 1, 2...)"""
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    pv = mask
+    mv = 0
+    score = m
+    for char in text:
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = ((ph << 1) | anchored) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+        yield score
+
+
+def distance(keyword: str, text: str) -> int:
+    """The edit distance between `keyword` and the closest substring of `text`"""
+    if not keyword:
+        return 0
+    return min(_scores(_peq(keyword), len(keyword), text, anchored=False), default=len(keyword))
+
+
+def best_match(keyword: str, text: str, max_dist: int) -> Optional[Tuple[int, int]]:
+    """The `(edit distance, matched length)` of the closest occurrence of `keyword` anywhere in `text`,
+    or None if it's farther than `max_dist`. Ties prefer the longer occurrence."""
+    m = len(keyword)
+    if not m:
+        return 0, 0
+    # _scores(), inlined; this is the hot loop of a fuzzy search
+    peq = _peq(keyword)
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    pv = mask
+    mv = 0
+    score = m
+    best = m
+    ends = []
+    for end, char in enumerate(text, start=1):
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = (ph << 1) & mask
+        pv = ((mh << 1) & mask) | (~(xv | ph) & mask)
+        mv = ph & xv
+        if score < best:
+            best = score
+            ends = [end]
+        elif score == best:
+            ends.append(end)
+    if best > max_dist:
+        return None
+    # scan back from each end with the keyword reversed, anchored at the end, for the farthest start at that distance
+    rpeq = _peq(keyword[::-1])
+    length = 0
+    longest = m + best
+    for end in ends:
+        if min(end, longest) <= length:
+            continue
+        segment = text[max(0, end - longest):end][::-1]
+        for span, score in enumerate(_scores(rpeq, m, segment, anchored=True), start=1):
+            if score == best and span > length:
+                length = span
+    return best, length
@@ -1,6 +1,8 @@
+import os
 import re
-from pathlib import Path, PosixPath
-from typing import Union, Any, Generator
+import threading
+from pathlib import PosixPath
+from typing import Union, Any, Generator, Callable, Tuple, Pattern, Dict
 
 from igit.util.regex import FILE_SUFFIX, is_only_regex
 
@@ -35,14 +37,32 @@ class ExPath(PosixPath):
         else:
             return False
     
-    def regex(self, pattern, predicate=bool) -> Generator['ExPath', None, None]:
-        """Like Path.glob(), but supports full python regex"""
-        for item in filter(predicate, self.iterdir()):
-            if item.is_dir():
-                yield from item.regex(pattern, predicate)
-                continue
-            if re.match(pattern, str(item)):
-                yield item
+    def regex(self, pattern, predicate=bool, *,
+              prune: Callable[[str, bool], bool] = None, workers: int = 0) -> Generator['ExPath', None, None]:
+        """Like Path.glob(), but supports full python regex.
+        `predicate(ExPath)` and `prune(path_string, is_dir)` both filter entries before directories are descended into;
+        `prune` is the cheap one (True means skip). With `workers`, top-level directories are walked in a thread pool."""
+        regex = re.compile(pattern)
+        prefix = '' if str(self) == '.' else str(self)
+        if not workers:
+            yield from _regex_walk(prefix, regex, predicate, prune)
+            return
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(workers) as pool:
+            # files in the top directory are matched here; subdirectories go to the pool. output order is kept
+            results = []
+            for itempath, is_dir in _scandir(prefix, predicate, prune):
+                if is_dir:
+                    results.append(pool.submit(list, _regex_walk(itempath, regex, predicate, prune)))
+                elif regex.match(itempath):
+                    results.append([ExPath(itempath)])
+            try:
+                for result in results:
+                    yield from (result if isinstance(result, list) else result.result())
+            finally:
+                for result in results:
+                    if not isinstance(result, list):
+                        result.cancel()
     
     def subpath_of(self, other: 'ExPathOrStr'):
         return ExPath.parent_of(other, self)
@@ -69,6 +89,43 @@ class ExPath(PosixPath):
             return False
 
 
+def _scandir(dirpath: str, predicate, prune) -> Generator[Tuple[str, bool], None, None]:
+    """(path, is_dir) of each entry that passes the filters. `dirpath` is '' for cwd"""
+    try:
+        entries = os.scandir(dirpath or '.')
+    except (FileNotFoundError, NotADirectoryError, PermissionError):
+        return
+    with entries:
+        for entry in entries:
+            itempath = f'{dirpath}/{entry.name}' if dirpath else entry.name
+            # DirEntry caches its type from the directory listing, so this doesn't stat
+            is_dir = entry.is_dir()
+            if prune is not None and prune(itempath, is_dir):
+                continue
+            if predicate is not bool and not predicate(ExPath(itempath)):
+                continue
+            yield itempath, is_dir
+
+
+def _regex_walk(dirpath: str, regex: Pattern, predicate, prune) -> Generator[ExPath, None, None]:
+    """Depth first, in directory listing order (like the recursive iterdir() it replaces), without recursing"""
+    stack = [_scandir(dirpath, predicate, prune)]
+    try:
+        while stack:
+            for itempath, is_dir in stack[-1]:
+                if is_dir:
+                    # resume this directory after the subdirectory is done
+                    stack.append(_scandir(itempath, predicate, prune))
+                    break
+                if regex.match(itempath):
+                    yield ExPath(itempath)
+            else:
+                stack.pop()
+    finally:
+        for entries in stack:
+            entries.close()
+
+
 # ExPath = Path
 # ExPath.__contains__ = __contains__
 # ExPath.subpath_of = subpath_of
@@ -78,11 +135,112 @@ class ExPath(PosixPath):
 ExPathOrStr = Union[str, ExPath]
 
 
-def dirsize(path: ExPathOrStr) -> int:
-    """Returns size in bytes"""
-    if isinstance(path, str):
-        return dirsize(Path(path))
-    return sum(f.lstat().st_size for f in path.glob('**/*') if f.is_file())
+_dirsizes: Dict[str, Tuple[Tuple[int, int], int, bool]] = {}
+
+
+def dirsize(path: ExPathOrStr, *, threshold: int = None, workers: int = 0) -> int:
+    """Returns size in bytes.
+    With `threshold`, stops as soon as the size reaches it (so the result is only exact below it).
+    With `workers`, top-level subdirectories are summed in a thread pool.
+    Results are cached by the directory's mtime; that notices files being added or removed directly under it,
+    not files deeper down, or files growing in place."""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    stamp = stat.st_mtime_ns, stat.st_ino
+    try:
+        cached_stamp, size, complete = _dirsizes[path]
+        if cached_stamp == stamp and (complete or (threshold is not None and size >= threshold)):
+            return size
+    except KeyError:
+        pass
+    limit = float('inf') if threshold is None else threshold
+    if workers:
+        size = _dirsize_parallel(path, limit, workers)
+    else:
+        size = _subtree_size(path, limit)
+    _dirsizes[path] = stamp, size, size < limit
+    return size
+
+
+def _subtree_size(path: str, threshold: float, stop: threading.Event = None) -> int:
+    size = 0
+    stack = [path]
+    while stack and size < threshold:
+        if stop is not None and stop.is_set():
+            break
+        try:
+            entries = os.scandir(stack.pop())
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file():
+                        size += entry.stat(follow_symlinks=False).st_size
+                except FileNotFoundError:
+                    continue
+    return size
+
+
+def _dirsize_parallel(path: str, threshold: float, workers: int) -> int:
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    size = 0
+    subdirs = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.path)
+            elif entry.is_file():
+                size += entry.stat(follow_symlinks=False).st_size
+    stop = threading.Event()
+    with ThreadPoolExecutor(workers) as pool:
+        # each subtree only knows its own size, so they all get the whole threshold, and are stopped together
+        futures = [pool.submit(_subtree_size, subdir, threshold, stop) for subdir in subdirs]
+        for future in as_completed(futures):
+            size += future.result()
+            if size >= threshold:
+                stop.set()
+    return size
+
+
+def _find_dotgit(cwd: ExPathOrStr = None):
+    start = os.path.abspath(cwd or os.getcwd())
+    directory = start
+    while True:
+        dotgit = os.path.join(directory, '.git')
+        if os.path.exists(dotgit):
+            return directory, dotgit
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            raise FileNotFoundError(f"not a git repository (or any of the parent directories): {start}")
+        directory = parent
+
+
+def gitdir(cwd: ExPathOrStr = None) -> ExPath:
+    """The git dir of the repository containing `cwd` (default: current dir), without spawning `git rev-parse`.
+    Follows 'gitdir: ...' files, like in worktrees or clones with --separate-git-dir"""
+    directory, dotgit = _find_dotgit(cwd)
+    if os.path.isfile(dotgit):
+        with open(dotgit) as file:
+            key, _, value = file.read().strip().partition(': ')
+        if key == 'gitdir':
+            return ExPath(os.path.join(directory, value))
+    return ExPath(dotgit)
+
+
+def toplevel(cwd: ExPathOrStr = None) -> ExPath:
+    """The root of the working tree containing `cwd`, like `git rev-parse --show-toplevel`"""
+    directory, _ = _find_dotgit(cwd)
+    return ExPath(directory)
+
+
+def igitdir() -> ExPath:
+    """.git/igit/, where igit keeps its own state. Created if needed."""
+    path = gitdir() / 'igit'
+    path.mkdir(exist_ok=True)
+    return path
 
 
 def has_file_suffix(path: ExPathOrStr) -> bool:
@@ -1,30 +1,44 @@
 import re
 from collections import defaultdict
-from typing import List, Optional, Generator, Literal, Callable, Tuple, TypeVar, Dict, Generic
-
-from fuzzysearch import find_near_matches
+from typing import List, Optional, Generator, Literal, Callable, Tuple, TypeVar, Dict, Generic, Set, Iterable
 
 from igit import prompt
 from igit.prompt import Special
+from igit.util import batchmatch
+from igit.util.cache import cachedprop
+from igit.util.myers import best_match
 from more_termcolor import paint
-from ipdb import set_trace
+import heapq
 import inspect
 import math
+import multiprocessing
+from multiprocessing.connection import Connection
+from contextlib import closing
 
 SearchCriteria = Literal['substring', 'equals', 'startswith', 'endswith']
+# search_and_prompt() runs the fuzzy stage in parallel from this many items
+PARALLEL_THRESHOLD = 5000
 T = TypeVar('T')
 
 
 class Matches(Generic[T]):
+    """The best-scoring items seen so far; lower score is better.
+    Keeps at most `maxsize` items, except that items tying with the worst score are all kept,
+    since there's no way to decide which to discard. Kept on a heap, worst on top, so appending is O(log k)."""
+    
     def __init__(self, *, maxsize):
-        self.count = 0
-        self.matches: Dict[float, List[T]] = defaultdict(list)
-        self.worst_score = 0
+        # (-score, order of arrival, item): the worst score pops first; among ties, the earliest arrival.
+        # append() evicts a tied worst score all at once, so the tiebreak never decides what's kept
+        self._heap: List[Tuple[float, int, T]] = []
+        self._appended = 0
         self.best_score = 999
         self._maxsize = maxsize
     
     def __bool__(self):
-        return bool(self.matches)
+        return bool(self._heap)
+    
+    def __len__(self):
+        return len(self._heap)
     
     def __repr__(self):
         matches_repr = ''
@@ -33,50 +47,51 @@ class Matches(Generic[T]):
         return f"""Matches() ({self.count}) | best: {self.best_score} | worst: {self.worst_score}
     {matches_repr}"""
     
-    def _reset_stats(self):
-        # don't update best_score because we're called after discarding only worst scores
-        # print(paint.faint(f'Matches._reset_stats() beforehand: worst {self.worst_score}, count {self.count}'))
-        
-        self.worst_score = 0
-        self.count = 0
-        for score, candidates in self.matches.items():
-            if score > self.worst_score:
-                self.worst_score = score
-            self.count += len(candidates)
+    @property
+    def count(self) -> int:
+        return len(self._heap)
+    
+    @property
+    def worst_score(self) -> float:
+        return -self._heap[0][0] if self._heap else -math.inf
+    
+    @property
+    def matches(self) -> Dict[float, List[T]]:
+        """{score: items}, best score first, items in order of arrival"""
+        matches = defaultdict(list)
+        for score, _, item in self._sorted():
+            matches[score].append(item)
+        return dict(matches)
+    
+    def _sorted(self) -> List[Tuple[float, int, T]]:
+        """(score, order of arrival, item), best first"""
+        return sorted((-neg_score, order, item) for neg_score, order, item in self._heap)
     
     def append(self, item: T, score: float):
         # lower score is better
-        if self.count < self._maxsize:
-            # * below maxsize
-            if score > self.worst_score:
-                self.worst_score = score
-            if score < self.best_score:
-                self.best_score = score
-            self.matches[score].append(item)
-            self.count += 1
+        entry = (-score, self._appended, item)
+        self._appended += 1
+        if len(self._heap) < self._maxsize or score == self.worst_score:
+            # below maxsize, or a tie with the worst
+            heapq.heappush(self._heap, entry)
+        elif score < self.worst_score:
+            # better than worst; discard all of the worst candidates
+            worst = self._heap[0][0]
+            heapq.heapreplace(self._heap, entry)
+            while self._heap and self._heap[0][0] == worst:
+                heapq.heappop(self._heap)
+        else:
+            # score is worse than worst: don't let in
             return
-        
-        # * reached maxsize
-        if score == self.worst_score:
-            # even if reached max size, append item to [worst_score] because no way to decide what to discard
-            self.matches[self.worst_score].append(item)
-            self.count += 1
-            return
-        
-        if score < self.worst_score:
-            # better than worst; discard worst candidates, add current item
-            del self.matches[self.worst_score]
-            self.matches[score].append(item)
-            if score < self.best_score:
-                self.best_score = score
-            self._reset_stats()
-        
-        # score is worst than worst: don't let in
+        if score < self.best_score:
+            self.best_score = score
     
     def best(self) -> List[T]:
-        ret = self.matches[self.best_score]
-        # print(paint.faint(f'Matches.best() → {len(ret)} matches with score: {self.best_score}'))
-        return ret
+        return [item for score, _, item in self._sorted() if score == self.best_score]
+    
+    def top(self, n: int) -> List[T]:
+        """The `n` best items, ties in order of arrival"""
+        return [item for _, _, item in heapq.nsmallest(n, self._heap, key=lambda entry: (-entry[0], entry[1]))]
 
 
 def nearest(keyword: str, collection: List[T], cutoff=2) -> T:
@@ -85,52 +100,115 @@ def nearest(keyword: str, collection: List[T], cutoff=2) -> T:
     return matches.best()[0]
 
 
-def fuzzy(keyword: str, collection: List[T], cutoff=2) -> Matches[T]:
+def fuzzy(keyword: str, collection: List[T], cutoff=2, *, index: 'SearchIndex' = None) -> Matches[T]:
+    """Pass an `index` when searching the same collection more than once"""
     if not collection or not any(item for item in collection):
         raise ValueError(f"fuzzy('{keyword}', collection = {repr(collection)}): no collection")
-    near_matches = Matches(maxsize=5)
-    far_matches = Matches(maxsize=5)
-    max_l_dist = len(keyword) - 1
-    # TODO: sometimes cutoff == max_l_dist
-    for item in collection:
-        matches = find_near_matches(keyword, item, max_l_dist=max_l_dist)
-        # don't `continue` even if matches is empty
-        # lower distance is better
-        dists_sum = 0
-        # dists = []
-        match_lengths = 0
-        match_count = 0
-        for m in matches:
-            dists_sum += m.dist
-            # dists.append(m.dist)
-            match_lengths += len(m.matched)
-            match_count += 1
-        if not dists_sum:
-            continue
-        
-        # dist_score = sum(dists) / len(dists)
-        dist_score = dists_sum / match_count
-        avg_match_length = match_lengths / match_count
-        relative_factor = avg_match_length / len(item)
-        relative_factor = -round(-relative_factor - (-relative_factor % 0.2), 2)  # round up
-        # relative_factor = 1 + (dist_score / len(item))
-        # score = dist_score * relative_factor
-        
-        score = dist_score - relative_factor
-        if score >= cutoff:
-            # * not so good (above cutoff): put into far_matches if within cutoff+1
-            far_matches.append(item, score)
-            continue
-        
-        # * good (below cutoff)
-        near_matches.append(item, score)
-    if not near_matches and not far_matches:
+    if index is None:
+        index = SearchIndex(collection)
+    matches = index.fuzzy(keyword, cutoff)
+    if not matches:
         print(paint.yellow(f'fuzzy() no near_matches nor far_matches! collection: {collection}'))
-    if near_matches:
-        # print(paint.faint(f'fuzzy() → near_matches: {near_matches}\n\tfar_matches: {far_matches}'))
-        return near_matches
-    # print(paint.faint(f'fuzzy() → far_matches: {far_matches}\n\tnear_matches: {near_matches}'))
-    return far_matches
+    return matches
+
+
+def _trigrams(string: str) -> Set[str]:
+    return {string[i:i + 3] for i in range(len(string) - 2)}
+
+
+def _relative_factor(match_length: int, item_length: int) -> float:
+    """How much of the item the match covers, rounded up to the nearest 0.2"""
+    relative_factor = match_length / item_length
+    return -round(-relative_factor - (-relative_factor % 0.2), 2)
+
+
+class SearchIndex:
+    """A trigram index over a collection of strings, built once and reused across searches.
+    A fuzzy search only computes edit distances for items that share enough trigrams with the keyword to be within reach:
+    each edit breaks at most 3 of the keyword's trigrams.
+    Distances are case sensitive, like they always were; pass `ignore_case` to score 'LOGIN' as an exact match of 'login'.
+    The trigrams themselves are always lowercased, which only lets more candidates through, never fewer.
+    ::
+        index = SearchIndex(branchnames)
+        index.fuzzy('feture/login').best()  # ['feature/login']
+    With numpy installed, a search with many candidates scores them all at once (see batchmatch).
+    """
+    BATCH_THRESHOLD = 2000
+    NEAR_MATCHES = 5
+    
+    def __init__(self, collection: Iterable[str], *, ignore_case=False):
+        self.items: List[str] = list(collection)
+        self.ignore_case = ignore_case
+        lowered = [item.lower() for item in self.items]
+        # what distances are computed against
+        self._compared = lowered if ignore_case else self.items
+        postings: Dict[str, List[int]] = defaultdict(list)
+        for i, item in enumerate(lowered):
+            for trigram in _trigrams(item):
+                postings[trigram].append(i)
+        self._postings = dict(postings)
+    
+    def __len__(self):
+        return len(self.items)
+    
+    @cachedprop
+    def packed(self) -> 'batchmatch.PackedStrings':
+        return batchmatch.PackedStrings(self._compared)
+    
+    def candidates(self, keyword: str, max_dist: int) -> Iterable[int]:
+        """Indexes of items that may contain `keyword` within `max_dist` edits, in collection order"""
+        trigrams = _trigrams(keyword.lower())
+        needed = len(trigrams) - 3 * max_dist
+        if needed <= 0:
+            return range(len(self.items))
+        counts: Dict[int, int] = defaultdict(int)
+        for trigram in trigrams:
+            for i in self._postings.get(trigram, ()):
+                counts[i] += 1
+        return sorted(i for i, count in counts.items() if count >= needed)
+    
+    def distances(self, keyword: str, max_dist: int) -> Dict[int, Tuple[int, int]]:
+        """{item index: (edit distance, matched length)} of items within `max_dist`"""
+        if self.ignore_case:
+            keyword = keyword.lower()
+        candidates = self.candidates(keyword, max_dist)
+        if batchmatch.available and len(candidates) >= self.BATCH_THRESHOLD:
+            return dict(batchmatch.best_matches(keyword, self.packed, candidates, max_dist))
+        found = {}
+        for i in candidates:
+            match = best_match(keyword, self._compared[i], max_dist)
+            if match is not None:
+                found[i] = match
+        return found
+    
+    def fuzzy(self, keyword: str, cutoff=2) -> Matches[str]:
+        near_matches = Matches(maxsize=self.NEAR_MATCHES)
+        far_matches = Matches(maxsize=self.NEAR_MATCHES)
+        max_dist = len(keyword) - 1
+        # the tighter the bound, the fewer candidates get through the index, so start from one edit and widen it step by step.
+        # exact matches (distance 0) are skipped: they're what the substring stages already offered.
+        # one more edit always costs more than the relative factor (0.2 to 1) can make up for,
+        # so once near_matches is full, a wider bound can't bring in anything better
+        bound = 0
+        seen = set()
+        while bound < max_dist and near_matches.count < self.NEAR_MATCHES:
+            bound += 1
+            if len(_trigrams(keyword.lower())) - 3 * bound <= 0:
+                # the index can't filter anything anymore; no point in going step by step
+                bound = max_dist
+            for i, (dist, length) in self.distances(keyword, bound).items():
+                if not dist or i in seen:
+                    continue
+                seen.add(i)
+                item = self.items[i]
+                score = dist - _relative_factor(length, len(item))
+                if score >= cutoff:
+                    far_matches.append(item, score)
+                else:
+                    near_matches.append(item, score)
+        if near_matches:
+            return near_matches
+        return far_matches
 
 
 def _choose_from_many(collection, *promptopts) -> Optional[str]:
@@ -165,33 +243,137 @@ def _create_is_maybe_predicate(criterion: SearchCriteria) -> Callable[[str, str]
     return is_maybe
 
 
-def search_and_prompt(keyword: str, collection: List[str], criterion: SearchCriteria = 'substring') -> Optional[str]:
-    """Prompts to choose from each `maybes` set and returns the choice once made"""
-    for maybes, is_last in iter_maybes(keyword, collection, criterion=criterion):
-        choice = _choose_from_many(maybes)
-        if choice:
-            return choice
+def search_and_prompt(keyword: str, collection: List[str], criterion: SearchCriteria = 'substring', *,
+                      index: SearchIndex = None, parallel: bool = None) -> Optional[str]:
+    """Prompts to choose from each `maybes` set and returns the choice once made.
+    `parallel` defaults to True for collections of PARALLEL_THRESHOLD items or more (see iter_maybes())"""
+    if parallel is None:
+        parallel = len(collection) >= PARALLEL_THRESHOLD
+    with closing(iter_maybes(keyword, collection, criterion=criterion, index=index, parallel=parallel)) as stages:
+        # closing() stops a parallel fuzzy search as soon as a choice is made
+        for maybes, is_last in stages:
+            choice = _choose_from_many(maybes)
+            if choice:
+                return choice
     return None
 
 
-def iter_maybes(keyword: str, collection: List[T], *extra_options, criterion: SearchCriteria = 'substring') -> Generator[Tuple[List[T], bool], None, None]:
-    """Doesn't prompt of any kind. Yields a `[...], is_last` tuple."""
-    is_maybe = _create_is_maybe_predicate(criterion)
+def iter_maybes(keyword: str, collection: List[T], *extra_options, criterion: SearchCriteria = 'substring',
+                index: SearchIndex = None, parallel=False) -> Generator[Tuple[List[T], bool], None, None]:
+    """Doesn't prompt of any kind. Yields a `[...], is_last` tuple.
+    `index` should be a SearchIndex over `collection`, if the caller keeps one around.
+    With `parallel`, the fuzzy search starts right away in another process, while the cheap stages are being looked at;
+    closing the generator early kills it."""
+    yield from SearchSession(collection, criterion, index=index).iter_maybes(keyword, parallel=parallel)
+
+
+def _fuzzy_best(keyword: str, collection: List[T], index: Optional[SearchIndex], conn: Connection):
+    """Runs in a worker process, and sends back the result.
+    With the default fork start method, the arguments are inherited, not pickled through the pipe"""
+    with conn:
+        conn.send(fuzzy(keyword, collection, index=index).best())
+
+
+def _pseudo_fuzzy_regex(keyword: str) -> 're.Pattern':
+    """Ignores case, and word separators anywhere"""
+    return re.compile(''.join('[-_./ ]?' if char in '-_./ ' else re.escape(char) for char in keyword), re.IGNORECASE)
+
+
+class SearchSession:
+    """Search-as-you-type over one collection. Remembers which items survived each keyword it was asked about,
+    so typing one more char only filters the survivors of the keyword without it, and a backspace is a lookup.
+    ::
+        session = SearchSession(branchnames)
+        session.maybes('fe')  # (['feature/login', ...], [...])
+        session.maybes('fea')  # filters only what 'fe' matched
+    """
     
-    # print(paint.faint(f"trying to get '{keyword}' by '{criterion}'..."))
-    maybes = [item for item in collection if is_maybe(item, keyword)]
-    yield maybes, False
+    def __init__(self, collection: List[T], criterion: SearchCriteria = 'substring', *, index: SearchIndex = None):
+        self.collection = collection
+        self.criterion = criterion
+        self._is_maybe = _create_is_maybe_predicate(criterion)
+        # what matches 'abc' also matches 'ab', only for these
+        self._narrows = criterion in ('substring', 'startswith')
+        self._index = index
+        # {keyword: (indexes matching by criterion, indexes matching pseudo-fuzzily)}
+        self._survivors: Dict[str, Tuple[List[int], List[int]]] = {}
     
-    # print(paint.faint(f"ignoring case and word separators everywhere (pseudo-fuzzy)..."))
-    regexp = re.sub(r'[-_./ ]', r'[-_./ ]?', keyword)
-    new_maybes = [item for item in collection if re.search(regexp, item, re.IGNORECASE)]
-    if new_maybes == maybes:
-        pass
-        # print(paint.faint(f"pseudo-fuzzy got no new results"))
-    else:
-        yield maybes, False
+    @property
+    def index(self) -> SearchIndex:
+        if self._index is None:
+            self._index = SearchIndex(self.collection)
+        return self._index
+    
+    def _cached_prefix(self, keyword: str) -> Optional[str]:
+        """The longest prefix of `keyword` already searched for"""
+        for end in range(len(keyword), -1, -1):
+            if keyword[:end] in self._survivors:
+                return keyword[:end]
+        return None
+    
+    def _filter(self, keyword: str) -> Tuple[List[int], List[int]]:
+        try:
+            return self._survivors[keyword]
+        except KeyError:
+            pass
+        everything = range(len(self.collection))
+        prefix = self._cached_prefix(keyword)
+        if prefix is None:
+            exact_pool = fuzzy_pool = everything
+        else:
+            exact_pool, fuzzy_pool = self._survivors[prefix]
+            if not self._narrows:
+                exact_pool = everything
+        collection = self.collection
+        is_maybe = self._is_maybe
+        exact = [i for i in exact_pool if is_maybe(collection[i], keyword)]
+        search = _pseudo_fuzzy_regex(keyword).search
+        pseudo_fuzzy = [i for i in fuzzy_pool if search(collection[i])]
+        self._survivors[keyword] = exact, pseudo_fuzzy
+        return exact, pseudo_fuzzy
+    
+    def maybes(self, keyword: str) -> Tuple[List[T], List[T]]:
+        """(items matching by criterion, items matching while ignoring case and word separators)"""
+        exact, pseudo_fuzzy = self._filter(keyword)
+        return [self.collection[i] for i in exact], [self.collection[i] for i in pseudo_fuzzy]
+    
+    def iter_maybes(self, keyword: str, *, parallel=False) -> Generator[Tuple[List[T], bool], None, None]:
+        """Like the module's iter_maybes()"""
+        if not parallel:
+            maybes, new_maybes = self.maybes(keyword)
+            yield maybes, False
+            if new_maybes != maybes:
+                yield new_maybes, False
+            yield fuzzy(keyword, self.collection, index=self.index).best(), True
+            return
+        # a bare process, not a pool: it's cheaper to start, and closing can kill it mid-search.
+        # only the result goes through the pipe
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        worker = multiprocessing.Process(target=_fuzzy_best, args=(keyword, self.collection, self._index, sender), daemon=True)
+        worker.start()
+        sender.close()
+        try:
+            maybes, new_maybes = self.maybes(keyword)
+            yield maybes, False
+            if new_maybes != maybes:
+                yield new_maybes, False
+            try:
+                best = receiver.recv()
+            except EOFError:
+                # the worker died without an answer; search here instead
+                best = fuzzy(keyword, self.collection, index=self.index).best()
+            yield best, True
+        finally:
+            receiver.close()
+            if worker.is_alive():
+                worker.kill()
+            worker.join()
     
-    # print(paint.faint(f"going full fuzzy..."))
-    near_matches = fuzzy(keyword, collection)
-    # print(paint.faint(repr(near_matches)))
-    yield near_matches.best(), True
+    def complete(self, keyword: str, limit=20) -> List[T]:
+        """The best few items for a completion menu: exact, then pseudo-fuzzy matches, then fuzzy ones if there are none"""
+        exact, pseudo_fuzzy = self._filter(keyword)
+        seen = set(exact)
+        completions = [self.collection[i] for i in exact + [i for i in pseudo_fuzzy if i not in seen]]
+        if not completions and len(keyword) > 1:
+            completions = self.index.fuzzy(keyword).top(limit)
+        return completions[:limit]
@@ -1,14 +1,23 @@
+import atexit
+import os
+import selectors
 import shlex
-from typing import Union, List
+import sys
+import tempfile
+import time
+from typing import Union, List, Optional, NamedTuple, Iterable, Dict, Tuple, Generator, IO
 
 from igit.debug import ExcHandler
-from igit.util import termcolor
+from igit.util import lazy, termcolor, trace
 import subprocess as sp
 
+# only runmany() needs it, and it's one of the slower stdlib imports
+asyncio = lazy.module('asyncio')
+
 
 def run(*cmds: str, printout=True, printcmd=True, raiseonfail=True,
         input: bytes = None, stdout=sp.PIPE, stderr=sp.PIPE) -> Union[str, List[str]]:
-    # TODO: poll every second for long processes, like git clone
+    # for long processes, like git clone, see stream()
     outs = []
     for cmd in cmds:
         if printcmd:
@@ -20,7 +29,10 @@ def run(*cmds: str, printout=True, printcmd=True, raiseonfail=True,
             if input:
                 runargs['input'] = input
             
+            start = time.time()
             proc = sp.run(shlex.split(cmd), **runargs)
+            if trace.path:
+                trace.command(cmd, start, proc.returncode, len(proc.stdout or b''), len(proc.stderr or b''))
             if proc.stdout:
                 out = proc.stdout.decode().strip()
             else:
@@ -54,6 +66,366 @@ def runquiet(*cmds: str, raiseonfail=True,
     return run(*cmds, printout=False, printcmd=False, raiseonfail=raiseonfail, input=input, stdout=stdout, stderr=stderr)
 
 
+def runraw(cmd: str, *, raiseonfail=True) -> bytes:
+    """Quiet, and returns stdout undecoded and unstripped. Useful for `-z` outputs."""
+    start = time.time()
+    proc = sp.run(shlex.split(cmd), stdout=sp.PIPE, stderr=sp.PIPE)
+    if trace.path:
+        trace.command(cmd, start, proc.returncode, len(proc.stdout), len(proc.stderr))
+    if proc.returncode and raiseonfail:
+        stderr = proc.stderr.decode(errors='replace').strip()
+        print(termcolor.yellow(f'FAILED: `{cmd}` (exit code {proc.returncode})\n\t{stderr}'))
+        raise sp.CalledProcessError(proc.returncode, cmd, proc.stdout, stderr)
+    return proc.stdout
+
+
+def iterlines(cmd: str, *, raiseonfail=True) -> Generator[str, None, None]:
+    """Yields stdout lines as the process writes them, instead of buffering the whole output.
+    Closing the generator early kills the process."""
+    with tempfile.TemporaryFile() as errfile:
+        start = time.time()
+        proc = sp.Popen(shlex.split(cmd), stdout=sp.PIPE, stderr=errfile)
+        outsize = 0
+        try:
+            for line in proc.stdout:
+                outsize += len(line)
+                yield line.decode(errors='replace').rstrip('\n')
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+            proc.stdout.close()
+            returncode = proc.wait()
+            if trace.path:
+                trace.command(cmd, start, returncode, outsize, errfile.tell())
+        if returncode and raiseonfail:
+            errfile.seek(0)
+            stderr = errfile.read().decode(errors='replace').strip()
+            print(termcolor.yellow(f'FAILED: `{cmd}` (exit code {returncode})\n\t{stderr}'))
+            raise sp.CalledProcessError(returncode, cmd, stderr=stderr)
+
+
+# stream() keeps up to this much of each output in memory, and spills the rest to a temp file
+SPOOL_SIZE = 8 * 1024 * 1024
+_READ_SIZE = 64 * 1024
+
+
+class Streamed(NamedTuple):
+    returncode: int
+    # rewound, ready for reading; in memory, or on disk if big
+    stdout: IO[bytes]
+    stderr: IO[bytes]
+    
+    def out(self) -> str:
+        """All of stdout, decoded and stripped, like run() returns. Reads it all into memory"""
+        self.stdout.seek(0)
+        return self.stdout.read().decode(errors='replace').strip()
+
+
+def _forward(data: bytes, file: IO[str]):
+    buffer = getattr(file, 'buffer', None)
+    if buffer is not None:
+        buffer.write(data)
+        buffer.flush()
+    else:
+        file.write(data.decode(errors='replace'))
+        file.flush()
+
+
+def stream(cmd: str, *, printcmd=True, forward=True, raiseonfail=True, spool_size: int = SPOOL_SIZE) -> Streamed:
+    """Runs `cmd`, forwarding its stdout and stderr to ours as they arrive, chunk by chunk, so progress lines
+    (rewritten in place with '\\r', like `git clone --progress`) show as they happen.
+    Everything is also captured, in memory up to `spool_size` per stream and in a temp file past that.
+    raiseonfail: raise CalledProcessError on a non-zero exit."""
+    if printcmd:
+        print(termcolor.color(f'\n{cmd}', "lightgrey", "italic"))
+    start = time.time()
+    proc = sp.Popen(shlex.split(cmd), stdin=sp.DEVNULL, stdout=sp.PIPE, stderr=sp.PIPE)
+    captured = {proc.stdout: tempfile.SpooledTemporaryFile(spool_size),
+                proc.stderr: tempfile.SpooledTemporaryFile(spool_size)}
+    targets = {proc.stdout: sys.stdout, proc.stderr: sys.stderr}
+    try:
+        with selectors.DefaultSelector() as selector:
+            for pipe in captured:
+                selector.register(pipe, selectors.EVENT_READ)
+            while selector.get_map():
+                for key, _ in selector.select():
+                    data = os.read(key.fd, _READ_SIZE)
+                    if not data:
+                        selector.unregister(key.fileobj)
+                        key.fileobj.close()
+                        continue
+                    captured[key.fileobj].write(data)
+                    if forward:
+                        _forward(data, targets[key.fileobj])
+        returncode = proc.wait()
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+    if trace.path:
+        trace.command(cmd, start, returncode, captured[proc.stdout].tell(), captured[proc.stderr].tell())
+    for file in captured.values():
+        file.seek(0)
+    streamed = Streamed(returncode, captured[proc.stdout], captured[proc.stderr])
+    if returncode and raiseonfail:
+        # just the end of it; it may be huge
+        size = streamed.stderr.seek(0, os.SEEK_END)
+        streamed.stderr.seek(max(0, size - 4096))
+        stderr = streamed.stderr.read().decode(errors='replace').strip()
+        streamed.stderr.seek(0)
+        print(termcolor.yellow(f'FAILED: `{cmd}` (exit code {returncode})\n\t{stderr}'))
+        raise sp.CalledProcessError(returncode, cmd, stderr=stderr)
+    return streamed
+
+
+class _Failed(Exception):
+    """A command that exited non-zero, or was skipped (`out` is None then), so its dependents are skipped"""
+    
+    def __init__(self, returncode: int = None, out: str = None):
+        super().__init__(returncode)
+        self.out = out
+
+
+async def _run_async(cmd: str, *, printout: bool, printcmd: bool, limit: 'asyncio.Semaphore') -> str:
+    async with limit:
+        if printcmd:
+            print(termcolor.color(f'\n{cmd}', "lightgrey", "italic"))
+        start = time.time()
+        proc = await asyncio.create_subprocess_exec(*shlex.split(cmd),
+                                                    stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        outbytes = b''
+        errsize = 0
+        try:
+            stdout = asyncio.ensure_future(proc.stdout.read())
+            stderr = []
+            # stderr is printed as it arrives, not when the command is done; progress of `git push` and the like
+            async for line in proc.stderr:
+                errsize += len(line)
+                line = line.decode(errors='replace').rstrip('\n')
+                stderr.append(line)
+                print(termcolor.yellow(line))
+            outbytes = await stdout
+            out = outbytes.decode().strip()
+            returncode = await proc.wait()
+        finally:
+            if proc.returncode is None:
+                # cancelled, because another command failed
+                proc.kill()
+                await proc.wait()
+            if trace.path:
+                trace.command(cmd, start, proc.returncode, len(outbytes), errsize)
+    if stderr and stderr[-1].endswith('Permission denied'):
+        raise PermissionError('\n'.join(stderr))
+    if out and printout:
+        print(out, end='\n')
+    if returncode:
+        raise _Failed(returncode, out)
+    return out
+
+
+async def _rungraph(cmds: List[str], after: Dict[str, Iterable[str]], jobs: int, *,
+                    printout: bool, printcmd: bool, raiseonfail: bool) -> List[Optional[str]]:
+    limit = asyncio.Semaphore(jobs)
+    tasks: Dict[str, asyncio.Future] = {}
+    
+    async def node(cmd: str) -> Optional[str]:
+        deps = [tasks[dep] for dep in after.get(cmd, ())]
+        if deps:
+            done = await asyncio.gather(*deps, return_exceptions=True)
+            if any(isinstance(result, BaseException) for result in done):
+                print(termcolor.yellow(f'SKIPPED: `{cmd}`, because a command it runs after failed'))
+                raise _Failed()
+        try:
+            return await _run_async(cmd, printout=printout, printcmd=printcmd, limit=limit)
+        except _Failed as e:
+            if raiseonfail:
+                raise
+            return e.out
+        except Exception as e:
+            print(termcolor.yellow(f'FAILED: `{cmd}`\n\tcaught a {e.__class__.__name__}. raiseonfail is {raiseonfail}.'))
+            hdlr = ExcHandler(e)
+            if raiseonfail:
+                print(hdlr.full())
+                raise
+            print(hdlr.summary())
+            return None
+    
+    for cmd in _toposort(cmds, after):
+        tasks[cmd] = asyncio.ensure_future(node(cmd))
+    pending = set(tasks.values())
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            exc = task.exception()
+            # a non-zero exit only fails the command and its dependents, like in run()
+            if exc is not None and not isinstance(exc, _Failed):
+                for other in pending:
+                    other.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                raise exc
+    return [tasks[cmd].exception().out if tasks[cmd].exception() else tasks[cmd].result() for cmd in cmds]
+
+
+def _toposort(cmds: List[str], after: Dict[str, Iterable[str]]) -> List[str]:
+    """`cmds`, each after the ones it depends on"""
+    if len(set(cmds)) != len(cmds):
+        raise ValueError(f"runmany: duplicate commands: {cmds}")
+    unknown = ({dep for deps in after.values() for dep in deps} | set(after)) - set(cmds)
+    if unknown:
+        raise ValueError(f"runmany: `after` mentions commands that aren't run: {unknown}")
+    ordered = []
+    visiting = set()
+    
+    def visit(cmd):
+        if cmd in ordered:
+            return
+        if cmd in visiting:
+            raise ValueError(f"runmany: commands depend on each other in a cycle, through `{cmd}`")
+        visiting.add(cmd)
+        for dep in after.get(cmd, ()):
+            visit(dep)
+        ordered.append(cmd)
+    
+    for cmd in cmds:
+        visit(cmd)
+    return ordered
+
+
+def runmany(*cmds: str, after: Dict[str, Iterable[str]] = None, jobs: int = 4,
+            printout=True, printcmd=True, raiseonfail=True) -> Union[str, List[str]]:
+    """Like run(), but runs independent commands concurrently, at most `jobs` at a time.
+    `after` is {cmd: [cmds it waits for]}.
+    Returns the same as run(): the non-empty outputs, in the order of `cmds`, including those of commands that exited non-zero.
+    Like run(), a non-zero exit doesn't raise, and with `raiseonfail` an exception does.
+    Unlike run(), which goes on to the next command regardless, with `raiseonfail` a failed command's dependents
+    are skipped (that's what `after` is for). Without it, they run anyway, like the rest.
+    ::
+        runmany('git branch -D feature', 'git push origin --delete feature')
+        runmany('git add .', 'git commit -m wip', 'git push', after={'git commit -m wip': ['git add .'],
+                                                                    'git push': ['git commit -m wip']})
+    """
+    outs = asyncio.run(_rungraph(list(cmds), after or {}, jobs,
+                                 printout=printout, printcmd=printcmd, raiseonfail=raiseonfail))
+    outs = [out for out in outs if out]
+    if outs:
+        return outs[0] if len(outs) == 1 else outs
+    return ''
+
+
+class ObjectInfo(NamedTuple):
+    sha: str
+    type: str
+    size: int
+
+
+class ObjectReader:
+    """Resolves git objects over long-lived `git cat-file --batch-check` / `--batch` coprocesses,
+    instead of spawning a git process per lookup. Accepts anything `git rev-parse` does:
+    ::
+        reader = ObjectReader()
+        reader.info('HEAD')  # ObjectInfo(sha='4f2a...', type='commit', size=241)
+        reader.read('HEAD:setup.py')  # b'from setuptools import ...'
+    """
+    # how many requests are written before reading their responses back, so neither pipe fills up
+    CHUNK = 512
+    
+    def __init__(self, *, cwd: str = None):
+        self._cwd = cwd
+        self._check: Optional[sp.Popen] = None
+        self._batch: Optional[sp.Popen] = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def _spawn(self, proc: Optional[sp.Popen], flag: str) -> sp.Popen:
+        if proc is not None and proc.poll() is None:
+            return proc
+        return sp.Popen(['git', 'cat-file', flag], cwd=self._cwd,
+                        stdin=sp.PIPE, stdout=sp.PIPE, stderr=sp.DEVNULL)
+    
+    @staticmethod
+    def _request(proc: sp.Popen, revs: Iterable[str]):
+        lines = []
+        for rev in revs:
+            if '\n' in rev:
+                raise ValueError(f"ObjectReader: rev can't contain newlines: {repr(rev)}")
+            lines.append(f'{rev}\n')
+        proc.stdin.write(''.join(lines).encode())
+        proc.stdin.flush()
+    
+    @staticmethod
+    def _parse_header(header: bytes) -> Optional[ObjectInfo]:
+        if not header:
+            raise BrokenPipeError('git cat-file exited unexpectedly')
+        line = header.decode(errors='replace').rstrip('\n')
+        # '<rev> missing' or '<rev> ambiguous'; the rev itself may contain spaces, like 'HEAD:my file'
+        if line.endswith((' missing', ' ambiguous')):
+            return None
+        sha, objtype, size = line.split(' ')
+        return ObjectInfo(sha, objtype, int(size))
+    
+    def info(self, rev: str) -> Optional[ObjectInfo]:
+        """Returns None if `rev` doesn't resolve to an object"""
+        return self.info_many([rev])[rev]
+    
+    def info_many(self, revs: Iterable[str]) -> Dict[str, Optional[ObjectInfo]]:
+        self._check = self._spawn(self._check, '--batch-check')
+        revs = list(revs)
+        infos = {}
+        for i in range(0, len(revs), self.CHUNK):
+            chunk = revs[i:i + self.CHUNK]
+            self._request(self._check, chunk)
+            for rev in chunk:
+                infos[rev] = self._parse_header(self._check.stdout.readline())
+        return infos
+    
+    def read(self, rev: str) -> Optional[bytes]:
+        """Returns the raw object content, or None if `rev` doesn't resolve to an object"""
+        _, content = self.read_with_info(rev)
+        return content
+    
+    def read_with_info(self, rev: str) -> Tuple[Optional[ObjectInfo], Optional[bytes]]:
+        self._batch = self._spawn(self._batch, '--batch')
+        self._request(self._batch, [rev])
+        info = self._parse_header(self._batch.stdout.readline())
+        if info is None:
+            return None, None
+        content = self._batch.stdout.read(info.size + 1)  # trailing LF
+        return info, content[:-1]
+    
+    def close(self):
+        for proc in (self._check, self._batch):
+            if proc is None or proc.poll() is not None:
+                continue
+            proc.stdin.close()
+            proc.wait()
+            proc.stdout.close()
+        self._check = None
+        self._batch = None
+
+
+_readers: Dict[str, ObjectReader] = {}
+
+
+def objectreader() -> ObjectReader:
+    """A shared ObjectReader for the current working directory, closed at exit"""
+    cwd = os.getcwd()
+    try:
+        return _readers[cwd]
+    except KeyError:
+        reader = _readers[cwd] = ObjectReader(cwd=cwd)
+        return reader
+
+
+@atexit.register
+def _close_readers():
+    for reader in _readers.values():
+        reader.close()
+
+
 def get_terminal_width():
     from IPython.utils.terminal import get_terminal_size
     return get_terminal_size()[0]
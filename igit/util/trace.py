@@ -0,0 +1,149 @@
+"""Records every command igit runs (and a few phases of its own) when IGIT_TRACE=<path> is set:
+::
+    IGIT_TRACE=/tmp/igit.trace igit co feature
+    igit trace summary /tmp/igit.trace
+The file is in Chrome's trace event format (chrome://tracing, ui.perfetto.dev), one event per line,
+so it's also JSON lines once the leading '[' and trailing commas are stripped. Processes append to the same file.
+When IGIT_TRACE isn't set, `path` is None and callers skip recording altogether."""
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Iterable, NamedTuple
+
+path: Optional[str] = os.environ.get('IGIT_TRACE') or None
+_subcommand: Optional[str] = None
+_lock = threading.Lock()
+
+
+def subcommand() -> str:
+    """The igit command this process runs, like 'co'"""
+    global _subcommand
+    if _subcommand is None:
+        _subcommand = os.environ.get('IGIT_SUBCOMMAND') or os.path.splitext(os.path.basename(sys.argv[0]))[0]
+    return _subcommand
+
+
+def record(name: str, start: float, *, cat='shell', **args):
+    """A complete ('X') event from `start` (time.time()) until now. No-op if tracing is off"""
+    if path is None:
+        return
+    end = time.time()
+    event = dict(name=name, cat=cat, ph='X',
+                 ts=int(start * 1_000_000), dur=int((end - start) * 1_000_000),
+                 pid=os.getpid(), tid=threading.get_ident(),
+                 args=dict(subcommand=subcommand(), **args))
+    line = json.dumps(event)
+    with _lock:
+        try:
+            with open(path, 'a') as file:
+                if not file.tell():
+                    file.write('[\n')
+                file.write(f'{line},\n')
+        except OSError as e:
+            # never let tracing break the command
+            print(f'igit trace: failed writing {path}: {e}', file=sys.stderr)
+
+
+def command(cmd: str, start: float, returncode: Optional[int], stdout: int = None, stderr: int = None):
+    """A command that ran from `start` until now. `stdout` and `stderr` are byte counts, if known"""
+    if path is None:
+        return
+    record(cmd, start, returncode=returncode, stdout=stdout, stderr=stderr)
+
+
+@contextmanager
+def span(name: str, **args):
+    """Records the time spent in the `with` block, for igit's own phases (waiting on a fetch, reading status...)"""
+    if path is None:
+        yield
+        return
+    start = time.time()
+    try:
+        yield
+    finally:
+        record(name, start, cat='igit', **args)
+
+
+class Event(NamedTuple):
+    name: str
+    cat: str
+    start: float  # seconds
+    duration: float  # seconds
+    pid: int
+    args: dict
+
+
+def read(trace_path: str) -> List[Event]:
+    events = []
+    with open(trace_path) as file:
+        for line in file:
+            line = line.strip().rstrip(',')
+            if not line or line in '[]':
+                continue
+            try:
+                event = json.loads(line)
+            except ValueError:
+                # a line cut short by a process that died mid-write
+                continue
+            events.append(Event(event['name'], event.get('cat', ''), event['ts'] / 1_000_000, event['dur'] / 1_000_000,
+                                event.get('pid', 0), event.get('args', {})))
+    return events
+
+
+class Aggregate(NamedTuple):
+    name: str
+    count: int
+    total: float
+    max: float
+    failures: int
+
+
+def aggregate(events: Iterable[Event], *, by_subcommand=False) -> List[Aggregate]:
+    """Total time per command (or igit phase), slowest first.
+    Commands are grouped by their first two words ('git fetch', 'git status'...)"""
+    groups: Dict[str, List[Event]] = {}
+    for event in events:
+        key = ' '.join(event.name.split()[:2])
+        if by_subcommand:
+            key = f"{event.args.get('subcommand', '?')}: {key}"
+        groups.setdefault(key, []).append(event)
+    aggregates = []
+    for key, group in groups.items():
+        durations = [event.duration for event in group]
+        failures = sum(1 for event in group if event.args.get('returncode') not in (None, 0))
+        aggregates.append(Aggregate(key, len(group), sum(durations), max(durations), failures))
+    return sorted(aggregates, key=lambda aggregate_: aggregate_.total, reverse=True)
+
+
+class ImportTime(NamedTuple):
+    module: str
+    own: float  # seconds, excluding the modules it imported
+    cumulative: float  # seconds
+    depth: int
+
+
+def import_times(module: str) -> List[ImportTime]:
+    """How long importing `module` takes, module by module, in a fresh interpreter (`python -X importtime`).
+    In the order they finished importing, so `module` itself is last. Raises ImportError if it fails to import"""
+    import subprocess as sp
+    proc = sp.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], stdout=sp.PIPE, stderr=sp.PIPE)
+    lines = proc.stderr.decode(errors='replace').splitlines()
+    if proc.returncode:
+        # igit's excepthook prints the traceback to stdout
+        output = proc.stdout.decode(errors='replace').splitlines() + lines
+        error = '\n'.join([line for line in output if not line.startswith('import time:')][-10:])
+        raise ImportError(f'failed importing {module}:\n{error}', name=module)
+    times = []
+    for line in lines:
+        if not line.startswith('import time:'):
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        if not own.strip().isdigit():
+            # the header
+            continue
+        times.append(ImportTime(name.strip(), int(own) / 1_000_000, int(cumulative) / 1_000_000,
+                                (len(name) - len(name.lstrip()) - 1) // 2))
+    return times